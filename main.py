@@ -1,12 +1,43 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from src.graph import agent_orchestrator
-from typing import cast
+from src.graph.streaming import sse_frame, stream_orchestrator_events
+from typing import cast, List, Optional
 from src.schemas import OrchestratorState
 from langchain_core.messages import HumanMessage
-from src.agents import finance_agent_executor, scheduling_agent_executor
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from src.agents import agent_registry
+from src.agents.agent_factory import set_current_user
+from src.utils.intents import is_write_intent
+from src.utils.single_flight import SingleFlight, coalesce_key
+from src.utils.admission import AdmissionController, AdmissionRejected
+from src.server import serve
+from src.utils.job_runner import JobRunner
+from src.utils.http_client import aclose_async_client
+from src.llm import DeadlineExceeded, aclose_llm_clients, escalation_stats, get_llm_cache, request_budget, resilience_stats
+from src.extraction import extraction_stats
+from src.routing.cache import get_routing_cache
+from src.graph.agent_orchestrator import hop_stats
+from src.graph.speculation import speculation_stats
+from src.database.models import init_db
+from src.observability import (
+    get_metrics_handler,
+    get_tracing_handler,
+    instrument_sqlalchemy,
+    record_error,
+    record_fallback,
+    render_metrics,
+    trace_request,
+    trace_sqlalchemy,
+)
+from contextlib import asynccontextmanager
+from datetime import datetime
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import time
 import uvicorn
 
 # Carrega as variáveis de ambiente do arquivo .env no início do script
@@ -19,44 +50,355 @@ if not os.getenv("OPENAI_API_KEY"):
         "Por favor, crie um arquivo .env e adicione a linha: OPENAI_API_KEY='sua-chave-aqui'"
     )
 
+# Latência das consultas ao banco em /metrics e spans SQL nos traces
+instrument_sqlalchemy()
+trace_sqlalchemy()
+
+# Cabeçalho que devolve o trace da requisição na própria resposta (OTLP/JSON). O trace
+# expõe SQL, modelos e tempos e a requisição escapa do coalescing: só em desenvolvimento.
+TRACE_DEBUG_HEADER = "X-Debug-Trace"
+TRACE_DEBUG_HEADER_ENABLED = os.getenv("TRACE_DEBUG_HEADER_ENABLED", "0") == "1"
+
+# Executores do fallback por palavra-chave, construídos no primeiro uso
+finance_agent_executor = agent_registry.proxy("Financeiro")
+scheduling_agent_executor = agent_registry.proxy("Agendamento")
+
+# Execução assíncrona de conversas longas (POST /jobs)
+job_runner = JobRunner(
+    agent_orchestrator,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+    stale_after=float(os.getenv("JOB_STALE_SECONDS", "300")),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tabelas criadas na inicialização (no pre-fork, o pai já fez isso antes do fork)
+    await asyncio.to_thread(init_db)
+    await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        await aclose_async_client()
+        await aclose_llm_clients()
+
 app = FastAPI(
     title="Agent Orchestrator API",
     description="API para interagir com um sistema de agentes orquestrados.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 class QueryRequest(BaseModel):
     query: str
     user_id: str
+    bypass_routing_cache: bool = False
 
 class QueryResponse(BaseModel):
     response: str
+    trace: Optional[dict] = None
+
+class JobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    events: List[dict]
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    expires_at: Optional[datetime] = None
+
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest]
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+    stream: bool = False
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItemResult]
+
+# Limite superior de execuções simultâneas do grafo em /invoke/batch
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Rotas com coalescência de consultas idênticas (separadas por vírgula)
+COALESCE_ROUTES = {r.strip() for r in os.getenv("COALESCE_ROUTES", "/invoke").split(",") if r.strip()}
+COALESCERS = {route: SingleFlight(enabled=route in COALESCE_ROUTES) for route in ("/invoke",)}
+
+# Controle de admissão: limites globais/por usuário e fila com prazo
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+    max_per_user=int(os.getenv("ADMISSION_MAX_PER_USER", "4")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def _admission_params(http_request: Request, default_priority: str = "interactive") -> tuple[str, float]:
+    """Prioridade (``X-Priority``) e prazo absoluto (``X-Request-Timeout`` em segundos)."""
+    priority = http_request.headers.get("X-Priority", default_priority)
+    timeout = http_request.headers.get("X-Request-Timeout")
+    try:
+        budget = float(timeout) if timeout else admission.queue_timeout
+    except ValueError:
+        budget = admission.queue_timeout
+    return priority, time.monotonic() + budget
+
+# Orçamento total das chamadas de LLM de uma requisição (prazo de cada chamada e novas tentativas)
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "60"))
+
+def _llm_budget(http_request: Request) -> float:
+    """Orçamento (segundos) das chamadas de LLM: ``X-Request-Timeout`` ou ``REQUEST_BUDGET_SECONDS``."""
+    timeout = http_request.headers.get("X-Request-Timeout")
+    try:
+        return float(timeout) if timeout else REQUEST_BUDGET_SECONDS
+    except ValueError:
+        return REQUEST_BUDGET_SECONDS
+
+def _llm_deadline(http_request: Request) -> float:
+    return time.monotonic() + _llm_budget(http_request)
+
+def _with_item_budget(seconds: float) -> RunnableLambda:
+    """Orquestrador em que cada item do lote tem o próprio orçamento, contado do seu início
+    (itens que esperam vaga na concorrência do lote não herdam um prazo já consumido)."""
+    async def run_item(state: dict, config: RunnableConfig):
+        with request_budget(seconds=seconds):
+            return await agent_orchestrator.ainvoke(state, config=config)
+
+    return RunnableLambda(run_item, name="batch_item")
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """StreamingResponse que devolve a vaga de admissão ao terminar (ou ao ser cancelada)."""
 
-@app.post("/invoke", response_model=QueryResponse)
-def invoke_agent(request: QueryRequest):
-    """Endpoint principal que envia a consulta para o orquestrador de agentes."""
-    initial_state = {
+    def __init__(self, content, user_id: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self._user_id = user_id
+        self._started = time.monotonic()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self._user_id, time.monotonic() - self._started)
+
+def _initial_state(request: QueryRequest) -> OrchestratorState:
+    return cast(OrchestratorState, {
         "messages": [HumanMessage(content=request.query)],
         "next_agent": "",
         "sender": "usuario",
         "user_id": request.user_id,
-    }
+    })
+
+def _debug_trace(http_request: Request) -> bool:
+    return TRACE_DEBUG_HEADER_ENABLED and http_request.headers.get(TRACE_DEBUG_HEADER, "").lower() in ("1", "true")
 
+def _run_config(request: QueryRequest) -> dict:
+    return {"configurable": {"bypass_routing_cache": request.bypass_routing_cache}}
+
+def _deadline_exceeded(exc: DeadlineExceeded) -> HTTPException:
+    record_error("deadline")
+    return HTTPException(status_code=504, detail=f"Tempo limite da requisição esgotado: {exc}")
+
+async def _run_invoke(request: QueryRequest) -> tuple[str, int]:
     try:
-        result = agent_orchestrator.invoke(cast(OrchestratorState, initial_state))
+        result = await agent_orchestrator.ainvoke(_initial_state(request), config=_run_config(request))
         response_content = result["messages"][-1].content
+        hops = result.get("hops", 0)
+    except DeadlineExceeded as exc:
+        # Sem orçamento restante o fallback falharia do mesmo jeito
+        raise _deadline_exceeded(exc) from exc
     except Exception:
         # Fallback simples baseado em palavra-chave
+        record_error("orchestrator")
+        record_fallback("keyword")
+        set_current_user(request.user_id)
         q = request.query.lower()
-        if any(k in q for k in ("invest", "saldo", "conta", "finan")):
-            result = finance_agent_executor.invoke({"input": request.query})
-        else:
-            result = scheduling_agent_executor.invoke({"input": request.query})
+        config = {"callbacks": [get_metrics_handler(), get_tracing_handler()]}
+        executor = (
+            finance_agent_executor
+            if any(k in q for k in ("invest", "saldo", "conta", "finan"))
+            else scheduling_agent_executor
+        )
+        try:
+            result = await executor.ainvoke({"input": request.query}, config=config)
+        except DeadlineExceeded as exc:
+            raise _deadline_exceeded(exc) from exc
         response_content = (
             result["messages"][-1].content if "messages" in result else result.get("output", "")
         )
+        hops = 1
+    return response_content, hops
+
+async def _run_invoke_admitted(request: QueryRequest, priority: str, deadline: float) -> tuple[str, int]:
+    async with admission.admit(request.user_id, priority=priority, deadline=deadline):
+        return await _run_invoke(request)
+
+@app.post("/invoke", response_model=QueryResponse, response_model_exclude_none=True)
+async def invoke_agent(request: QueryRequest, http_request: Request, http_response: Response):
+    """Endpoint principal que envia a consulta para o orquestrador de agentes.
+
+    Consultas de leitura idênticas e simultâneas do mesmo usuário compartilham uma execução
+    (apenas a execução líder ocupa vaga no controle de admissão). O cabeçalho
+    ``X-Orchestrator-Hops`` informa quantos agentes foram executados. Com
+    ``TRACE_DEBUG_HEADER_ENABLED=1`` e ``X-Debug-Trace: 1`` a resposta inclui o trace da
+    execução (que então não é compartilhada com outras consultas).
+    """
+    priority, deadline = _admission_params(http_request)
+    coalescer = COALESCERS["/invoke"]
+    debug = _debug_trace(http_request)
+    with trace_request("POST /invoke", force=debug, **{"enduser.id": request.user_id}) as trace:
+        with request_budget(deadline=_llm_deadline(http_request)):
+            if debug or is_write_intent(request.query):
+                response_content, hops = await _run_invoke_admitted(request, priority, deadline)
+            else:
+                response_content, hops = await coalescer.run(
+                    coalesce_key(request.user_id, request.query),
+                    lambda: _run_invoke_admitted(request, priority, deadline),
+                )
+
+    http_response.headers["X-Orchestrator-Hops"] = str(hops)
+    if trace is not None:
+        http_response.headers["X-Trace-Id"] = trace.trace_id
+    return QueryResponse(response=response_content, trace=trace.to_otlp() if debug and trace else None)
+
+def _batch_item_result(index: int, output) -> BatchItemResult:
+    if isinstance(output, Exception):
+        return BatchItemResult(index=index, error=f"{type(output).__name__}: {output}")
+    return BatchItemResult(index=index, response=output["messages"][-1].content)
+
+@app.post("/invoke/batch", response_model=BatchQueryResponse)
+async def invoke_agent_batch(request: BatchQueryRequest, http_request: Request):
+    """Executa várias consultas no orquestrador com concorrência limitada.
+
+    Erros são reportados por item. Com ``stream=true`` os resultados saem em NDJSON
+    à medida que cada item termina (com ``index`` para reordenação no cliente).
+    O lote ocupa uma vaga de admissão na classe ``batch`` (usuário do primeiro item). O
+    orçamento de LLM (``X-Request-Timeout`` ou ``REQUEST_BUDGET_SECONDS``) vale por item.
+    """
+    priority, deadline = _admission_params(http_request, default_priority="batch")
+    orchestrator = _with_item_budget(_llm_budget(http_request))
+    owner = request.items[0].user_id if request.items else "batch"
+    states = [_initial_state(item) for item in request.items]
+    max_concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    config = [{**_run_config(item), "max_concurrency": max_concurrency} for item in request.items]
+
+    if request.stream:
+        async def ndjson_lines():
+            with trace_request("POST /invoke/batch", items=len(states)):
+                async for index, output in orchestrator.abatch_as_completed(
+                    states, config=config, return_exceptions=True
+                ):
+                    yield _batch_item_result(index, output).model_dump_json() + "\n"
+
+        await admission.acquire(owner, priority=priority, deadline=deadline)
+        return AdmittedStreamingResponse(ndjson_lines(), user_id=owner, media_type="application/x-ndjson")
+
+    async with admission.admit(owner, priority=priority, deadline=deadline):
+        with trace_request("POST /invoke/batch", items=len(states)):
+            outputs = await orchestrator.abatch(states, config=config, return_exceptions=True)
+    return BatchQueryResponse(results=[_batch_item_result(i, out) for i, out in enumerate(outputs)])
+
+@app.post("/invoke/stream")
+async def invoke_agent_stream(request: QueryRequest, http_request: Request):
+    """Executa o orquestrador emitindo roteamento, ferramentas e tokens como Server-Sent Events.
+
+    Com ``TRACE_DEBUG_HEADER_ENABLED=1`` e ``X-Debug-Trace: 1`` o último evento (``trace``)
+    traz o trace da execução.
+    """
+    priority, deadline = _admission_params(http_request)
+    llm_deadline = _llm_deadline(http_request)
+    debug = _debug_trace(http_request)
+    await admission.acquire(request.user_id, priority=priority, deadline=deadline)
+
+    async def event_source():
+        with trace_request("POST /invoke/stream", force=debug, **{"enduser.id": request.user_id}) as trace:
+            with request_budget(deadline=llm_deadline):
+                events = stream_orchestrator_events(agent_orchestrator, _initial_state(request), config=_run_config(request))
+                try:
+                    async for event, data in events:
+                        if await http_request.is_disconnected():
+                            break
+                        yield sse_frame(event, data)
+                finally:
+                    # Cliente desconectado (ou fim do fluxo): cancela a execução do grafo.
+                    await events.aclose()
+        if debug and trace is not None:
+            yield sse_frame("trace", trace.to_otlp())
+
+    return AdmittedStreamingResponse(
+        event_source(),
+        user_id=request.user_id,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/jobs", response_model=JobCreatedResponse, status_code=202)
+async def create_job(request: QueryRequest):
+    """Enfileira uma execução do orquestrador e retorna imediatamente o id do job."""
+    job_id = await job_runner.submit(request.user_id, request.query)
+    return JobCreatedResponse(job_id=job_id, status="pending")
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Status, eventos parciais (um por nó executado) e resultado final do job."""
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado.")
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        events=json.loads(job.events or "[]"),
+        result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        expires_at=job.expires_at,
+    )
+
+@app.get("/metrics")
+def get_metrics():
+    """Exposição Prometheus: latências por nó/LLM/ferramenta/banco, tokens, erros e fallbacks."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats")
+def get_stats():
+    """Contadores internos (coalescência de consultas, admissão etc.)."""
+    return {
+        "coalescing": {route: sf.stats() for route, sf in COALESCERS.items()},
+        "admission": admission.stats(),
+        "routing_cache": get_routing_cache().stats(),
+        "orchestrator": hop_stats.stats(),
+        "speculation": speculation_stats.stats(),
+        "llm_cache": get_llm_cache().stats(),
+        "llm_escalations": escalation_stats.stats(),
+        "llm_resilience": resilience_stats.stats(),
+        "extraction": extraction_stats.stats(),
+    }
 
-    return QueryResponse(response=response_content)
+def warm_up():
+    """Banco, agentes e grafo prontos no processo pai do pre-fork (compartilhados via copy-on-write)."""
+    init_db()
+    agent_registry.warm_up()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # WEB_CONCURRENCY > 1: modo pre-fork (app carregada uma vez, workers via fork)
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        serve(app, warmup=warm_up)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
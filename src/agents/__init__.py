@@ -1,11 +1,28 @@
-from .finance import finance_agent_executor, finance_tools
-from .scheduling import scheduling_agent_executor, scheduling_tools
+from .registry import agent_registry, get_agent
 from src.schemas import AgentMeta
 
+# Executores e ferramentas são carregados sob demanda: importar o pacote não constrói agentes
+_LAZY_AGENTS = {"finance_agent_executor": "Financeiro", "scheduling_agent_executor": "Agendamento"}
+
+
+def __getattr__(name):
+	if name in _LAZY_AGENTS:
+		return get_agent(_LAZY_AGENTS[name])
+	if name == "finance_tools":
+		from .finance.tools import finance_tools
+		return finance_tools
+	if name == "scheduling_tools":
+		from .scheduling.tools import scheduling_tools
+		return scheduling_tools
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
 	"finance_agent_executor",
 	"scheduling_agent_executor",
 	"finance_tools",
 	"scheduling_tools",
 	"AgentMeta",
+	"agent_registry",
+	"get_agent",
 ]
@@ -1,58 +1,252 @@
 from __future__ import annotations
-from typing import Sequence, Callable, Any
+from typing import Sequence, Callable, Any, Awaitable, Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
 import contextvars
-from langchain_openai import ChatOpenAI
+import inspect
+import os
+from src.llm import get_llm
+from src.observability import record_llm_calls_saved
 from langchain.agents import Tool, AgentExecutor
+from langchain.agents.agent import RunnableMultiActionAgent
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, create_model
 _current_user_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_user_id", default=None)
 
 def set_current_user(user_id: str | None):
     """Define o user_id corrente no contexto (thread-safe) para injeção automática em ferramentas."""
     _current_user_id.set(user_id)
+
+class MissingUserError(RuntimeError):
+    """Ferramenta com dados do usuário chamada sem usuário corrente (``set_current_user``)."""
+
+def require_user(user_id: str | None = None) -> str:
+    """``user_id`` informado ou o do contexto; sem nenhum dos dois levanta ``MissingUserError``
+    (nunca há usuário padrão: a ferramenta leria ou gravaria dados de outra pessoa)."""
+    user_id = user_id or _current_user_id.get()
+    if not user_id:
+        raise MissingUserError("usuário não identificado: defina o usuário corrente antes de usar a ferramenta")
+    return user_id
+
+_speculative_run: contextvars.ContextVar[bool] = contextvars.ContextVar("speculative_run", default=False)
+
+class SpeculativeWriteBlocked(RuntimeError):
+    """Ferramenta sem ``metadata={"read_only": True}`` chamada durante uma execução especulativa."""
+
+def set_speculative(flag: bool):
+    """Marca o contexto atual como execução especulativa: só ferramentas somente-leitura rodam."""
+    _speculative_run.set(flag)
+
+def is_read_only(tool: BaseTool) -> bool:
+    return bool((tool.metadata or {}).get("read_only"))
+
+def _guard_speculative(tool_name: str, read_only: bool) -> None:
+    if _speculative_run.get() and not read_only:
+        raise SpeculativeWriteBlocked(f"A ferramenta '{tool_name}' não pode rodar em execução especulativa")
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.utils.function_calling import convert_to_openai_function
-from langchain.agents.format_scratchpad import format_to_openai_function_messages
-from langchain.agents.output_parsers import OpenAIFunctionsAgentOutputParser
+from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+from langchain.agents.output_parsers.tools import ToolAgentAction, ToolsAgentOutputParser
+
+# Limite de ferramentas de um mesmo passo executadas ao mesmo tempo no caminho síncrono
+AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "4"))
+
+
+def _step_size(action: AgentAction) -> int:
+    """Quantas ações o passo produziu: uma por ``tool_call`` da mensagem do modelo."""
+    if isinstance(action, ToolAgentAction) and action.message_log:
+        return len(getattr(action.message_log[-1], "tool_calls", None) or []) or 1
+    return 1
+
+
+EARLY_STOP_MESSAGE = "Não consegui concluir o pedido dentro do limite de passos e tempo desta conversa."
+
+
+def early_stop_response(intermediate_steps: Sequence[tuple[AgentAction, Any]]) -> str:
+    """Resposta de parada antecipada: aviso ao usuário e os resultados já obtidos."""
+    observations = [str(observation) for _, observation in intermediate_steps if str(observation).strip()]
+    if not observations:
+        return EARLY_STOP_MESSAGE
+    return EARLY_STOP_MESSAGE + " Resultados obtidos até aqui:\n" + "\n".join(observations)
+
+
+class _GracefulStopAgent(RunnableMultiActionAgent):
+    """Agente cuja resposta ao atingir ``max_iterations``/``max_execution_time`` é ``early_stop_response``."""
+
+    def return_stopped_response(self, early_stopping_method, intermediate_steps, **kwargs):
+        return AgentFinish({"output": early_stop_response(intermediate_steps)}, "")
+
+
+class ParallelToolsAgentExecutor(AgentExecutor):
+    """AgentExecutor que executa em paralelo as ferramentas pedidas em um mesmo passo.
+
+    O caminho assíncrono do LangChain já agrupa as chamadas com ``asyncio.gather``; no
+    síncrono, as ações de um passo vão para um pool de threads, cada uma com uma cópia do
+    contexto (``user_id`` corrente, execução especulativa e prazo da requisição).
+    Observações voltam na ordem das chamadas.
+
+    Um passo em que todas as ferramentas têm ``return_direct`` termina a execução com as
+    observações (uma por linha), sem a chamada final ao LLM. Chamadas evitadas por
+    retorno direto ou por limites de passos/tempo são contadas em
+    ``agents_llm_calls_saved_total``.
+    """
 
+    max_tool_workers: int = AGENT_TOOL_WORKERS
 
-def _normalize_tool(t: Tool) -> Tool:
-    safe_name = t.name.replace(" ", "_").replace("-", "_")
-    safe_name = ''.join(c for c in safe_name if c.isalnum() or c in ['_', '-'])
-    # Wrap original func to enforce returning string and keep description intact
-    return Tool(name=safe_name, func=t.func, description=t.description)
+    def _direct_return(self, output):
+        if isinstance(output, AgentFinish) or not output:
+            return output
+        tools = {tool.name: tool for tool in self.tools}
+        if not all(getattr(tools.get(action.tool), "return_direct", False) for action, _ in output):
+            return output
+        record_llm_calls_saved("return_direct")
+        return AgentFinish({"output": "\n".join(str(observation) for _, observation in output)}, "")
+
+    def _take_next_step(self, *args, **kwargs):
+        return self._direct_return(super()._take_next_step(*args, **kwargs))
+
+    async def _atake_next_step(self, *args, **kwargs):
+        return self._direct_return(await super()._atake_next_step(*args, **kwargs))
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        if super()._should_continue(iterations, time_elapsed):
+            return True
+        exhausted = self.max_iterations is not None and iterations >= self.max_iterations
+        record_llm_calls_saved("max_iterations" if exhausted else "max_execution_time")
+        return False
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        steps = super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        actions: list[AgentAction] = []
+        for item in steps:
+            yield item
+            if isinstance(item, AgentAction):
+                actions.append(item)
+                # Passo com várias chamadas: o executor base as rodaria uma a uma
+                if len(actions) > 1 and len(actions) == _step_size(item):
+                    steps.close()
+                    yield from self._perform_parallel(name_to_tool_map, color_mapping, actions, run_manager)
+                    return
+
+    def _perform_parallel(self, name_to_tool_map, color_mapping, actions, run_manager) -> Iterator[AgentStep]:
+        with ThreadPoolExecutor(max_workers=min(self.max_tool_workers, len(actions))) as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self._perform_agent_action,
+                    name_to_tool_map,
+                    color_mapping,
+                    action,
+                    run_manager,
+                )
+                for action in actions
+            ]
+            for future in futures:
+                yield future.result()
+
+
+def _safe_name(name: str) -> str:
+    safe_name = name.replace(" ", "_").replace("-", "_")
+    return ''.join(c for c in safe_name if c.isalnum() or c in ['_', '-'])
+
+
+def _without_user_id(schema: type[BaseModel]) -> type[BaseModel]:
+    fields = {name: (f.annotation, f) for name, f in schema.model_fields.items() if name != "user_id"}
+    return create_model(schema.__name__, __doc__=schema.__doc__, **fields)
+
+
+def _normalize_tool(t: BaseTool) -> BaseTool:
+    # Cópia com o nome sanitizado; classe e args_schema (StructuredTool) são preservados,
+    # exceto ``user_id``, que nunca é publicado ao LLM
+    update: dict[str, Any] = {"name": _safe_name(t.name)}
+    schema = getattr(t, "args_schema", None)
+    if isinstance(schema, type) and issubclass(schema, BaseModel) and "user_id" in schema.model_fields:
+        update["args_schema"] = _without_user_id(schema)
+    return t.model_copy(update=update)
+
+
+def _accepts_user_id(fn: Callable[..., Any] | None) -> bool:
+    try:
+        params = inspect.signature(fn).parameters if fn is not None else {}
+    except (TypeError, ValueError):
+        return False
+    return "user_id" in params or any(p.kind is p.VAR_KEYWORD for p in params.values())
+
+
+def _inject_current_user(kwargs: dict[str, Any], accepts_user: bool) -> None:
+    # O usuário vem sempre do contexto da requisição; um user_id vindo do modelo é descartado
+    kwargs.pop("user_id", None)
+    if accepts_user:
+        kwargs["user_id"] = require_user()
 
 
 def build_agent_executor(
     system_prompt: str,
-    tools: Sequence[Tool],
+    tools: Sequence[BaseTool],
     temperature: float = 0.0,
-    verbose: bool = True,
+    verbose: bool = False,
+    return_direct: Collection[str] = (),
+    max_iterations: int | None = None,
+    max_execution_time: float | None = None,
 ) -> AgentExecutor:
-    """Cria um AgentExecutor padronizado com suporte a OpenAI function calling.
+    """Cria um AgentExecutor padronizado com suporte a OpenAI tool calling.
+
+    Ferramentas com ``coroutine`` mantêm a variante assíncrona, usada por ``ainvoke``.
+    O ``args_schema`` de ferramentas estruturadas é publicado na definição da ferramenta,
+    então o próprio agente entrega os argumentos tipados. ``user_id`` é removido do schema
+    publicado e sempre sobrescrito com o usuário do contexto (``set_current_user``); sem
+    usuário corrente a ferramenta falha com ``MissingUserError``. O modelo pode pedir várias ferramentas
+    no mesmo passo (``parallel_tool_calls``); elas rodam concorrentemente
+    (ver ``ParallelToolsAgentExecutor``).
+
+    Ferramentas cuja saída já é a resposta final ao usuário são declaradas em
+    ``return_direct``. Com ``max_iterations``/``max_execution_time`` o agente para
+    antes do limite com ``early_stop_response`` em vez de seguir chamando o LLM.
 
     Args:
         system_prompt: Mensagem de sistema detalhando o papel e instruções.
-        tools: Sequência de ferramentas (langchain.agents.Tool).
+        tools: Sequência de ferramentas (Tool ou StructuredTool).
         temperature: Temperatura do modelo.
-        verbose: Flag de verbosidade.
+        verbose: Impressão do LangChain no stdout; para acompanhar execuções prefira o
+            destino de console do rastreamento (``TRACE_CONSOLE=1``).
+        return_direct: Nomes das ferramentas de retorno direto.
+        max_iterations: Máximo de passos (chamadas ao LLM) por execução.
+        max_execution_time: Tempo máximo de uma execução, em segundos.
     """
-    llm = ChatOpenAI(temperature=temperature)
+    llm = get_llm("agent", temperature=temperature)
     normalized = [_normalize_tool(t) for t in tools]
+    direct = {_safe_name(n) for n in return_direct}
 
     # Wrap tools to auto-inject user_id if missing
-    wrapped_tools: list[Tool] = []
+    wrapped_tools: list[BaseTool] = []
     for t in normalized:
-        orig_func = t.func if t.func is not None else (lambda *a, **k: "Função da ferramenta não definida")
+        orig_func = getattr(t, "func", None) or (lambda *a, **k: "Função da ferramenta não definida")
+
+        def make_wrapper(f: Callable[..., Any], name: str, read_only: bool):
+            accepts_user = _accepts_user_id(f)
 
-        def make_wrapper(f: Callable[..., Any]):
             def _wrapper(*args, **kwargs):
-                if "user_id" not in kwargs or kwargs.get("user_id") in (None, ""):
-                    ctx_uid = _current_user_id.get()
-                    if ctx_uid:
-                        kwargs["user_id"] = ctx_uid
+                _guard_speculative(name, read_only)
+                _inject_current_user(kwargs, accepts_user)
                 return f(*args, **kwargs)
             return _wrapper
 
-        wrapped = Tool(name=t.name, func=make_wrapper(orig_func), description=t.description)
+        def make_async_wrapper(cf: Callable[..., Awaitable[Any]], name: str, read_only: bool):
+            accepts_user = _accepts_user_id(cf)
+
+            async def _awrapper(*args, **kwargs):
+                _guard_speculative(name, read_only)
+                _inject_current_user(kwargs, accepts_user)
+                return await cf(*args, **kwargs)
+            return _awrapper
+
+        read_only = is_read_only(t)
+        wrapped = t.model_copy(
+            update={
+                "func": make_wrapper(orig_func, t.name, read_only),
+                "coroutine": make_async_wrapper(t.coroutine, t.name, read_only) if getattr(t, "coroutine", None) is not None else None,
+                "return_direct": t.return_direct or t.name in direct,
+            }
+        )
         wrapped_tools.append(wrapped)
 
     prompt = ChatPromptTemplate.from_messages(
@@ -63,21 +257,38 @@ def build_agent_executor(
         ]
     )
 
-    llm_with_tools = llm.bind(functions=[convert_to_openai_function(t) for t in wrapped_tools])
+    llm_with_tools = llm.bind_tools(wrapped_tools, parallel_tool_calls=True)
 
     agent = (
         {
             "input": lambda x: x["input"],
-            "agent_scratchpad": lambda x: format_to_openai_function_messages(
+            "agent_scratchpad": lambda x: format_to_tool_messages(
                 x["intermediate_steps"]
             ),
         }
         | prompt
         | llm_with_tools
-        | OpenAIFunctionsAgentOutputParser()
+        | ToolsAgentOutputParser()
     )
 
-    return AgentExecutor(agent=agent, tools=wrapped_tools, verbose=verbose)
+    return ParallelToolsAgentExecutor(
+        agent=_GracefulStopAgent(runnable=agent),
+        tools=wrapped_tools,
+        verbose=verbose,
+        max_iterations=max_iterations,
+        max_execution_time=max_execution_time,
+        early_stopping_method="force",
+    )
 
 
-__all__ = ["build_agent_executor", "set_current_user"]
+__all__ = [
+    "MissingUserError",
+    "ParallelToolsAgentExecutor",
+    "SpeculativeWriteBlocked",
+    "build_agent_executor",
+    "early_stop_response",
+    "is_read_only",
+    "require_user",
+    "set_current_user",
+    "set_speculative",
+]
@@ -1,4 +1,13 @@
-from .agent import finance_agent_executor
+from .agent import build_finance_agent
 from .tools import finance_tools
 
-__all__ = ["finance_agent_executor", "finance_tools"]
+
+def __getattr__(name):
+    if name == "finance_agent_executor":
+        from src.agents.registry import get_agent
+
+        return get_agent("Financeiro")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["build_finance_agent", "finance_agent_executor", "finance_tools"]
@@ -1,10 +1,24 @@
+import os
 from .tools import finance_tools
 from src.agents.agent_factory import build_agent_executor
 from src.prompts.finance import FINANCE_SYSTEM_PROMPT
 
-finance_agent_executor = build_agent_executor(
-    system_prompt=FINANCE_SYSTEM_PROMPT,
-    tools=finance_tools,
-    temperature=0.0,
-    verbose=True,
-)
+
+def build_finance_agent():
+    return build_agent_executor(
+        system_prompt=FINANCE_SYSTEM_PROMPT,
+        tools=finance_tools,
+        temperature=0.0,
+        return_direct=["get_balance"],
+        max_iterations=int(os.getenv("FINANCE_AGENT_MAX_ITERATIONS", "5")),
+        max_execution_time=float(os.getenv("FINANCE_AGENT_MAX_EXECUTION_TIME", "45")),
+    )
+
+
+def __getattr__(name):
+    # ``finance_agent_executor`` é construído pelo registro de agentes no primeiro acesso
+    if name == "finance_agent_executor":
+        from src.agents.registry import get_agent
+
+        return get_agent("Financeiro")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,23 @@
-from langchain.agents import Tool
+import asyncio
+from typing import Optional
+from langchain.tools import StructuredTool
+from pydantic import BaseModel, Field
 from src.database.crud import get_finances
 from src.database.models import SessionLocal
+from src.agents.agent_factory import require_user
 
-def get_balance(query: str) -> str:
+class BalanceInput(BaseModel):
+    """Argumentos de `get_balance`: o saldo é sempre o do usuário corrente."""
+    query: str = Field("", description="O pedido original do usuário")
+
+def get_balance(query: str = "", user_id: Optional[str] = None) -> str:
     """
     Calcula o saldo total com base nas transações financeiras do usuário.
     """
     try:
+        user_id = require_user(user_id)
         db = SessionLocal()
-        finances = get_finances(db, user_id="user1")
+        finances = get_finances(db, user_id=user_id)
         db.close()
 
         if not finances:
@@ -19,8 +28,15 @@ def get_balance(query: str) -> str:
     except Exception as e:
         return f"Erro ao obter saldo: {e}"
 
-balance_tool = Tool(
+async def aget_balance(query: str = "", user_id: Optional[str] = None) -> str:
+    """Versão assíncrona de `get_balance`; a consulta ao banco roda fora do event loop."""
+    return await asyncio.to_thread(get_balance, query, user_id)
+
+balance_tool = StructuredTool.from_function(
     name="get_balance",
     func=get_balance,
+    coroutine=aget_balance,
     description="Use esta ferramenta para obter o saldo atual da conta.",
+    args_schema=BalanceInput,
+    metadata={"read_only": True},
 )
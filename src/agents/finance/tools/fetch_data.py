@@ -1,27 +1,57 @@
-from langchain.agents import Tool
+from langchain.tools import StructuredTool
+from pydantic import BaseModel, Field
 import httpx
+from src.utils.http_client import get_async_client
+from src.observability.tracing import SPAN_KIND_CLIENT, span
+
+class FetchDataInput(BaseModel):
+    """Argumentos de `fetch_financial_data`."""
+    query: str = Field(description="O assunto da consulta: 'bolsa' ou 'dólar'")
+
+def _resolve_url(query: str) -> str | None:
+    if "bolsa" in query.lower():
+        return "https://www.b3.com.br/"
+    if "dólar" in query.lower():
+        return "https://api.exchangerate-api.com/v4/latest/USD"
+    return None
+
+def _format_response(query: str, response: httpx.Response) -> str:
+    if "bolsa" in query.lower():
+        return f"Dados da bolsa: {response.text[:200]}..."
+    elif "dólar" in query.lower():
+        data = response.json()
+        return f"Cotação atual do dólar: 1 USD = {data['rates']['BRL']} BRL"
+    return "Consulta finalizada, mas sem dados específicos."
 
 def fetch_financial_data(query: str) -> str:
     try:
-        if "bolsa" in query.lower():
-            url = "https://www.b3.com.br/"
-        elif "dólar" in query.lower():
-            url = "https://api.exchangerate-api.com/v4/latest/USD"
-        else:
+        url = _resolve_url(query)
+        if url is None:
             return "Consulta não reconhecida. Tente 'bolsa' ou 'dólar'."
-        response = httpx.get(url, timeout=10)
+        with span("http GET", kind=SPAN_KIND_CLIENT, **{"http.url": url}):
+            response = httpx.get(url, timeout=10)
         response.raise_for_status()
-        if "bolsa" in query.lower():
-            return f"Dados da bolsa: {response.text[:200]}..."
-        elif "dólar" in query.lower():
-            data = response.json()
-            return f"Cotação atual do dólar: 1 USD = {data['rates']['BRL']} BRL"
+        return _format_response(query, response)
+    except Exception as e:
+        return f"Erro ao buscar dados: {str(e)}"
+
+async def afetch_financial_data(query: str) -> str:
+    try:
+        url = _resolve_url(query)
+        if url is None:
+            return "Consulta não reconhecida. Tente 'bolsa' ou 'dólar'."
+        with span("http GET", kind=SPAN_KIND_CLIENT, **{"http.url": url}):
+            response = await get_async_client().get(url)
+        response.raise_for_status()
+        return _format_response(query, response)
     except Exception as e:
         return f"Erro ao buscar dados: {str(e)}"
-    return "Consulta finalizada, mas sem dados específicos."
 
-fetch_data_tool = Tool(
+fetch_data_tool = StructuredTool.from_function(
     name="fetch_financial_data",
     func=fetch_financial_data,
-    description="Use esta ferramenta para consultar dados da bolsa de valores ou notícias sobre o dólar."
+    coroutine=afetch_financial_data,
+    description="Use esta ferramenta para consultar dados da bolsa de valores ou notícias sobre o dólar.",
+    args_schema=FetchDataInput,
+    metadata={"read_only": True},
 )
@@ -1,35 +1,77 @@
-from langchain.agents import Tool
+import asyncio
+from typing import Optional
+from langchain.tools import StructuredTool
 from src.database.crud import create_finance
 from src.database.models import SessionLocal
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
+from src.llm import with_escalation
+from src.extraction import complete_fields, normalize_arguments
+from src.agents.agent_factory import require_user
+from pydantic import BaseModel, Field
 
 class InvestmentDetails(BaseModel):
     """Informações para registrar um investimento."""
     amount: float = Field(description="O valor do investimento")
     description: str = Field(description="A descrição do investimento (ex: 'compra de ações da AAPL')")
 
-def make_investment(query: str) -> str:
+class InvestmentInput(BaseModel):
+    """Argumentos de `make_investment`; campos omitidos são extraídos de `query`."""
+    query: str = Field("", description="O pedido original do usuário")
+    amount: Optional[float] = Field(None, description="O valor do investimento, em reais")
+    description: Optional[str] = Field(None, description="A descrição do investimento (ex: 'CDB do Banco X')")
+
+def _local_details(query: str, arguments: dict) -> InvestmentDetails | None:
+    # Argumentos da chamada + extração local (pt-BR); o LLM só é chamado se algum campo obrigatório ficar indefinido
+    fields = complete_fields("investment", query, arguments)
+    return InvestmentDetails(**fields) if fields is not None else None
+
+def _extraction_prompt(query: str) -> str:
+    return f"Extraia os detalhes do seguinte pedido de investimento: '{query}'"
+
+def _save_investment(details: InvestmentDetails, user_id: str) -> None:
+    db = SessionLocal()
+    create_finance(db, user_id=user_id, amount=-details.amount, description=details.description, date=datetime.now(), time=datetime.now().strftime('%H:%M'))
+    db.close()
+
+def make_investment(query: str = "", amount: Optional[float] = None, description: Optional[str] = None, user_id: Optional[str] = None) -> str:
     """
-    Analisa a consulta para extrair detalhes do investimento e o registra no banco de dados.
+    Registra o investimento com os argumentos informados, extraindo de `query` os que faltarem.
     """
+    arguments = {"amount": amount, "description": description}
     try:
-        llm = ChatOpenAI(temperature=0, model="gpt-4o")
-        structured_llm = llm.with_structured_output(InvestmentDetails)
-        
-        details = structured_llm.invoke(f"Extraia os detalhes do seguinte pedido de investimento: '{query}'")
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(InvestmentDetails))
+            details = structured_llm.invoke(_extraction_prompt(query)).model_copy(update=normalize_arguments(arguments))
 
-        db = SessionLocal()
-        create_finance(db, user_id="user1", amount=-details.amount, description=details.description, date=datetime.now(), time=datetime.now().strftime('%H:%M'))
-        db.close()
+        _save_investment(details, user_id)
         
         return "Investimento registrado com sucesso!"
     except Exception as e:
         return f"Erro ao registrar investimento: {e}"
 
-investment_tool = Tool(
+async def amake_investment(query: str = "", amount: Optional[float] = None, description: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """Versão assíncrona de `make_investment`."""
+    arguments = {"amount": amount, "description": description}
+    try:
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(InvestmentDetails))
+            details = (await structured_llm.ainvoke(_extraction_prompt(query))).model_copy(update=normalize_arguments(arguments))
+
+        await asyncio.to_thread(_save_investment, details, user_id)
+
+        return "Investimento registrado com sucesso!"
+    except Exception as e:
+        return f"Erro ao registrar investimento: {e}"
+
+investment_tool = StructuredTool.from_function(
     name="make_investment",
     func=make_investment,
-    description="Use esta ferramenta para registrar um novo investimento.",
+    coroutine=amake_investment,
+    description="Use esta ferramenta para registrar um novo investimento. Informe valor e descrição sempre que estiverem no pedido.",
+    args_schema=InvestmentInput,
+    metadata={"read_only": False},
 )
@@ -1,35 +1,77 @@
-from langchain.agents import Tool
+import asyncio
+from typing import Optional
+from langchain.tools import StructuredTool
 from src.database.crud import create_finance
 from src.database.models import SessionLocal
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
+from src.llm import with_escalation
+from src.extraction import complete_fields, normalize_arguments
+from src.agents.agent_factory import require_user
+from pydantic import BaseModel, Field
 
 class TransferDetails(BaseModel):
     """Informações para registrar uma transferência."""
     amount: float = Field(description="O valor da transferência")
     recipient: str = Field(description="O destinatário da transferência")
 
-def transfer_money(query: str) -> str:
+class TransferInput(BaseModel):
+    """Argumentos de `transfer_money`; campos omitidos são extraídos de `query`."""
+    query: str = Field("", description="O pedido original do usuário")
+    amount: Optional[float] = Field(None, description="O valor da transferência, em reais")
+    recipient: Optional[str] = Field(None, description="O destinatário da transferência")
+
+def _local_details(query: str, arguments: dict) -> TransferDetails | None:
+    # Argumentos da chamada + extração local (pt-BR); o LLM só é chamado se algum campo obrigatório ficar indefinido
+    fields = complete_fields("transfer", query, arguments)
+    return TransferDetails(**fields) if fields is not None else None
+
+def _extraction_prompt(query: str) -> str:
+    return f"Extraia os detalhes da seguinte solicitação de transferência: '{query}'"
+
+def _save_transfer(details: TransferDetails, user_id: str) -> None:
+    db = SessionLocal()
+    create_finance(db, user_id=user_id, amount=-details.amount, description=f"Transferência para {details.recipient}", date=datetime.now(), time=datetime.now().strftime('%H:%M'))
+    db.close()
+
+def transfer_money(query: str = "", amount: Optional[float] = None, recipient: Optional[str] = None, user_id: Optional[str] = None) -> str:
     """
-    Analisa a consulta para extrair detalhes da transferência e a registra no banco de dados.
+    Registra a transferência com os argumentos informados, extraindo de `query` os que faltarem.
     """
+    arguments = {"amount": amount, "recipient": recipient}
     try:
-        llm = ChatOpenAI(temperature=0, model="gpt-4o")
-        structured_llm = llm.with_structured_output(TransferDetails)
-        
-        details = structured_llm.invoke(f"Extraia os detalhes da seguinte solicitação de transferência: '{query}'")
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(TransferDetails))
+            details = structured_llm.invoke(_extraction_prompt(query)).model_copy(update=normalize_arguments(arguments))
 
-        db = SessionLocal()
-        create_finance(db, user_id="user1", amount=-details.amount, description=f"Transferência para {details.recipient}", date=datetime.now(), time=datetime.now().strftime('%H:%M'))
-        db.close()
+        _save_transfer(details, user_id)
         
         return "Transferência registrada com sucesso!"
     except Exception as e:
         return f"Erro ao registrar transferência: {e}"
 
-transfer_tool = Tool(
+async def atransfer_money(query: str = "", amount: Optional[float] = None, recipient: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """Versão assíncrona de `transfer_money`."""
+    arguments = {"amount": amount, "recipient": recipient}
+    try:
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(TransferDetails))
+            details = (await structured_llm.ainvoke(_extraction_prompt(query))).model_copy(update=normalize_arguments(arguments))
+
+        await asyncio.to_thread(_save_transfer, details, user_id)
+
+        return "Transferência registrada com sucesso!"
+    except Exception as e:
+        return f"Erro ao registrar transferência: {e}"
+
+transfer_tool = StructuredTool.from_function(
     name="transfer_money",
     func=transfer_money,
-    description="Use esta ferramenta para registrar uma nova transferência de dinheiro.",
+    coroutine=atransfer_money,
+    description="Use esta ferramenta para registrar uma nova transferência de dinheiro. Informe valor e destinatário sempre que estiverem no pedido.",
+    args_schema=TransferInput,
+    metadata={"read_only": False},
 )
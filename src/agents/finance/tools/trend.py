@@ -1,27 +1,51 @@
-from langchain.agents import Tool
+from langchain.tools import StructuredTool
+from pydantic import BaseModel, Field
+from typing import Optional
 from datetime import datetime, timedelta
 import httpx
 import re
 from statistics import linear_regression
+from src.utils.http_client import get_async_client
 
 
-def _fetch_usd_brl_timeseries(days: int = 7) -> list[tuple[str, float]]:
+class TrendInput(BaseModel):
+    """Argumentos de `predict_usd_brl_trend`."""
+    query: str = Field("", description="O pedido original do usuário")
+    days: Optional[int] = Field(None, description="Janela de análise em dias (3 a 30; padrão 7)")
+
+
+def _timeseries_url(days: int) -> str:
     end_date = datetime.utcnow().date()
     start_date = end_date - timedelta(days=days - 1)
-    url = (
+    return (
         f"https://api.exchangerate.host/timeseries?start_date={start_date}&end_date={end_date}&base=USD&symbols=BRL"
     )
+
+
+def _parse_timeseries(data: dict) -> list[tuple[str, float]]:
+    rates = data.get("rates", {})
+    series = []
+    for d, v in sorted(rates.items()):
+        brl = v.get("BRL")
+        if isinstance(brl, (int, float)):
+            series.append((d, float(brl)))
+    return series
+
+
+def _fetch_usd_brl_timeseries(days: int = 7) -> list[tuple[str, float]]:
     try:
-        r = httpx.get(url, timeout=10)
+        r = httpx.get(_timeseries_url(days), timeout=10)
         r.raise_for_status()
-        data = r.json()
-        rates = data.get("rates", {})
-        series = []
-        for d, v in sorted(rates.items()):
-            brl = v.get("BRL")
-            if isinstance(brl, (int, float)):
-                series.append((d, float(brl)))
-        return series
+        return _parse_timeseries(r.json())
+    except Exception:
+        return []
+
+
+async def _afetch_usd_brl_timeseries(days: int = 7) -> list[tuple[str, float]]:
+    try:
+        r = await get_async_client().get(_timeseries_url(days))
+        r.raise_for_status()
+        return _parse_timeseries(r.json())
     except Exception:
         return []
 
@@ -45,11 +69,14 @@ def classify_usd_brl_trend_from_series(rates: list[float]) -> str:
     return "estável/incerta"
 
 
-def predict_usd_brl_trend(query: str) -> str:
-    m = re.search(r"(\d{1,2})\s*(d|dia|dias)", query.lower())
-    days = int(m.group(1)) if m else 7
-    days = max(3, min(days, 30))
-    series = _fetch_usd_brl_timeseries(days)
+def _window_days(query: str, days: Optional[int] = None) -> int:
+    if days is None:
+        m = re.search(r"(\d{1,2})\s*(d|dia|dias)", query.lower())
+        days = int(m.group(1)) if m else 7
+    return max(3, min(days, 30))
+
+
+def _summarize_trend(days: int, series: list[tuple[str, float]]) -> str:
     if not series:
         return "Não foi possível obter dados recentes para USD/BRL no momento."
     _, values = zip(*series)
@@ -61,8 +88,21 @@ def predict_usd_brl_trend(query: str) -> str:
         f"Tendência heurística: {classification}. (Não é recomendação de investimento.)"
     )
 
-trend_tool = Tool(
+
+def predict_usd_brl_trend(query: str = "", days: Optional[int] = None) -> str:
+    days = _window_days(query, days)
+    return _summarize_trend(days, _fetch_usd_brl_timeseries(days))
+
+
+async def apredict_usd_brl_trend(query: str = "", days: Optional[int] = None) -> str:
+    days = _window_days(query, days)
+    return _summarize_trend(days, await _afetch_usd_brl_timeseries(days))
+
+trend_tool = StructuredTool.from_function(
     name="predict_usd_brl_trend",
     func=predict_usd_brl_trend,
-    description="Prevê heurísticamente se USD/BRL tende a subir, cair ou ficar estável nos próximos dias (usa séries recentes)."
+    coroutine=apredict_usd_brl_trend,
+    description="Prevê heurísticamente se USD/BRL tende a subir, cair ou ficar estável nos próximos dias (usa séries recentes).",
+    args_schema=TrendInput,
+    metadata={"read_only": True},
 )
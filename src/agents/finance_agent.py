@@ -1,6 +1,7 @@
 from src.tools.finance_tools import finance_tools, fetch_financial_data
 from langchain.agents import Tool
 from .agent_factory import build_agent_executor
+from .registry import agent_registry
 
 all_finance_tools = finance_tools + [
     Tool(
@@ -19,8 +20,16 @@ Instruções importantes:
 - Não forneça consultoria legal ou fiscal definitiva; quando necessário, recomende um especialista humano.
 - Seja transparente sobre incertezas e limites dos dados. Priorize segurança e privacidade dos dados do usuário."""
 
-finance_agent_executor = build_agent_executor(
-    system_prompt=SYSTEM_PROMPT,
-    tools=all_finance_tools,
-    verbose=True
-)
+def _build():
+    return build_agent_executor(
+        system_prompt=SYSTEM_PROMPT,
+        tools=all_finance_tools,
+    )
+
+agent_registry.register("finance_legacy", _build)
+
+def __getattr__(name):
+    # Construído no primeiro acesso (e guardado) pelo registro de agentes
+    if name == "finance_agent_executor":
+        return agent_registry.get("finance_legacy")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
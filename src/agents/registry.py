@@ -0,0 +1,100 @@
+"""Registro preguiçoso de agentes e grafos compilados.
+
+Importar ``main`` (ou qualquer módulo de agentes) não constrói executores nem compila o
+grafo: cada nome registrado tem uma fábrica, chamada no primeiro ``get`` e guardada
+para os acessos seguintes. ``proxy(name)`` devolve um objeto que encaminha atributos
+(``invoke``, ``ainvoke``, ``tools``...) à instância construída, para módulos que expõem
+executores como variáveis globais.
+
+O servidor pre-fork chama ``warm_up()`` antes do ``fork``: os workers herdam as
+instâncias prontas por copy-on-write em vez de construí-las cada um. Os modelos dos
+agentes não guardam conexões (o pool HTTP é buscado por processo a cada envio em
+``src.llm.registry``), então herdá-los não compartilha sockets entre workers.
+"""
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class AgentRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def names(self) -> List[str]:
+        return list(self._factories)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Agente não registrado: {name!r} (disponíveis: {', '.join(self._factories)})")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def proxy(self, name: str) -> "LazyProxy":
+        return LazyProxy(self, name)
+
+    def built(self) -> List[str]:
+        return list(self._instances)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        for name in names or self.names():
+            self.get(name)
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+class LazyProxy:
+    """Encaminha atributos ao objeto registrado, construído no primeiro acesso."""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: AgentRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyProxy {self._name!r}>"
+
+
+agent_registry = AgentRegistry()
+
+
+def get_agent(name: str) -> Any:
+    return agent_registry.get(name)
+
+
+def _build_finance() -> Any:
+    from src.agents.finance.agent import build_finance_agent
+
+    return build_finance_agent()
+
+
+def _build_scheduling() -> Any:
+    from src.agents.scheduling.agent import build_scheduling_agent
+
+    return build_scheduling_agent()
+
+
+agent_registry.register("Financeiro", _build_finance)
+agent_registry.register("Agendamento", _build_scheduling)
+
+
+__all__ = ["AgentRegistry", "LazyProxy", "agent_registry", "get_agent"]
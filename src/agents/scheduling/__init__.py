@@ -1,4 +1,13 @@
-from .agent import scheduling_agent_executor
+from .agent import build_scheduling_agent
 from .tools import scheduling_tools
 
-__all__ = ["scheduling_agent_executor", "scheduling_tools"]
+
+def __getattr__(name):
+    if name == "scheduling_agent_executor":
+        from src.agents.registry import get_agent
+
+        return get_agent("Agendamento")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ["build_scheduling_agent", "scheduling_agent_executor", "scheduling_tools"]
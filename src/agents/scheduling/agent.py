@@ -1,10 +1,23 @@
+import os
 from .tools import scheduling_tools
 from src.agents.agent_factory import build_agent_executor
 from src.prompts.scheduling import SCHEDULING_SYSTEM_PROMPT
 
-scheduling_agent_executor = build_agent_executor(
-    system_prompt=SCHEDULING_SYSTEM_PROMPT,
-    tools=scheduling_tools,
-    temperature=0.0,
-    verbose=True,
-)
+
+def build_scheduling_agent():
+    return build_agent_executor(
+        system_prompt=SCHEDULING_SYSTEM_PROMPT,
+        tools=scheduling_tools,
+        temperature=0.0,
+        max_iterations=int(os.getenv("SCHEDULING_AGENT_MAX_ITERATIONS", "5")),
+        max_execution_time=float(os.getenv("SCHEDULING_AGENT_MAX_EXECUTION_TIME", "45")),
+    )
+
+
+def __getattr__(name):
+    # ``scheduling_agent_executor`` é construído pelo registro de agentes no primeiro acesso
+    if name == "scheduling_agent_executor":
+        from src.agents.registry import get_agent
+
+        return get_agent("Agendamento")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
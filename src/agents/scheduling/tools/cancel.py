@@ -1,43 +1,98 @@
-from langchain.agents import Tool
-from src.database.crud import delete_schedule, get_schedules
+import asyncio
+from typing import Optional
+from langchain.tools import StructuredTool
+from src.database.crud import delete_schedule
 from src.database.models import SessionLocal
-from langchain_openai import ChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
+from src.extraction import extraction_stats
+from src.llm import with_escalation
+from src.agents.agent_factory import require_user
+from pydantic import BaseModel, Field
+from .candidates import format_schedules, load_schedules, select_candidates
 
 class CancelDetails(BaseModel):
     """Informações para cancelar um compromisso."""
     schedule_id: int = Field(description="O ID do compromisso a ser cancelado")
 
-def cancel_appointment(query: str) -> str:
+class CancelInput(BaseModel):
+    """Argumentos de `cancel_appointment`; sem o ID, o compromisso é identificado a partir de `query`."""
+    query: str = Field("", description="O pedido original do usuário")
+    schedule_id: Optional[int] = Field(None, description="O ID do compromisso a ser cancelado, se conhecido")
+
+def _pick_schedule(schedules: list, query: str, schedule_id: Optional[int]) -> tuple[Optional[int], list]:
+    # ID informado (do próprio usuário) ou escolha inequívoca entre os candidatos dispensam o LLM;
+    # caso contrário devolve só os candidatos, para um prompt de tamanho limitado
+    if schedule_id in {s.id for s in schedules}:
+        extraction_stats.record("cancel", "arguments")
+        return schedule_id, []
+    candidates, match = select_candidates(schedules, query)
+    extraction_stats.record("cancel", "local" if match is not None else "llm")
+    return (match.id if match is not None else None), candidates
+
+def _checked(details: CancelDetails, candidates: list) -> int:
+    if details.schedule_id not in {s.id for s in candidates}:
+        raise ValueError("não foi possível identificar o compromisso; informe a data ou a descrição")
+    return details.schedule_id
+
+def _extraction_prompt(schedules_info: str, query: str) -> str:
+    return f"Aqui estão os compromissos candidatos:\n{schedules_info}\n\nCom base na consulta a seguir, extraia o ID do compromisso para cancelamento: '{query}'"
+
+def _delete(schedule_id: int) -> None:
+    db = SessionLocal()
+    try:
+        delete_schedule(db, schedule_id=schedule_id)
+    finally:
+        db.close()
+
+def cancel_appointment(query: str = "", schedule_id: Optional[int] = None, user_id: Optional[str] = None) -> str:
     """
-    Analisa a consulta para extrair o ID do compromisso e o cancela no banco de dados.
+    Cancela o compromisso informado; sem ID, escolhe entre os candidatos mais prováveis para `query`
+    (com o LLM apenas quando a escolha for ambígua).
     """
-    db = SessionLocal()
     try:
-        llm = ChatOpenAI(temperature=0, model="gpt-4o")
-        structured_llm = llm.with_structured_output(CancelDetails)
-        
-        schedules = get_schedules(db, user_id="user1")
+        user_id = require_user(user_id)
+        schedules = load_schedules(user_id)
 
         if not schedules:
             return "Nenhum compromisso encontrado para cancelar."
 
-        schedules_info = "\n".join([f"ID: {s.id}, Data: {s.date.strftime('%d/%m/%Y')}, Hora: {s.time}, Local: {s.location}, Descrição: {s.description}" for s in schedules])
-        
-        prompt = f"Aqui estão os compromissos existentes:\n{schedules_info}\n\nCom base na consulta a seguir, extraia o ID do compromisso para cancelamento: '{query}'"
-        
-        details: CancelDetails = structured_llm.invoke(prompt)
+        schedule_id, candidates = _pick_schedule(schedules, query, schedule_id)
+        if schedule_id is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(CancelDetails))
+            details: CancelDetails = structured_llm.invoke(_extraction_prompt(format_schedules(candidates), query))
+            schedule_id = _checked(details, candidates)
 
-        delete_schedule(db, schedule_id=details.schedule_id)
+        _delete(schedule_id)
         
         return "Compromisso cancelado com sucesso!"
     except Exception as e:
         return f"Erro ao cancelar compromisso: {e}"
-    finally:
-        db.close()
 
-cancel_tool = Tool(
+async def acancel_appointment(query: str = "", schedule_id: Optional[int] = None, user_id: Optional[str] = None) -> str:
+    """Versão assíncrona de `cancel_appointment`."""
+    try:
+        user_id = require_user(user_id)
+        schedules = await asyncio.to_thread(load_schedules, user_id)
+
+        if not schedules:
+            return "Nenhum compromisso encontrado para cancelar."
+
+        schedule_id, candidates = _pick_schedule(schedules, query, schedule_id)
+        if schedule_id is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(CancelDetails))
+            details: CancelDetails = await structured_llm.ainvoke(_extraction_prompt(format_schedules(candidates), query))
+            schedule_id = _checked(details, candidates)
+
+        await asyncio.to_thread(_delete, schedule_id)
+
+        return "Compromisso cancelado com sucesso!"
+    except Exception as e:
+        return f"Erro ao cancelar compromisso: {e}"
+
+cancel_tool = StructuredTool.from_function(
     name="cancel_appointment",
     func=cancel_appointment,
+    coroutine=acancel_appointment,
     description="Use esta ferramenta para cancelar um compromisso existente.",
+    args_schema=CancelInput,
+    metadata={"read_only": False},
 )
@@ -0,0 +1,144 @@
+"""Seleção de candidatos para cancelar e reagendar sem enviar a agenda inteira ao LLM.
+
+Cada compromisso recebe pontos pelas evidências na consulta: data mencionada (3), hora
+mencionada (2) e cada palavra em comum com o local ou a descrição (1); uma data ou hora
+mencionada que não bate com o compromisso desconta os mesmos pontos. Empates, e
+compromissos sem evidência, seguem a ordem "próximos primeiro" (os futuros pelo mais
+próximo, depois os passados pelo mais recente). Só os ``top_k`` primeiros chegam ao prompt.
+
+Cancelar e reagendar são destrutivos: a escolha só é feita sem LLM quando a consulta cita
+data ou hora, o compromisso confere com uma das datas e uma das horas citadas (ao
+reagendar, as novas também aparecem na consulta) e ele é o único com evidências ou supera
+o segundo colocado por ``SCHEDULE_MATCH_MARGIN`` pontos. Só palavras em comum nunca bastam.
+Ao reagendar, as datas e horas de ``new_slot`` (o novo horário) não são evidência de qual
+compromisso o usuário quer mover.
+"""
+import os
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from src.database.crud import get_schedules
+from src.database.models import SessionLocal
+from src.extraction.ptbr import mentioned_dates, mentioned_times
+from src.utils.intents import normalize_text
+
+SCHEDULE_CANDIDATES_TOP_K = int(os.getenv("SCHEDULE_CANDIDATES_TOP_K", "5"))
+SCHEDULE_MATCH_MARGIN = float(os.getenv("SCHEDULE_MATCH_MARGIN", "2"))
+
+# Palavras frequentes nos pedidos que não identificam um compromisso
+_IGNORED_WORDS = {
+    "cancelar", "cancele", "cancela", "desmarcar", "desmarque", "remarcar", "remarque", "reagendar",
+    "reagende", "mudar", "mude", "passar", "passe", "compromisso", "agendamento", "meu", "minha",
+    "para", "pra", "com", "que", "dia", "das", "dos", "uma", "hoje", "amanha", "hora", "horas",
+}
+
+
+class ScheduleMatch(NamedTuple):
+    schedule: Any
+    score: float
+
+
+def load_schedules(user_id: str) -> list:
+    db = SessionLocal()
+    try:
+        return get_schedules(db, user_id=user_id)
+    finally:
+        db.close()
+
+
+def format_schedules(schedules: Sequence[Any]) -> str:
+    return "\n".join([f"ID: {s.id}, Data: {s.date.strftime('%d/%m/%Y')}, Hora: {s.time}, Local: {s.location}, Descrição: {s.description}" for s in schedules])
+
+
+def _words(text: str) -> Set[str]:
+    return {w for w in normalize_text(text).replace(",", " ").split() if len(w) >= 3 and w not in _IGNORED_WORDS}
+
+
+def _starts_at(schedule: Any) -> datetime:
+    try:
+        hour, minute = map(int, str(schedule.time).split(":")[:2])
+        return schedule.date.replace(hour=hour, minute=minute)
+    except (TypeError, ValueError):
+        return schedule.date
+
+
+def _upcoming_key(schedule: Any, now: datetime) -> Tuple[int, float]:
+    delta = (_starts_at(schedule) - now).total_seconds()
+    return (0, delta) if delta >= 0 else (1, -delta)
+
+
+class _Evidence(NamedTuple):
+    dates: Set[Tuple[int, int]]
+    times: Set[str]
+    words: Set[str]
+
+
+def _evidence(query: str, now: datetime, new_slot: str = "") -> _Evidence:
+    # Dia e mês: "15/03" sem ano aponta para a próxima ocorrência, mas pode ser um compromisso passado
+    dates = {(d.month, d.day) for d in mentioned_dates(query, now.date())}
+    times = set(mentioned_times(query))
+    if new_slot:
+        dates -= {(d.month, d.day) for d in mentioned_dates(new_slot, now.date())}
+        times -= set(mentioned_times(new_slot))
+    return _Evidence(dates, times, _words(query))
+
+
+def _date_matches(schedule: Any, evidence: _Evidence) -> bool:
+    return (schedule.date.month, schedule.date.day) in evidence.dates
+
+
+def _score(schedule: Any, evidence: _Evidence) -> float:
+    points = 0.0
+    if evidence.dates:
+        points += 3.0 if _date_matches(schedule, evidence) else -3.0
+    if evidence.times:
+        points += 2.0 if schedule.time in evidence.times else -2.0
+    return points + len(evidence.words & _words(f"{schedule.location} {schedule.description}"))
+
+
+def _confirmed(schedule: Any, evidence: _Evidence) -> bool:
+    """A consulta cita data ou hora e nenhuma delas contradiz o compromisso."""
+    if not evidence.dates and not evidence.times:
+        return False
+    if evidence.dates and not _date_matches(schedule, evidence):
+        return False
+    return not evidence.times or schedule.time in evidence.times
+
+
+def rank_schedules(
+    schedules: Sequence[Any], query: str, now: Optional[datetime] = None, new_slot: str = ""
+) -> List[ScheduleMatch]:
+    """Compromissos ordenados pela pontuação de evidências e, em empates, próximos primeiro."""
+    now = now or datetime.now()
+    evidence = _evidence(query, now, new_slot)
+    ranked = [ScheduleMatch(s, _score(s, evidence)) for s in schedules]
+    return sorted(ranked, key=lambda m: (-m.score, _upcoming_key(m.schedule, now)))
+
+
+def select_candidates(
+    schedules: Sequence[Any],
+    query: str,
+    top_k: Optional[int] = None,
+    now: Optional[datetime] = None,
+    new_slot: str = "",
+) -> Tuple[list, Optional[Any]]:
+    """Os ``top_k`` compromissos mais prováveis e o escolhido, se a escolha for inequívoca."""
+    now = now or datetime.now()
+    ranked = rank_schedules(schedules, query, now, new_slot)
+    if not ranked:
+        return [], None
+    best = ranked[0]
+    runner_up = ranked[1].score if len(ranked) > 1 else 0.0
+    unambiguous = runner_up <= 0 or best.score - runner_up >= SCHEDULE_MATCH_MARGIN
+    confirmed = _confirmed(best.schedule, _evidence(query, now, new_slot))
+    resolved = best.schedule if best.score > 0 and unambiguous and confirmed else None
+    return [m.schedule for m in ranked[: top_k or SCHEDULE_CANDIDATES_TOP_K]], resolved
+
+
+__all__ = [
+    "ScheduleMatch",
+    "format_schedules",
+    "load_schedules",
+    "rank_schedules",
+    "select_candidates",
+]
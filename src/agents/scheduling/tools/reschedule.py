@@ -1,9 +1,15 @@
-from langchain.agents import Tool
-from src.database.crud import update_schedule, get_schedules
+import asyncio
+import re
+from typing import Optional
+from langchain.tools import StructuredTool
+from src.database.crud import update_schedule
 from src.database.models import SessionLocal
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
+from src.llm import with_escalation
+from src.extraction import extraction_stats, normalize_arguments
+from src.agents.agent_factory import require_user
+from pydantic import BaseModel, Field
+from .candidates import format_schedules, load_schedules, select_candidates
 
 class RescheduleDetails(BaseModel):
     """Informações para reagendar um compromisso."""
@@ -13,39 +19,131 @@ class RescheduleDetails(BaseModel):
     new_location: str = Field(description="O novo local do compromisso")
     new_description: str = Field(description="A nova descrição do compromisso")
 
-def reschedule_appointment(query: str) -> str:
+class RescheduleInput(BaseModel):
+    """Argumentos de `reschedule_appointment`; sem o ID, o compromisso é identificado a partir de `query`."""
+    query: str = Field("", description="O pedido original do usuário")
+    schedule_id: Optional[int] = Field(None, description="O ID do compromisso a ser reagendado, se conhecido")
+    new_date: Optional[str] = Field(None, description="A nova data do compromisso, formato DD/MM/YYYY")
+    new_time: Optional[str] = Field(None, description="A nova hora do compromisso, formato HH:MM")
+    new_location: Optional[str] = Field(None, description="O novo local do compromisso")
+    new_description: Optional[str] = Field(None, description="A nova descrição do compromisso")
+
+def _typed_details(schedules: list, arguments: dict) -> RescheduleDetails | None:
+    # Com o ID de um compromisso do usuário e a nova data ou hora, dispensa o LLM;
+    # os campos não informados mantêm os valores atuais
+    given = normalize_arguments(arguments)
+    current = next((s for s in schedules if s.id == given.get("schedule_id")), None)
+    if current is None or not {"new_date", "new_time"} & given.keys():
+        return None
+    return RescheduleDetails(
+        schedule_id=current.id,
+        new_date=given.get("new_date", current.date.strftime('%d/%m/%Y')),
+        new_time=given.get("new_time", current.time),
+        new_location=given.get("new_location", current.location),
+        new_description=given.get("new_description", current.description),
+    )
+
+def _new_slot(query: str, arguments: dict) -> str:
+    # Novo horário: os argumentos tipados e o trecho depois de "para"/"pra" ("... para 20/12 às 15h")
+    target = re.split(r"\b(?:para|pra)\b", query, maxsplit=1, flags=re.IGNORECASE)
+    typed = [arguments.get("new_date") or "", arguments.get("new_time") or ""]
+    return " ".join(typed + target[1:])
+
+def _resolve(schedules: list, query: str, arguments: dict) -> tuple[RescheduleDetails | None, list]:
+    # Sem ID informado, o compromisso vem da seleção de candidatos; o LLM só recebe os
+    # candidatos (ou apenas o escolhido, quando faltar a nova data/hora)
+    details = _typed_details(schedules, arguments)
+    if details is not None:
+        extraction_stats.record("reschedule", "arguments")
+        return details, []
+    candidates, match = select_candidates(schedules, query, new_slot=_new_slot(query, arguments))
+    if match is not None:
+        details = _typed_details([match], {**arguments, "schedule_id": match.id})
+        candidates = [match]
+    extraction_stats.record("reschedule", "local" if details is not None else "llm")
+    return details, candidates
+
+def _checked(details: RescheduleDetails, candidates: list) -> RescheduleDetails:
+    if details.schedule_id not in {s.id for s in candidates}:
+        raise ValueError("não foi possível identificar o compromisso; informe a data ou a descrição")
+    return details
+
+def _extraction_prompt(schedules_info: str, query: str) -> str:
+    return f"Aqui estão os compromissos candidatos:\n{schedules_info}\n\nCom base na consulta a seguir, extraia os detalhes para reagendamento: '{query}'"
+
+def _apply_reschedule(details: RescheduleDetails) -> None:
+    new_date = datetime.strptime(details.new_date, '%d/%m/%Y')
+
+    db = SessionLocal()
+    update_schedule(db, schedule_id=details.schedule_id, new_date=new_date, new_time=details.new_time, new_location=details.new_location, new_description=details.new_description)
+    db.close()
+
+def reschedule_appointment(
+    query: str = "",
+    schedule_id: Optional[int] = None,
+    new_date: Optional[str] = None,
+    new_time: Optional[str] = None,
+    new_location: Optional[str] = None,
+    new_description: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> str:
     """
-    Analisa a consulta para extrair detalhes do reagendamento e o atualiza no banco de dados.
+    Reagenda o compromisso informado; sem ID, escolhe entre os candidatos mais prováveis para `query`
+    e usa o LLM só para o que não puder ser resolvido localmente.
     """
+    arguments = {"schedule_id": schedule_id, "new_date": new_date, "new_time": new_time, "new_location": new_location, "new_description": new_description}
     try:
-        llm = ChatOpenAI(temperature=0, model="gpt-4o")
-        structured_llm = llm.with_structured_output(RescheduleDetails)
-        
-        db = SessionLocal()
-        schedules = get_schedules(db, user_id="user1")
-        db.close()
+        user_id = require_user(user_id)
+        schedules = load_schedules(user_id)
 
         if not schedules:
             return "Nenhum compromisso encontrado para reagendar."
 
-        schedules_info = "\n".join([f"ID: {s.id}, Data: {s.date.strftime('%d/%m/%Y')}, Hora: {s.time}, Local: {s.location}, Descrição: {s.description}" for s in schedules])
-        
-        prompt = f"Aqui estão os compromissos existentes:\n{schedules_info}\n\nCom base na consulta a seguir, extraia os detalhes para reagendamento: '{query}'"
+        details, candidates = _resolve(schedules, query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(RescheduleDetails))
+            details = _checked(structured_llm.invoke(_extraction_prompt(format_schedules(candidates), query)), candidates)
+
+        _apply_reschedule(details)
         
-        details = structured_llm.invoke(prompt)
+        return "Compromisso reagendado com sucesso!"
+    except Exception as e:
+        return f"Erro ao reagendar compromisso: {e}"
 
-        new_date = datetime.strptime(details.new_date, '%d/%m/%Y')
+async def areschedule_appointment(
+    query: str = "",
+    schedule_id: Optional[int] = None,
+    new_date: Optional[str] = None,
+    new_time: Optional[str] = None,
+    new_location: Optional[str] = None,
+    new_description: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> str:
+    """Versão assíncrona de `reschedule_appointment`."""
+    arguments = {"schedule_id": schedule_id, "new_date": new_date, "new_time": new_time, "new_location": new_location, "new_description": new_description}
+    try:
+        user_id = require_user(user_id)
+        schedules = await asyncio.to_thread(load_schedules, user_id)
+
+        if not schedules:
+            return "Nenhum compromisso encontrado para reagendar."
+
+        details, candidates = _resolve(schedules, query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(RescheduleDetails))
+            details = _checked(await structured_llm.ainvoke(_extraction_prompt(format_schedules(candidates), query)), candidates)
+
+        await asyncio.to_thread(_apply_reschedule, details)
 
-        db = SessionLocal()
-        update_schedule(db, schedule_id=details.schedule_id, new_date=new_date, new_time=details.new_time, new_location=details.new_location, new_description=details.new_description)
-        db.close()
-        
         return "Compromisso reagendado com sucesso!"
     except Exception as e:
         return f"Erro ao reagendar compromisso: {e}"
 
-reschedule_tool = Tool(
+reschedule_tool = StructuredTool.from_function(
     name="reschedule_appointment",
     func=reschedule_appointment,
-    description="Use esta ferramenta para reagendar um compromisso existente.",
+    coroutine=areschedule_appointment,
+    description="Use esta ferramenta para reagendar um compromisso existente. Informe a nova data e hora sempre que estiverem no pedido.",
+    args_schema=RescheduleInput,
+    metadata={"read_only": False},
 )
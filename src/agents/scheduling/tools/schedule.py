@@ -1,10 +1,13 @@
-from langchain.agents import Tool
+import asyncio
+from typing import Optional
+from langchain.tools import StructuredTool
 from src.database.crud import create_schedule
 from src.database.models import SessionLocal
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field
+from src.llm import with_escalation
+from src.extraction import complete_fields, normalize_arguments
+from src.agents.agent_factory import require_user
+from pydantic import BaseModel, Field
 
 class ScheduleDetails(BaseModel):
     """Informações extraídas para agendar um compromisso."""
@@ -13,28 +16,82 @@ class ScheduleDetails(BaseModel):
     location: str = Field(description="O local do compromisso")
     description: str = Field(description="A descrição do compromisso")
 
-def schedule_appointment(query: str) -> str:
+class ScheduleAppointmentInput(BaseModel):
+    """Argumentos de `schedule_appointment`; campos omitidos são extraídos de `query`."""
+    query: str = Field("", description="O pedido original do usuário")
+    date: Optional[str] = Field(None, description="A data do compromisso, formato DD/MM/YYYY")
+    time: Optional[str] = Field(None, description="A hora do compromisso, formato HH:MM")
+    location: Optional[str] = Field(None, description="O local do compromisso")
+    description: Optional[str] = Field(None, description="A descrição do compromisso")
+
+def _local_details(query: str, arguments: dict) -> ScheduleDetails | None:
+    # Argumentos da chamada + extração local (pt-BR); o LLM só é chamado se algum campo obrigatório ficar indefinido
+    fields = complete_fields("schedule", query, arguments)
+    return ScheduleDetails(**fields) if fields is not None else None
+
+def _extraction_prompt(query: str) -> str:
+    return f"Extraia os detalhes do seguinte pedido de agendamento: '{query}'"
+
+def _save_schedule(details: ScheduleDetails, user_id: str) -> None:
+    date = datetime.strptime(details.date, '%d/%m/%Y')
+
+    db = SessionLocal()
+    create_schedule(db, user_id=user_id, date=date, time=details.time, location=details.location, description=details.description)
+    db.close()
+
+def schedule_appointment(
+    query: str = "",
+    date: Optional[str] = None,
+    time: Optional[str] = None,
+    location: Optional[str] = None,
+    description: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> str:
     """
-    Analisa a consulta usando um LLM para extrair detalhes do agendamento e o salva no banco de dados.
+    Agenda o compromisso com os argumentos informados, extraindo de `query` os que faltarem.
     """
+    arguments = {"date": date, "time": time, "location": location, "description": description}
     try:
-        llm = ChatOpenAI(temperature=0, model="gpt-4o")
-        structured_llm = llm.with_structured_output(ScheduleDetails)
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(ScheduleDetails))
+            details = structured_llm.invoke(_extraction_prompt(query)).model_copy(update=normalize_arguments(arguments))
+
+        _save_schedule(details, user_id)
+        
+        return "Compromisso agendado com sucesso no banco de dados!"
+    except Exception as e:
+        return f"Erro ao agendar compromisso: {e}"
 
-        details = structured_llm.invoke(f"Extraia os detalhes do seguinte pedido de agendamento: '{query}'")
+async def aschedule_appointment(
+    query: str = "",
+    date: Optional[str] = None,
+    time: Optional[str] = None,
+    location: Optional[str] = None,
+    description: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> str:
+    """Versão assíncrona de `schedule_appointment`."""
+    arguments = {"date": date, "time": time, "location": location, "description": description}
+    try:
+        user_id = require_user(user_id)
+        details = _local_details(query, arguments)
+        if details is None:
+            structured_llm = with_escalation("extractor", lambda llm: llm.with_structured_output(ScheduleDetails))
+            details = (await structured_llm.ainvoke(_extraction_prompt(query))).model_copy(update=normalize_arguments(arguments))
 
-        date = datetime.strptime(details.date, '%d/%m/%Y')
+        await asyncio.to_thread(_save_schedule, details, user_id)
 
-        db = SessionLocal()
-        create_schedule(db, user_id="user1", date=date, time=details.time, location=details.location, description=details.description)
-        db.close()
-        
         return "Compromisso agendado com sucesso no banco de dados!"
     except Exception as e:
         return f"Erro ao agendar compromisso: {e}"
 
-schedule_tool = Tool(
+schedule_tool = StructuredTool.from_function(
     name="schedule_appointment",
     func=schedule_appointment,
-    description="Use esta ferramenta para agendar um novo compromisso a partir de uma consulta em linguagem natural.",
+    coroutine=aschedule_appointment,
+    description="Use esta ferramenta para agendar um novo compromisso. Informe data, hora, local e descrição sempre que estiverem no pedido.",
+    args_schema=ScheduleAppointmentInput,
+    metadata={"read_only": False},
 )
@@ -1,5 +1,6 @@
 from src.tools.scheduling_tools import scheduling_tools
 from .agent_factory import build_agent_executor
+from .registry import agent_registry
 
 SYSTEM_PROMPT = """Você é um assistente de agendamento com foco em eficiência e clareza. Objetivo: ajudar a planejar, coordenar e confirmar compromissos de forma prática e sem ambiguidades.
 Instruções importantes:
@@ -9,8 +10,16 @@ Instruções importantes:
 - Ao mencionar horários, sempre inclua o fuso horário e qualquer conversão relevante.
 - Proteja informações sensíveis do usuário e não compartilhe dados sem permissão explícita."""
 
-scheduling_agent_executor = build_agent_executor(
-    system_prompt=SYSTEM_PROMPT,
-    tools=scheduling_tools,
-    verbose=True
-)
+def _build():
+    return build_agent_executor(
+        system_prompt=SYSTEM_PROMPT,
+        tools=scheduling_tools,
+    )
+
+agent_registry.register("scheduling_legacy", _build)
+
+def __getattr__(name):
+    # Construído no primeiro acesso (e guardado) pelo registro de agentes
+    if name == "scheduling_agent_executor":
+        return agent_registry.get("scheduling_legacy")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
-from src.database.models import Schedule, Finance
-from datetime import datetime
+from src.database.models import Schedule, Finance, Job
+from datetime import datetime, timedelta
+import json
 
 def create_schedule(db: Session, user_id: str, date: datetime, time: str, location: str, description: str):
     schedule = Schedule(user_id=user_id, date=date, time=time, location=location, description=description)
@@ -40,3 +41,80 @@ def create_finance(db: Session, user_id: str, amount: float, description: str, d
 
 def get_finances(db: Session, user_id: str):
     return db.query(Finance).filter(Finance.user_id == user_id).all()
+
+
+def create_job(db: Session, job_id: str, user_id: str, query: str):
+    now = datetime.utcnow()
+    job = Job(id=job_id, user_id=user_id, query=query, status="pending", events="[]", created_at=now, updated_at=now)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: str):
+    return db.query(Job).filter(Job.id == job_id).first()
+
+def claim_job(db: Session, job_id: str) -> bool:
+    """Marca o job como 'running' apenas se ainda estiver 'pending' (atômico entre workers)."""
+    claimed = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.status == "pending")
+        .update({Job.status: "running", Job.updated_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+def append_job_event(db: Session, job_id: str, event: dict):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if job:
+        job.events = json.dumps(json.loads(job.events or "[]") + [event], ensure_ascii=False, default=str)
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    return job
+
+def finish_job(db: Session, job_id: str, status: str, result: str | None, error: str | None, ttl_seconds: float):
+    # Só quem ainda detém a concessão encerra o job (um job recuperado como 'failed' não volta)
+    job = db.query(Job).filter(Job.id == job_id, Job.status == "running").first()
+    if job:
+        now = datetime.utcnow()
+        job.status = status
+        job.result = result
+        job.error = error
+        job.updated_at = now
+        job.expires_at = now + timedelta(seconds=ttl_seconds)
+        db.commit()
+    return job
+
+def renew_job_lease(db: Session, job_id: str) -> bool:
+    """Heartbeat do worker: renova a concessão (``updated_at``) de um job ainda 'running'."""
+    renewed = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.status == "running")
+        .update({Job.updated_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return renewed == 1
+
+def recover_stale_jobs(db: Session, stale_before: datetime, ttl_seconds: float) -> list[str]:
+    """Marca como 'failed' jobs 'running' sem heartbeat desde ``stale_before`` e lista os pendentes.
+
+    Sem heartbeat o worker morreu no meio da execução; ferramentas de escrita já podem ter
+    rodado, então o job não é executado de novo.
+    """
+    now = datetime.utcnow()
+    db.query(Job).filter(Job.status == "running", Job.updated_at < stale_before).update(
+        {
+            Job.status: "failed",
+            Job.error: "execução interrompida: o worker parou de renovar a concessão do job",
+            Job.updated_at: now,
+            Job.expires_at: now + timedelta(seconds=ttl_seconds),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return [job_id for (job_id,) in db.query(Job.id).filter(Job.status == "pending").order_by(Job.created_at).all()]
+
+def delete_expired_jobs(db: Session, now: datetime) -> int:
+    deleted = db.query(Job).filter(Job.expires_at.isnot(None), Job.expires_at < now).delete(synchronize_session=False)
+    db.commit()
+    return deleted
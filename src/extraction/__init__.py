@@ -0,0 +1,25 @@
+from .ptbr import (
+    complete_fields,
+    extract_investment,
+    extract_locally,
+    extract_schedule,
+    extract_transfer,
+    extraction_stats,
+    normalize_arguments,
+    parse_amount,
+    parse_date,
+    parse_time,
+)
+
+__all__ = [
+    "complete_fields",
+    "extract_investment",
+    "extract_locally",
+    "extract_schedule",
+    "extract_transfer",
+    "extraction_stats",
+    "normalize_arguments",
+    "parse_amount",
+    "parse_date",
+    "parse_time",
+]
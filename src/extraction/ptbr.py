@@ -0,0 +1,403 @@
+"""Extração local de parâmetros em português do Brasil (datas, horas, valores e nomes).
+
+Cobre as formas mais comuns dos pedidos de agendamento e das operações financeiras
+("amanhã às 10h", "sexta que vem", "15/03", "R$ 1.500,00", "para a Ana", "no escritório").
+Cada função devolve ``None`` quando o campo não aparece ou é ambíguo (ex.: duas datas
+diferentes); nesse caso as ferramentas recorrem à extração via LLM.
+
+Convenções de data: dia da semana sozinho ("sexta") é a próxima ocorrência depois de
+hoje; com "que vem"/"próxima" é a ocorrência da semana seguinte (semanas começam na
+segunda). "15/03" sem ano é a próxima ocorrência dessa data.
+"""
+import os
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from src.utils.intents import normalize_text
+
+WEEKDAYS = {"segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6}
+MONTHS = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+_ARTICLES = {"o", "a", "os", "as", "um", "uma"}
+# Palavras que encerram um nome de destinatário ou de local
+_PHRASE_STOP = {
+    "as", "a", "ao", "de", "do", "da", "no", "na", "em", "para", "pra", "com", "sobre", "por", "pelo", "pela",
+    "via", "hoje", "amanha", "depois", "dia", "proxima", "proximo", "que", "e", "ate", "desde",
+    "r$", "reais", "real", "mil", "horas", "hora", "meio", "meia", "manha", "tarde", "noite",
+} | set(WEEKDAYS) | set(MONTHS)
+_NOT_RECIPIENT = {"mim", "minha", "meu", "conta", "poupanca", "voce", "ele", "ela"}
+_EVENT_NOUNS = (
+    "reuniao", "consulta", "dentista", "medico", "almoco", "jantar", "cafe", "call",
+    "entrevista", "aula", "compromisso", "evento", "visita", "apresentacao",
+)
+
+
+def _unique(values: List[Any]) -> Optional[Any]:
+    distinct = list(dict.fromkeys(values))
+    return distinct[0] if len(distinct) == 1 else None
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _weekday_date(weekday: int, today: date, next_week: bool) -> date:
+    if next_week:
+        monday_next_week = today + timedelta(days=7 - today.weekday())
+        return monday_next_week + timedelta(days=weekday)
+    ahead = (weekday - today.weekday()) % 7 or 7
+    return today + timedelta(days=ahead)
+
+
+def _date_candidates(text: str, today: date) -> List[date]:
+    candidates: List[Optional[date]] = []
+    if re.search(r"\bdepois de amanha\b", text):
+        candidates.append(today + timedelta(days=2))
+    elif re.search(r"\bamanha\b", text):
+        candidates.append(today + timedelta(days=1))
+    if re.search(r"\bhoje\b", text):
+        candidates.append(today)
+    for m in re.finditer(r"\bdaqui a (\d+|uma|um) (dias?|semanas?)\b", text):
+        n = 1 if m.group(1) in ("um", "uma") else int(m.group(1))
+        candidates.append(today + timedelta(days=n * (7 if m.group(2).startswith("semana") else 1)))
+    for m in re.finditer(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b", text):
+        day, month = int(m.group(1)), int(m.group(2))
+        if m.group(3):
+            year = int(m.group(3))
+            candidates.append(_safe_date(year + 2000 if year < 100 else year, month, day))
+        else:
+            found = _safe_date(today.year, month, day)
+            if found is not None and found < today:
+                found = _safe_date(today.year + 1, month, day)
+            candidates.append(found)
+    for m in re.finditer(r"\b(\d{1,2}) de (" + "|".join(MONTHS) + r")(?: de (\d{4}))?\b", text):
+        day, month = int(m.group(1)), MONTHS[m.group(2)]
+        found = _safe_date(int(m.group(3)) if m.group(3) else today.year, month, day)
+        if found is not None and not m.group(3) and found < today:
+            found = _safe_date(today.year + 1, month, day)
+        candidates.append(found)
+    for m in re.finditer(r"\bdia (\d{1,2})\b(?! de |/)", text):
+        found = _safe_date(today.year, today.month, int(m.group(1)))
+        if found is not None and found < today:
+            next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+            found = _safe_date(next_month.year, next_month.month, int(m.group(1)))
+        candidates.append(found)
+    weekday_pattern = (
+        r"\b(proxima |proximo )?(" + "|".join(WEEKDAYS) + r")(?:[- ]feira)?( que vem| da semana que vem)?\b"
+    )
+    for m in re.finditer(weekday_pattern, text):
+        candidates.append(_weekday_date(WEEKDAYS[m.group(2)], today, bool(m.group(1) or m.group(3))))
+    return [c for c in candidates if c is not None]
+
+
+def parse_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    """Data mencionada em ``text`` (relativa a ``today``) ou ``None`` se ausente/ambígua."""
+    return _unique(_date_candidates(normalize_text(text), today or date.today()))
+
+
+def mentioned_dates(text: str, today: Optional[date] = None) -> List[date]:
+    """Todas as datas distintas mencionadas em ``text``, na ordem em que aparecem."""
+    return list(dict.fromkeys(_date_candidates(normalize_text(text), today or date.today())))
+
+
+# Minutos por extenso em "9 e meia", "10 e quinze" e "quinze para as 10"
+_MINUTE_WORDS = {
+    "cinco": 5, "dez": 10, "quinze": 15, "vinte": 20, "vinte e cinco": 25, "meia": 30, "trinta": 30,
+    "trinta e cinco": 35, "quarenta": 40, "quarenta e cinco": 45, "cinquenta": 50, "cinquenta e cinco": 55,
+}
+_MINUTES = r"(" + "|".join(sorted(_MINUTE_WORDS, key=len, reverse=True)) + r"|\d{1,2})"
+
+
+def _minutes(raw: str) -> int:
+    return _MINUTE_WORDS[raw] if raw in _MINUTE_WORDS else int(raw)
+
+
+def _time_candidates(normalized: str) -> List[tuple]:
+    candidates = []
+    seen_spans = []
+    midday = re.search(r"\bmeio[- ]dia(?: e (meia|quinze))?\b", normalized)
+    if midday:
+        candidates.append((12, _minutes(midday.group(1)) if midday.group(1) else 0))
+    if re.search(r"\bmeia[- ]noite\b", normalized):
+        candidates.append((0, 0))
+    # "quinze para as 10" é 09:45; a hora citada não vira outro candidato
+    for m in re.finditer(_MINUTES + r" (?:minutos )?para as (\d{1,2})\b(?![/:,.]\d)", normalized):
+        seen_spans.append(m.span())
+        before = _minutes(m.group(1))
+        candidates.append(((int(m.group(2)) - 1) % 24, 60 - before) if 0 < before < 60 else (99, 0))
+    patterns = (
+        r"\b(\d{1,2})(?::|h)(\d{2})\b",
+        r"\b(\d{1,2}) ?(?:h|hs|hrs?|horas?)\b()",
+        r"\bas (\d{1,2})\b(?![/:,.]\d)()",
+    )
+    for pattern in patterns:
+        for m in re.finditer(pattern, normalized):
+            if any(start <= m.start(1) < end for start, end in seen_spans):
+                continue
+            seen_spans.append(m.span())
+            hour, minute, end = int(m.group(1)), int(m.group(2) or 0), m.end()
+            fraction = None if m.group(2) else re.match(r" e " + _MINUTES + r"( min(?:utos?)?)?\b", normalized[end:])
+            if fraction and fraction.group(1).isdigit() and not fraction.group(2):
+                minute = 99  # "às 9 e 20" pode ser hora ou o início de outro pedido: ambíguo
+            elif fraction:
+                minute, end = _minutes(fraction.group(1)), end + fraction.end()
+            period = re.match(r"(?: ?(?:h|hs|hrs?|horas?)?)? da (tarde|noite|manha|madrugada)", normalized[end:])
+            if period and period.group(1) in ("tarde", "noite") and hour < 12:
+                hour += 12
+            candidates.append((hour, minute))
+    return candidates
+
+
+def parse_time(text: str) -> Optional[str]:
+    """Hora no formato ``HH:MM`` ("10h", "10h30", "14:00", "às 9 e meia", "quinze para as 10",
+    "3 da tarde", "meio-dia")."""
+    candidates = _time_candidates(normalize_text(text))
+    valid = [f"{h:02d}:{m:02d}" for h, m in candidates if h < 24 and m < 60]
+    return _unique(valid) if len(valid) == len(candidates) else None
+
+
+def mentioned_times(text: str) -> List[str]:
+    """Todas as horas válidas e distintas (``HH:MM``) mencionadas em ``text``."""
+    valid = [f"{h:02d}:{m:02d}" for h, m in _time_candidates(normalize_text(text)) if h < 24 and m < 60]
+    return list(dict.fromkeys(valid))
+
+
+def _to_number(raw: str) -> Optional[float]:
+    if "," in raw:
+        raw = raw.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", raw):
+        raw = raw.replace(".", "")
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """Valor em reais ("R$ 1.500,00", "1500 reais", "2 mil", "R$ 1,5 mil").
+
+    Exige "R$", "reais" ou "mil": um número solto pode ser quantidade ("2 boletos") ou
+    conta ("conta 12345"), e transferências e investimentos não podem adivinhar o valor.
+    """
+    normalized = normalize_text(text)
+    number = r"(\d[\d.]*(?:,\d+)?)"
+    values = []
+    currency = r"r\$ ?" + number + r"( mil)?|" + number + r"(?:( mil)(?: de)?(?: reais| real)?\b|(?: de)? (?:reais|real)\b)"
+    for m in re.finditer(currency, normalized):
+        raw, thousand = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        value = _to_number(raw)
+        if value is not None:
+            values.append(value * 1000 if thousand else value)
+    return _unique(values)
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"R\$|[^\W\d_][\w'-]*|\d[\d.,:/]*|[,.;!?]", text)
+
+
+def _phrase_after(text: str, triggers: set, max_words: int = 4) -> List[List[str]]:
+    """Sequências de palavras que seguem um gatilho ("para", "no"...), até uma palavra de parada."""
+    tokens = _tokens(text)
+    normalized = [normalize_text(t) for t in tokens]
+    phrases = []
+    for i, token in enumerate(normalized):
+        if token not in triggers:
+            continue
+        j = i + 1
+        if j < len(tokens) and normalized[j] in _ARTICLES:
+            j += 1
+        words = []
+        content = 0  # conectivos não contam para ``max_words``
+        while j < len(tokens) and content < max_words:
+            norm = normalized[j]
+            # Conectivos continuam o nome se a próxima palavra também fizer parte dele ("Banco do Brasil")
+            if (
+                norm in ("de", "do", "da", "dos", "das") and words and content < max_words - 1
+                and j + 1 < len(tokens) and tokens[j + 1][:1].isalpha() and normalized[j + 1] not in _PHRASE_STOP
+            ):
+                words.append(tokens[j])
+                j += 1
+                continue
+            # Números curtos completam nomes ("Sala 3"), mas não horas ("10h")
+            is_label_number = (
+                words and re.fullmatch(r"\d{1,4}", tokens[j])
+                and (j + 1 >= len(tokens) or normalized[j + 1] not in ("h", "hs", "horas", "hora"))
+            )
+            if norm in _PHRASE_STOP or not (tokens[j][:1].isalpha() or is_label_number):
+                break
+            words.append(tokens[j])
+            content += 1
+            j += 1
+        if words:
+            phrases.append(words)
+    return phrases
+
+
+def parse_recipient(text: str) -> Optional[str]:
+    """Destinatário de uma transferência ("para a Ana Souza", "pro João")."""
+    names = []
+    for words in _phrase_after(text, {"para", "pra", "pro"}, max_words=4):
+        if normalize_text(words[0]) in _NOT_RECIPIENT:
+            continue
+        connectives = ("de", "do", "da", "dos", "das")
+        names.append(" ".join(w if w[:1].isupper() or w in connectives else w.capitalize() for w in words))
+    return _unique(names)
+
+
+def parse_location(text: str) -> Optional[str]:
+    """Local de um compromisso ("no escritório", "na Sala 3", "em São Paulo")."""
+    places = []
+    for words in _phrase_after(text, {"no", "na", "em", "nos", "nas"}, max_words=4):
+        places.append(" ".join(words))
+    return _unique(places)
+
+
+def parse_event_description(text: str) -> Optional[str]:
+    """Descrição curta do compromisso ("reunião com a Ana", "consulta no dentista")."""
+    tokens = _tokens(text)
+    normalized = [normalize_text(t) for t in tokens]
+    for i, token in enumerate(normalized):
+        if token in _EVENT_NOUNS:
+            words = [tokens[i]]
+            if i + 2 < len(tokens) and normalized[i + 1] in ("com", "de", "sobre", "do", "da"):
+                tail = _phrase_after(" ".join(tokens[i + 1:]), {normalized[i + 1]}, max_words=4)
+                if tail:
+                    words += [tokens[i + 1]] + tail[0]
+            return " ".join(words)
+    return None
+
+
+# Com 0, as ferramentas voltam a extrair tudo via LLM
+LOCAL_EXTRACTION_ENABLED = os.getenv("LOCAL_EXTRACTION_ENABLED", "1") == "1"
+
+
+class ExtractionStats:
+    """Origem dos campos de cada extração, por tipo: argumentos tipados do agente,
+    extração local ou LLM. ``local_ratio`` é a fração resolvida sem chamar o LLM."""
+
+    def __init__(self):
+        self.arguments: Dict[str, int] = {}
+        self.local: Dict[str, int] = {}
+        self.fallback: Dict[str, int] = {}
+
+    def record(self, kind: str, source: str) -> None:
+        counter = {"arguments": self.arguments, "local": self.local}.get(source, self.fallback)
+        counter[kind] = counter.get(kind, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        resolved = sum(self.arguments.values()) + sum(self.local.values())
+        total = resolved + sum(self.fallback.values())
+        return {
+            "arguments": dict(self.arguments),
+            "local": dict(self.local),
+            "llm_fallback": dict(self.fallback),
+            "local_ratio": resolved / total if total else 0.0,
+        }
+
+
+extraction_stats = ExtractionStats()
+
+_REQUIRED = {"schedule": ("date", "time"), "transfer": ("amount", "recipient"), "investment": ("amount",)}
+_DEFAULTS = {
+    "schedule": {"location": "Não informado", "description": "Compromisso"},
+    "investment": {"description": "Investimento"},
+}
+
+
+def normalize_date(value: str) -> str:
+    """Data informada pelo agente em DD/MM/YYYY (aceita ISO e formas relativas)."""
+    iso = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", value.strip())
+    parsed = _safe_date(*map(int, iso.groups())) if iso else parse_date(value)
+    return parsed.strftime("%d/%m/%Y") if parsed else value
+
+
+def normalize_time(value: str) -> str:
+    """Hora informada pelo agente em HH:MM (aceita "10h", "às 9 e meia" etc.)."""
+    return parse_time(value) or value
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Descarta argumentos vazios e normaliza campos de data e hora (``date``, ``new_time``...)."""
+    fields = {k: v for k, v in arguments.items() if v not in (None, "")}
+    for key, value in fields.items():
+        if isinstance(value, str) and key.endswith("date"):
+            fields[key] = normalize_date(value)
+        elif isinstance(value, str) and key.endswith("time"):
+            fields[key] = normalize_time(value)
+    return fields
+
+
+def extract_locally(kind: str, query: str) -> Optional[Dict[str, Any]]:
+    """Campos de ``kind`` (``schedule``, ``transfer`` ou ``investment``) ou ``None`` para usar o LLM."""
+    extractors = {"schedule": extract_schedule, "transfer": extract_transfer, "investment": extract_investment}
+    return extractors[kind](query) if LOCAL_EXTRACTION_ENABLED and query else None
+
+
+def complete_fields(kind: str, query: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Campos de ``kind`` a partir dos argumentos tipados da chamada, completados pela
+    extração local de ``query``; ``None`` se algum obrigatório continuar indefinido."""
+    given = normalize_arguments(arguments)
+    if all(name in given for name in _REQUIRED[kind]):
+        extraction_stats.record(kind, "arguments")
+        return {**_DEFAULTS.get(kind, {}), **given}
+    local = extract_locally(kind, query)
+    extraction_stats.record(kind, "local" if local is not None else "llm")
+    return {**local, **given} if local is not None else None
+
+
+def extract_schedule(query: str, today: Optional[date] = None) -> Optional[Dict[str, str]]:
+    """Campos de ``ScheduleDetails``; ``None`` se data ou hora não forem determinadas."""
+    when, at = parse_date(query, today), parse_time(query)
+    if when is None or at is None:
+        return None
+    return {
+        "date": when.strftime("%d/%m/%Y"),
+        "time": at,
+        "location": parse_location(query) or "Não informado",
+        "description": parse_event_description(query) or "Compromisso",
+    }
+
+
+def extract_transfer(query: str) -> Optional[Dict[str, Any]]:
+    """Campos de ``TransferDetails``; ``None`` se valor ou destinatário não forem determinados."""
+    amount, recipient = parse_amount(query), parse_recipient(query)
+    if amount is None or recipient is None:
+        return None
+    return {"amount": amount, "recipient": recipient}
+
+
+def extract_investment(query: str) -> Optional[Dict[str, Any]]:
+    """Campos de ``InvestmentDetails``; ``None`` se o valor não for determinado."""
+    amount = parse_amount(query)
+    if amount is None:
+        return None
+    target = parse_location(query)
+    return {"amount": amount, "description": f"Investimento em {target}" if target else "Investimento"}
+
+
+__all__ = [
+    "ExtractionStats",
+    "complete_fields",
+    "extract_investment",
+    "extract_locally",
+    "extract_schedule",
+    "extract_transfer",
+    "extraction_stats",
+    "mentioned_dates",
+    "mentioned_times",
+    "normalize_arguments",
+    "normalize_date",
+    "normalize_time",
+    "parse_amount",
+    "parse_date",
+    "parse_event_description",
+    "parse_location",
+    "parse_recipient",
+    "parse_time",
+]
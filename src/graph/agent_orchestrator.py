@@ -3,16 +3,29 @@ from typing_extensions import TypedDict
 import operator
 from langchain_core.messages import BaseMessage, HumanMessage
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
+from langgraph.types import Send
+from src.llm import with_escalation
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from src.agents.finance.agent import finance_agent_executor
-from src.agents.scheduling.agent import scheduling_agent_executor
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from src.agents.registry import agent_registry
 from src.agents.agent_factory import set_current_user
 from src.schemas import OrchestratorState
 from functools import partial
+from src.routing.cache import get_routing_cache
+from src.routing.classifier import get_intent_classifier
+from src.graph.speculation import Speculation
+from src.agents.agent_factory import is_read_only
+from src.utils.intents import is_write_intent
+import time
+import os
+import re
 from src.prompts.orchestrator import ORCHESTRATOR_SYSTEM_PROMPT
+from src.observability import get_metrics_handler, get_tracing_handler
 
+# Executores construídos pelo registro no primeiro uso (compilar o grafo não os constrói)
+finance_agent_executor = agent_registry.proxy("Financeiro")
+scheduling_agent_executor = agent_registry.proxy("Agendamento")
 
 # Helper function to create a router for the graph
 def create_agent_router(llm, system_prompt, agents):
@@ -24,11 +37,134 @@ def create_agent_router(llm, system_prompt, agents):
     ).partial(agents=", ".join(agents))
     return prompt | llm | StrOutputParser()
 
+AGENT_NAMES = ("Financeiro", "Agendamento")
+ROUTES = AGENT_NAMES + ("END",)
+
+def join_routes(names) -> str:
+    """Vários agentes numa rota só, sem repetição e sempre na ordem de ``AGENT_NAMES``."""
+    return ",".join(name for name in AGENT_NAMES if name in set(names))
+
+def split_routes(next_agent: str) -> list[str]:
+    return [name for name in next_agent.split(",") if name]
+
+def _canonical_route(text: str) -> str | None:
+    cleaned = text.strip().strip("'\"`.*").strip()
+    for route in ROUTES:
+        if cleaned.lower() == route.lower():
+            return route
+    return None
+
+def parse_route(text: str) -> str:
+    """Normaliza a saída do roteador para um rótulo aceito pelo grafo (ou levanta ValueError).
+
+    Vários agentes separados por vírgula ("Financeiro, Agendamento") viram uma rota
+    múltipla, executada em paralelo.
+    """
+    route = _canonical_route(text)
+    if route is not None:
+        return route
+    parts = [_canonical_route(part) for part in re.split(r",|\+|\s+e\s+", text.strip()) if part.strip()]
+    if len(parts) > 1 and all(part in AGENT_NAMES for part in parts):
+        return join_routes(parts)
+    found = [route for route in ROUTES if re.search(rf"\b{route}\b", text, re.IGNORECASE)]
+    if len(found) == 1:
+        return found[0]
+    raise ValueError(f"Rota inválida retornada pelo roteador: {text!r}")
+
+def bypass_routing_cache(config: RunnableConfig | None) -> bool:
+    return bool((config or {}).get("configurable", {}).get("bypass_routing_cache", False))
+
+# Classificador local consultado antes do roteador LLM
+ROUTER_CLASSIFIER_ENABLED = os.getenv("ROUTER_CLASSIFIER_ENABLED", "1") == "1"
+ROUTER_CLASSIFIER_THRESHOLD = float(os.getenv("ROUTER_CLASSIFIER_THRESHOLD", "0.9"))
+ROUTER_CLASSIFIER_MODEL = os.getenv("ROUTER_CLASSIFIER_MODEL")
+# Depois que um agente respondeu, o roteador só é consultado de novo se algum trecho da
+# consulta tiver probabilidade mínima de pertencer a um agente que ainda não respondeu.
+ROUTER_FOLLOWUP_THRESHOLD = float(os.getenv("ROUTER_FOLLOWUP_THRESHOLD", "0.5"))
+
+# Especulação (opt-in): o agente provável roda junto com o roteador LLM
+ORCHESTRATOR_SPECULATIVE = os.getenv("ORCHESTRATOR_SPECULATIVE", "0") == "1"
+ROUTER_SPECULATION_THRESHOLD = float(os.getenv("ROUTER_SPECULATION_THRESHOLD", "0.5"))
+
+# Pedidos para mais de um agente são despachados em paralelo e as respostas combinadas
+ORCHESTRATOR_FAN_OUT = os.getenv("ORCHESTRATOR_FAN_OUT", "1") == "1"
+
+# Controle de laço: execuções de agentes por rodada e limite de passos do LangGraph
+ORCHESTRATOR_MAX_HOPS = int(os.getenv("ORCHESTRATOR_MAX_HOPS", str(len(AGENT_NAMES))))
+ORCHESTRATOR_RECURSION_LIMIT = int(
+    os.getenv("ORCHESTRATOR_RECURSION_LIMIT", str(2 * ORCHESTRATOR_MAX_HOPS + 3))
+)
+
+class HopStats:
+    """Contadores de saltos por rodada e dos motivos de encerramento."""
+
+    def __init__(self):
+        self.runs = 0
+        self.hops = 0
+        self.histogram: dict[int, int] = {}
+        self.reasons: dict[str, int] = {}
+
+    def record(self, hops: int, reason: str) -> None:
+        self.runs += 1
+        self.hops += hops
+        self.histogram[hops] = self.histogram.get(hops, 0) + 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "avg_hops": self.hops / self.runs if self.runs else 0.0,
+            "hops_histogram": dict(sorted(self.histogram.items())),
+            "terminations": dict(self.reasons),
+        }
+
+hop_stats = HopStats()
+
+def split_clauses(user_query: str) -> list[str]:
+    """Divide a consulta em trechos ("saldo e marque uma reunião" -> dois pedidos)."""
+    parts = re.split(r"[,;]|\s(?:e|depois|tamb[eé]m|al[eé]m disso)\s", user_query, flags=re.IGNORECASE)
+    return [part.strip() for part in parts if part and part.strip()]
+
+def mentions_agent(user_query: str, agent_names) -> bool:
+    """Algum trecho da consulta parece pertencer a um dos agentes informados?"""
+    classifier = get_intent_classifier(ROUTER_CLASSIFIER_MODEL)
+    for clause in split_clauses(user_query):
+        probs = classifier.predict_proba(clause)
+        if any(probs.get(name, 0.0) >= ROUTER_FOLLOWUP_THRESHOLD for name in agent_names):
+            return True
+    return False
+
+def build_router_chain():
+    # Modelo pequeno do registro; rótulo fora de ROUTES (ValueError em parse_route)
+    # repete a chamada no modelo de escalonamento do papel "router"
+    return with_escalation(
+        "router",
+        lambda llm: create_agent_router(llm, ORCHESTRATOR_SYSTEM_PROMPT, AGENT_NAMES) | RunnableLambda(parse_route),
+    )
+
+def fast_route(user_query: str) -> str | None:
+    """Rota do classificador local quando a confiança atinge o limiar; senão ``None``.
+
+    Se trechos distintos da consulta apontam com confiança para agentes diferentes, a rota
+    é múltipla (ex.: "Financeiro,Agendamento").
+    """
+    if not ROUTER_CLASSIFIER_ENABLED:
+        return None
+    classifier = get_intent_classifier(ROUTER_CLASSIFIER_MODEL)
+    clauses = split_clauses(user_query)
+    if ORCHESTRATOR_FAN_OUT and len(clauses) > 1:
+        labels = set()
+        for clause in clauses:
+            label, confidence = classifier.predict(clause)
+            if label in AGENT_NAMES and confidence >= ROUTER_CLASSIFIER_THRESHOLD:
+                labels.add(label)
+        if len(labels) > 1:
+            return join_routes(labels)
+    label, confidence = classifier.predict(user_query)
+    return label if confidence >= ROUTER_CLASSIFIER_THRESHOLD else None
+
 # Function to create the agent orchestrator graph
 def create_agent_orchestrator():
-    # Initialize LLM
-    llm = ChatOpenAI(temperature=0, model="gpt-4-turbo")
-
     # Define agents and their corresponding tools
     agents = {
         "Financeiro": finance_agent_executor,
@@ -36,40 +172,194 @@ def create_agent_orchestrator():
     }
 
     # Create the router chain
-    router_chain = create_agent_router(llm, ORCHESTRATOR_SYSTEM_PROMPT, agents.keys())
+    router_chain = build_router_chain()
+    routing_cache = get_routing_cache()
 
     # Define the nodes for the graph
-    def agent_node(state: OrchestratorState, agent_name: str):
-        agent_executor = agents[agent_name]
+    def _agent_input(state: OrchestratorState) -> dict:
         # Definir user_id de contexto para injeção automática em ferramentas
         uid = state.get("user_id") if isinstance(state, dict) else None
         if uid:
             set_current_user(uid)
         # AgentExecutors built by `build_agent_executor` expect an 'input' key.
-        last_msg = state["messages"][-1]
-        # Pass the text content as the 'input' to the agent executor
-        result = agent_executor.invoke({"input": last_msg.content})
+        # Cada agente recebe o pedido do usuário (a primeira mensagem), nunca a resposta
+        # do agente anterior; ele atende a parte da consulta que lhe cabe.
+        return {"input": _user_query(state)}
+
+    def _agent_output(result, agent_name: str, state: dict) -> dict:
         # Ensure the output is a BaseMessage
         if isinstance(result, dict) and "output" in result:
             message = HumanMessage(content=result["output"], name=agent_name)
         else:
             message = HumanMessage(content=str(result), name=agent_name)
-        return {"messages": [message], "sender": agent_name}
+        if state.get("fan_out"):
+            # Ramo paralelo: a resposta vai para o nó "merge", que monta a mensagem única
+            return {"branch_outputs": [message], "hops": 1}
+        return {"messages": [message], "sender": agent_name, "hops": 1}
+
+    def agent_node(state: OrchestratorState, agent_name: str):
+        result = agents[agent_name].invoke(_agent_input(state))
+        return _agent_output(result, agent_name, state)
 
-    def router_node(state: OrchestratorState):
-        # Get the last message from the state
-        last_message = state["messages"][-1]
+    async def aagent_node(state: OrchestratorState, agent_name: str):
+        speculated = state.get("speculation")
+        if speculated is not None and speculated.name == agent_name and not state.get("fan_out"):
+            # Resultado da execução especulativa confirmada pelo roteador
+            return {"messages": [speculated], "sender": agent_name, "hops": 1, "speculation": None}
+        result = await agents[agent_name].ainvoke(_agent_input(state))
+        return _agent_output(result, agent_name, state)
+
+    def _user_query(state: OrchestratorState) -> str:
         # The router needs to decide the next agent based on the user's query
         # which is the first message in this implementation
-        user_query = state["messages"][0].content
-        
-        # Invoke the router to decide the next agent
-        next_agent = router_chain.invoke({"messages": [HumanMessage(content=user_query)]})
-        
+        return state["messages"][0].content
+
+    def _answered(state: OrchestratorState) -> list[str]:
+        return [m.name for m in state["messages"] if getattr(m, "name", None) in agents]
+
+    def _first_hop(state: OrchestratorState) -> bool:
+        return not _answered(state)
+
+    def _termination(state: OrchestratorState) -> str | None:
+        """Motivo para encerrar sem consultar o roteador depois que um agente respondeu."""
+        answered = _answered(state)
+        if not answered:
+            return None
+        if state.get("hops", 0) >= (state.get("max_hops") or ORCHESTRATOR_MAX_HOPS):
+            return "max_hops"
+        if not str(state["messages"][-1].content).strip():
+            return "empty_answer"
+        pending = [name for name in agents if name not in answered]
+        if not pending:
+            return "all_answered"
+        # Vale com ou sem o classificador de rotas: ``mentions_agent`` só consulta o modelo local
+        if not mentions_agent(_user_query(state), pending):
+            return "answered"
+        return None
+
+    def _local_route(state: OrchestratorState, config: RunnableConfig | None) -> tuple[str | None, str]:
+        reason = _termination(state)
+        if reason is not None:
+            return "END", reason
+        if not _first_hop(state):
+            return None, "router"
+        user_query = _user_query(state)
+        if not bypass_routing_cache(config):
+            cached = routing_cache.get(user_query)
+            if cached is not None:
+                return cached, "cache"
+        # Casos óbvios são roteados localmente, sem chamada ao LLM
+        next_agent = fast_route(user_query)
+        if next_agent is None:
+            return None, "router"  # a decisão fica com o roteador LLM
+        routing_cache.set(user_query, next_agent)
+        return next_agent, "classifier"
+
+    def _router_input(state: OrchestratorState) -> dict:
+        # Na primeira rota basta a consulta; depois o roteador vê também as respostas dadas.
+        if _first_hop(state):
+            return {"messages": [HumanMessage(content=_user_query(state))]}
+        return {"messages": list(state["messages"])}
+
+    def _router_output(state: OrchestratorState, next_agent: str, reason: str) -> dict:
+        if next_agent != "END":
+            # Um agente nunca é chamado duas vezes na mesma rodada, e o paralelismo
+            # não ultrapassa o orçamento de saltos restante.
+            answered = _answered(state)
+            remaining = (state.get("max_hops") or ORCHESTRATOR_MAX_HOPS) - state.get("hops", 0)
+            targets = [name for name in split_routes(next_agent) if name not in answered]
+            if not ORCHESTRATOR_FAN_OUT:
+                remaining = min(remaining, 1)
+            targets = targets[:max(remaining, 0)]
+            if not targets:
+                next_agent, reason = "END", "revisit"
+            else:
+                next_agent = join_routes(targets)
         if next_agent == "END":
-            return {"next_agent": "END"}
+            hop_stats.record(state.get("hops", 0), reason)
         return {"next_agent": next_agent}
 
+    def _dispatch(state: OrchestratorState):
+        targets = split_routes(state["next_agent"])
+        if len(targets) == 1:
+            return targets[0]
+        # Cada ramo recebe o estado atual; os agentes rodam no mesmo passo do grafo
+        return [Send(name, {**state, "fan_out": True}) for name in targets]
+
+    def _after_agent(state: OrchestratorState) -> str:
+        return "merge" if state.get("branch_outputs") else "router"
+
+    def _after_router(state: OrchestratorState):
+        route = _dispatch(state)
+        if route == "END" and len(_answered(state)) > 1:
+            # Agentes executados em sequência: as respostas também viram uma mensagem única
+            return "merge"
+        return route
+
+    def merge_node(state: OrchestratorState) -> dict:
+        fan_out = bool(state.get("branch_outputs"))
+        answers = state["branch_outputs"] if fan_out else [m for m in state["messages"] if m.name in agents]
+        by_agent = {message.name: message for message in answers}
+        names = [name for name in AGENT_NAMES if name in by_agent]
+        content = "\n\n".join(str(by_agent[name].content).strip() for name in names)
+        if fan_out:
+            hop_stats.record(state.get("hops", 0), "fan_out")  # na sequência o roteador já registrou
+        return {
+            "messages": [HumanMessage(content=content, name=join_routes(names))],
+            "sender": "merge",
+        }
+
+    def router_node(state: OrchestratorState, config: RunnableConfig):
+        next_agent, reason = _local_route(state, config)
+        if next_agent is None:
+            # Invoke the router to decide the next agent
+            next_agent = parse_route(router_chain.invoke(_router_input(state)))
+            if _first_hop(state):
+                routing_cache.set(_user_query(state), next_agent)
+        return _router_output(state, next_agent, reason)
+
+    def _speculation_target(state: OrchestratorState) -> str | None:
+        """Agente a executar especulativamente, se houver um palpite seguro."""
+        if not ORCHESTRATOR_SPECULATIVE or not _first_hop(state):
+            return None
+        user_query = _user_query(state)
+        if is_write_intent(user_query):
+            return None  # a execução seria bloqueada na primeira ferramenta de escrita
+        label, confidence = get_intent_classifier(ROUTER_CLASSIFIER_MODEL).predict(user_query)
+        if label not in agents or confidence < ROUTER_SPECULATION_THRESHOLD:
+            return None
+        tools = getattr(agents[label], "tools", None)
+        if tools is not None and not any(is_read_only(t) for t in tools):
+            return None
+        return label
+
+    async def arouter_node(state: OrchestratorState, config: RunnableConfig):
+        next_agent, reason = _local_route(state, config)
+        speculated = None
+        if next_agent is None:
+            guess = _speculation_target(state)
+            speculation = None
+            if guess is not None:
+                agent_input = _agent_input(state)
+                speculation = Speculation(guess, partial(agents[guess].ainvoke, agent_input))
+            started = time.perf_counter()
+            try:
+                next_agent = parse_route(await router_chain.ainvoke(_router_input(state)))
+            except BaseException:
+                if speculation is not None:
+                    await speculation.cancel()
+                raise
+            if _first_hop(state):
+                routing_cache.set(_user_query(state), next_agent)
+            if speculation is not None:
+                result = await speculation.resolve(next_agent, time.perf_counter() - started)
+                if result is not None:
+                    speculated = _agent_output(result, guess, {})["messages"][0]
+        output = _router_output(state, next_agent, reason)
+        if speculated is not None and output["next_agent"] == speculated.name:
+            output["speculation"] = speculated
+        return output
+
     # Build the graph
     workflow = StateGraph(OrchestratorState)
 
@@ -77,32 +367,45 @@ def create_agent_orchestrator():
     for agent_name in agents.keys():
         workflow.add_node(
             agent_name,
-            partial(agent_node, agent_name=agent_name),
+            RunnableLambda(
+                partial(agent_node, agent_name=agent_name),
+                afunc=partial(aagent_node, agent_name=agent_name),
+                name=agent_name,
+            ),
         )
 
-    # Add the router node
-    workflow.add_node("router", router_node)
+    # Add the router node (sync for `invoke`/`stream`, async for `ainvoke`/`astream_events`)
+    workflow.add_node("router", RunnableLambda(router_node, afunc=arouter_node, name="router"))
 
     # Set the entry point
     workflow.set_entry_point("router")
 
-    # Add edges from the router to the agents
+    # Respostas dos ramos paralelos são combinadas num único nó
+    workflow.add_node("merge", RunnableLambda(merge_node, name="merge"))
+    workflow.add_edge("merge", END)
+
+    # Add edges from the agents back to the router (or to the merge after a fan-out)
     for agent_name in agents.keys():
-        workflow.add_edge(agent_name, "router")
+        workflow.add_conditional_edges(agent_name, _after_agent, {"router": "router", "merge": "merge"})
 
-    # Add conditional edges from the router
+    # Add conditional edges from the router (a multi-agent route becomes one Send per agent)
     workflow.add_conditional_edges(
         "router",
-        lambda state: state["next_agent"],
+        _after_router,
         {
             "Financeiro": "Financeiro",
             "Agendamento": "Agendamento",
+            "merge": "merge",
             "END": END,
         },
     )
 
-    # Compile the graph
-    return workflow.compile()
+    # Compile the graph (o limite de passos vale para qualquer chamada sem limite próprio)
+    # Os handlers de métricas e de rastreamento são herdados por todos os nós, LLMs e ferramentas
+    return workflow.compile().with_config(
+        recursion_limit=ORCHESTRATOR_RECURSION_LIMIT, callbacks=[get_metrics_handler(), get_tracing_handler()]
+    )
 
-# Create the orchestrator instance
-agent_orchestrator = create_agent_orchestrator()
+# Grafo compilado no primeiro uso e guardado no registro de agentes
+agent_registry.register("orchestrator", create_agent_orchestrator)
+agent_orchestrator = agent_registry.proxy("orchestrator")
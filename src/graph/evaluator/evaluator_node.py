@@ -1,19 +1,29 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
+from src.llm import with_escalation
+from langchain_core.runnables import RunnableLambda
 from src.prompts.evaluator import EVALUATOR_SYSTEM_PROMPT
 from langchain_core.messages import BaseMessage
 from typing import TypedDict, Sequence, Literal, Annotated
 import operator
 from src.schemas import AgentState
 
+DECISIONS = ("finalizar", "perguntar_usuario", "trocar_para_financeiro", "trocar_para_agendamento")
+
+def parse_decision(text: str) -> str:
+    """Token de decisão do avaliador (ou ValueError, que escalona para o modelo maior)."""
+    decision = text.strip().strip("'\"`.*").strip().lower()
+    if decision not in DECISIONS:
+        raise ValueError(f"Decisão inválida retornada pelo avaliador: {text!r}")
+    return decision
+
 class Evaluator:
     def __init__(self, llm=None):
-        self.llm = llm or ChatOpenAI(temperature=0)
         self.prompt = ChatPromptTemplate.from_template(
             EVALUATOR_SYSTEM_PROMPT + "\n\nÚltima mensagem: {input}"
         )
-        self.chain = self.prompt | self.llm | StrOutputParser()
+        build = lambda model: self.prompt | model | StrOutputParser() | RunnableLambda(parse_decision)
+        self.chain = build(llm) if llm is not None else with_escalation("evaluator", build)
 
     def evaluate(self, state: AgentState):
         """
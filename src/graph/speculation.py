@@ -0,0 +1,84 @@
+"""Execução especulativa de agentes enquanto o roteador LLM decide a rota.
+
+O agente mais provável (classificador local) começa a rodar junto com a chamada ao
+roteador. Se o roteador concordar, o resultado já pronto (ou em andamento) é aproveitado;
+se discordar, a tarefa é cancelada. Dentro da execução especulativa só ferramentas com
+``metadata={"read_only": True}`` rodam: qualquer outra levanta ``SpeculativeWriteBlocked``
+e a especulação é descartada, deixando o agente rodar normalmente depois do roteador.
+"""
+import asyncio
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Optional
+
+from src.agents.agent_factory import SpeculativeWriteBlocked, set_speculative
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.blocked = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "blocked_writes": self.blocked,
+            "errors": self.errors,
+            "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+            "latency_saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """Execução especulativa de ``agent_name`` iniciada com ``factory()``."""
+
+    def __init__(self, agent_name: str, factory: Callable[[], Awaitable[Any]]):
+        self.agent_name = agent_name
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        speculation_stats.attempts += 1
+        self.task = asyncio.create_task(self._run(factory))
+
+    async def _run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        # A tarefa tem uma cópia própria do contexto: a marca não vaza para o roteador
+        set_speculative(True)
+        try:
+            return await factory()
+        finally:
+            self.finished = time.perf_counter()
+
+    async def cancel(self) -> None:
+        self.task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await self.task
+
+    async def resolve(self, route: str, router_seconds: float) -> Optional[Any]:
+        """Resultado do agente se ``route`` confirmar o palpite; senão ``None``."""
+        if route != self.agent_name:
+            speculation_stats.misses += 1
+            await self.cancel()
+            return None
+        try:
+            result = await self.task
+        except SpeculativeWriteBlocked:
+            speculation_stats.blocked += 1
+            return None
+        except Exception:
+            speculation_stats.errors += 1
+            return None
+        speculation_stats.hits += 1
+        # Sem especulação o agente começaria só depois do roteador
+        speculation_stats.saved_seconds += min(router_seconds, (self.finished or time.perf_counter()) - self.started)
+        return result
+
+
+__all__ = ["Speculation", "SpeculationStats", "speculation_stats"]
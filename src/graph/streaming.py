@@ -0,0 +1,76 @@
+from typing import Any, AsyncIterator, Iterable, Optional
+import json
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+def sse_frame(event: str, data: dict) -> str:
+    """Formata um evento no padrão Server-Sent Events (``event:``/``data:``)."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _message_text(message: Any) -> str:
+    return getattr(message, "content", None) or ""
+
+
+async def stream_orchestrator_events(
+    orchestrator: Runnable,
+    state: dict,
+    agent_names: Iterable[str] = ("Financeiro", "Agendamento"),
+    config: Optional[RunnableConfig] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """Traduz ``astream_events`` do grafo em eventos de alto nível para o cliente.
+
+    Eventos emitidos: ``route`` (decisão do roteador), ``tool_start``/``tool_end``,
+    ``token`` (tokens do LLM dos agentes), ``agent`` (resposta de um agente),
+    ``final`` (resposta final) e ``error``. Fechar o iterador (``aclose``) cancela
+    a execução do grafo em andamento.
+    """
+    agents = set(agent_names)
+    # O nó do grafo e o runnable interno têm o mesmo nome; emite uma vez por passo.
+    seen: set = set()
+    events = orchestrator.astream_events(state, config=config, version="v2")
+    try:
+        async for ev in events:
+            kind = ev["event"]
+            name = ev.get("name")
+            metadata = ev.get("metadata", {})
+            node = metadata.get("langgraph_node")
+            data = ev.get("data", {})
+
+            if kind == "on_chain_end" and not ev.get("parent_ids"):
+                output = data.get("output") or {}
+                messages = output.get("messages") if isinstance(output, dict) else None
+                yield "final", {
+                    "response": _message_text(messages[-1]) if messages else "",
+                    "hops": output.get("hops", 0) if isinstance(output, dict) else 0,
+                }
+            elif kind == "on_chain_end" and name == "router" and node == "router":
+                output = data.get("output")
+                key = (name, metadata.get("langgraph_step"))
+                if isinstance(output, dict) and "next_agent" in output and key not in seen:
+                    seen.add(key)
+                    yield "route", {"next_agent": output["next_agent"]}
+            elif kind == "on_chain_end" and name in agents and node == name:
+                output = data.get("output")
+                # Em ramos paralelos a resposta sai em "branch_outputs" (combinada depois)
+                messages = (output.get("messages") or output.get("branch_outputs")) if isinstance(output, dict) else None
+                key = (name, metadata.get("langgraph_step"))
+                if messages and key not in seen:
+                    seen.add(key)
+                    yield "agent", {"agent": name, "output": _message_text(messages[-1])}
+            elif kind == "on_tool_start":
+                yield "tool_start", {"tool": name, "agent": node, "input": data.get("input")}
+            elif kind == "on_tool_end":
+                yield "tool_end", {"tool": name, "agent": node, "output": str(data.get("output"))}
+            elif kind == "on_chat_model_stream" and node in agents:
+                content = _message_text(data.get("chunk"))
+                if content:
+                    yield "token", {"agent": node, "content": content}
+    except Exception as e:
+        yield "error", {"detail": str(e)}
+    finally:
+        await events.aclose()
+
+
+__all__ = ["sse_frame", "stream_orchestrator_events"]
@@ -0,0 +1,36 @@
+from .cache import SQLiteLLMCache, get_llm_cache
+from .cassette import Cassette, CassetteMiss
+from .fake import ScriptedChatModel
+from .resilience import DeadlineExceeded, ResilientChatModel, request_budget, resilience_stats
+from .registry import (
+    ROLE_DEFAULTS,
+    aclose_llm_clients,
+    cache_enabled,
+    escalation_stats,
+    get_escalation_llm,
+    get_http_clients,
+    get_llm,
+    reset_llm_registry,
+    with_escalation,
+)
+
+__all__ = [
+    "Cassette",
+    "CassetteMiss",
+    "DeadlineExceeded",
+    "ROLE_DEFAULTS",
+    "ResilientChatModel",
+    "SQLiteLLMCache",
+    "ScriptedChatModel",
+    "aclose_llm_clients",
+    "cache_enabled",
+    "escalation_stats",
+    "get_escalation_llm",
+    "get_http_clients",
+    "get_llm",
+    "get_llm_cache",
+    "request_budget",
+    "reset_llm_registry",
+    "resilience_stats",
+    "with_escalation",
+]
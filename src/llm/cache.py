@@ -0,0 +1,146 @@
+"""Cache persistente de respostas de LLM (``langchain_core.caches.BaseCache``) em SQLite.
+
+A chave é o hash de ``llm_string`` (modelo, parâmetros e funções/schema vinculados) mais
+o prompt serializado, então só respostas de chamadas idênticas são reaproveitadas. É
+usado apenas em papéis com ``temperature=0``; extrações de ferramentas de escrita também
+podem ser cacheadas porque só interpretam texto: a escrita em si acontece depois, fora do LLM.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+
+def _generation_tokens(generations: Sequence[Any]) -> int:
+    total = 0
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None) or {}
+        total += usage.get("total_tokens", 0)
+    return total
+
+
+# Instâncias vivas, para o hook de fork único do módulo (hooks não podem ser removidos,
+# então um por instância reteria cada cache criado até o fim do processo)
+_live_caches: "weakref.WeakSet[SQLiteLLMCache]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for cache in list(_live_caches):
+        cache._reset_connection()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SQLiteLLMCache(BaseCache):
+    """Cache LRU com TTL; ``path=":memory:"`` mantém o cache só no processo."""
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 10000, ttl: float = 7 * 24 * 3600.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        _live_caches.add(self)
+
+    def _reset_connection(self) -> None:
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, tokens INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        return self._conn
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, tokens FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            self.saved_tokens += row[1]
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        value = dumps(list(return_val))
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, tokens, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, _generation_tokens(return_val), now + self.ttl, now),
+            )
+            db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            # Remove as entradas menos usadas recentemente acima do limite
+            db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            db.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM llm_cache")
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+_llm_cache: Optional[SQLiteLLMCache] = None
+
+
+def get_llm_cache() -> SQLiteLLMCache:
+    """Cache do processo, configurado por ``LLM_CACHE_PATH`` (padrão: em memória),
+    ``LLM_CACHE_MAX_ENTRIES`` e ``LLM_CACHE_TTL`` (segundos)."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SQLiteLLMCache(
+            path=os.getenv("LLM_CACHE_PATH") or ":memory:",
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+        )
+    return _llm_cache
+
+
+__all__ = ["SQLiteLLMCache", "get_llm_cache"]
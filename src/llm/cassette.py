@@ -0,0 +1,66 @@
+"""Gravação e reprodução de respostas de LLM (``LLM_BACKEND=record`` / ``replay``).
+
+Implementado como ``BaseCache``: em ``record`` toda chamada vai ao provedor e a resposta
+é anexada ao arquivo JSONL; em ``replay`` as respostas vêm só do arquivo e uma chamada
+não gravada levanta ``CassetteMiss`` (nada sai para a rede). A chave é a mesma do cache
+de respostas: ``llm_string`` (modelo, parâmetros, funções vinculadas) mais o prompt.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+
+class CassetteMiss(LookupError):
+    """Chamada ao LLM sem resposta gravada no cassete."""
+
+
+class Cassette(BaseCache):
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Modo de cassete inválido: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self._entries[row["key"]] = row["value"]
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self.mode == "record":
+            return None
+        value = self._entries.get(self._key(prompt, llm_string))
+        if value is None:
+            raise CassetteMiss(f"Chamada não gravada em {self.path}; grave com LLM_BACKEND=record")
+        return loads(value)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.mode != "record":
+            return
+        key = self._key(prompt, llm_string)
+        value = dumps(list(return_val))
+        with self._lock:
+            self._entries[key] = value
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self.mode == "record" and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+__all__ = ["Cassette", "CassetteMiss"]
@@ -0,0 +1,165 @@
+"""Modelo de chat roteirizado para testes e benchmarks sem rede (``LLM_BACKEND=fake``).
+
+O roteiro é um JSON com regras por papel (``router``, ``agent``, ``extractor``,
+``evaluator``); a primeira regra cujo ``match`` (regex) aparece nas mensagens do usuário
+define a resposta:
+
+- ``{"match": "saldo", "text": "Financeiro"}``: resposta em texto;
+- ``{"match": "saldo", "call": {"name": "get_balance", "arguments": {"query": "saldo"}}}``:
+  chamada de função (``functions=``) ou de ferramenta (``tools=``), se a função estiver vinculada;
+- ``{"match": "saldo.*tend", "calls": [{...}, {...}]}``: várias ferramentas no mesmo passo
+  (chamadas paralelas; só com ``tools=``);
+- ``{"match": "agend", "arguments": {...}}``: valores usados quando a saída estruturada
+  (``with_structured_output``) é forçada; campos ausentes recebem valores vazios do tipo.
+
+Depois do resultado de uma função, o modelo responde com o próprio resultado (os
+resultados de todas as ferramentas do último passo, um por linha). A latência
+de cada chamada segue ``latency`` (ver ``parse_latency``).
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from uuid import uuid4
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, FunctionMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+DEFAULT_SCRIPT_PATH = Path(__file__).parent / "data" / "fake_script.json"
+
+_EMPTY_BY_TYPE = {"string": "", "number": 0.0, "integer": 0, "boolean": False, "array": [], "object": {}}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """``"0.05"`` (constante), ``"uniform:0.01:0.2"``, ``"normal:média:desvio"`` ou
+    ``"lognormal:mu:sigma"``, em segundos."""
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind or 0)
+        return lambda rng: value
+    args = [float(p) for p in params.split(":")]
+    samplers = {
+        "uniform": lambda rng: rng.uniform(*args),
+        "normal": lambda rng: max(0.0, rng.gauss(*args)),
+        "lognormal": lambda rng: rng.lognormvariate(*args),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Distribuição de latência desconhecida: {spec!r}")
+    return samplers[kind]
+
+
+def load_script(path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    with open(path or DEFAULT_SCRIPT_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ScriptedChatModel(BaseChatModel):
+    role: str = "agent"
+    rules: List[Dict[str, Any]] = []
+    latency: str = "0"
+    seed: Optional[int] = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"role": self.role}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    def _rule(self, messages: Sequence[BaseMessage]) -> Dict[str, Any]:
+        text = "\n".join(str(m.content) for m in messages if isinstance(m, HumanMessage))
+        for rule in self.rules:
+            if re.search(rule.get("match", ""), text, re.IGNORECASE):
+                return rule
+        return {}
+
+    def _respond(self, messages: Sequence[BaseMessage], kwargs: Dict[str, Any]) -> AIMessage:
+        self.calls += 1
+        if messages and isinstance(messages[-1], FunctionMessage):
+            return AIMessage(content=str(messages[-1].content))
+        if messages and isinstance(messages[-1], ToolMessage):
+            results = []
+            for message in reversed(messages):
+                if not isinstance(message, ToolMessage):
+                    break
+                results.insert(0, str(message.content))
+            return AIMessage(content="\n".join(results))
+
+        rule = self._rule(messages)
+        functions = {f["name"]: f for f in kwargs.get("functions") or []}
+        tools = {t["function"]["name"]: t["function"] for t in kwargs.get("tools") or []}
+        calls = [c for c in rule.get("calls") or [] if c["name"] in tools]
+        if calls:
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": c["name"], "args": c.get("arguments", {}), "id": f"call_{uuid4().hex[:12]}"} for c in calls
+                ],
+            )
+        call = rule.get("call")
+        if tools and kwargs.get("tool_choice") and not call:
+            # Saída estruturada: preenche o schema com os argumentos do roteiro
+            name, spec = next(iter(tools.items()))
+            properties = spec.get("parameters", {}).get("properties", {})
+            provided = rule.get("arguments", {})
+            args = {k: provided.get(k, _EMPTY_BY_TYPE.get(v.get("type"), "")) for k, v in properties.items()}
+            call = {"name": name, "arguments": args}
+        if call and call["name"] in tools:
+            return AIMessage(
+                content="", tool_calls=[{"name": call["name"], "args": call.get("arguments", {}), "id": f"call_{uuid4().hex[:12]}"}]
+            )
+        if call and call["name"] in functions:
+            function_call = {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}), ensure_ascii=False)}
+            return AIMessage(content="", additional_kwargs={"function_call": function_call})
+        return AIMessage(content=rule.get("text", ""))
+
+    def _result(self, message: AIMessage, messages: Sequence[BaseMessage]) -> ChatResult:
+        # Contagem aproximada (4 caracteres por token) para métricas e caches
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        output_tokens = len(str(message.content) or json.dumps(message.additional_kwargs)) // 4 + 1
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self) -> float:
+        rng = random.Random(None if self.seed is None else self.seed + self.calls)
+        return parse_latency(self.latency)(rng)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages, kwargs)
+        time.sleep(self._delay())
+        return self._result(message, messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages, kwargs)
+        await asyncio.sleep(self._delay())
+        return self._result(message, messages)
+
+
+__all__ = ["ScriptedChatModel", "load_script", "parse_latency"]
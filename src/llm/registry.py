@@ -0,0 +1,291 @@
+"""Registro de modelos de chat do processo, por papel.
+
+Todos os clientes compartilham um único pool HTTP keep-alive (síncrono e assíncrono),
+então chamadas repetidas ao mesmo papel não refazem conexão nem handshake TLS. Os modelos
+não guardam o pool: cada envio usa o do processo atual, então modelos (e agentes)
+construídos antes de um ``fork`` seguem válidos nos workers, cada um com o próprio pool.
+
+Papéis e variáveis de ambiente:
+- ``router``, ``agent``, ``extractor``, ``evaluator``: ``LLM_<PAPEL>_MODEL`` e
+  ``LLM_<PAPEL>_TEMPERATURE`` sobrescrevem o modelo e a temperatura padrão;
+  ``LLM_<PAPEL>_TIMEOUT`` é o orçamento de latência de cada chamada (segundos).
+- Escalonamento: papéis de saída curta usam um modelo pequeno e, quando a saída falha na
+  validação, ``with_escalation`` repete a chamada em ``LLM_<PAPEL>_ESCALATION_MODEL``
+  (vazio desliga).
+- Pool: ``LLM_MAX_CONNECTIONS``, ``LLM_MAX_KEEPALIVE_CONNECTIONS``,
+  ``LLM_KEEPALIVE_EXPIRY`` (segundos).
+- Tempo limite: ``LLM_TIMEOUT`` (total, segundos) e ``LLM_CONNECT_TIMEOUT`` do pool HTTP.
+- Resiliência (``src.llm.resilience``, ``LLM_RESILIENCE=0`` desliga): ``LLM_MAX_RETRIES``
+  novas tentativas com jitter (base ``LLM_RETRY_BASE_DELAY``, teto ``LLM_RETRY_MAX_DELAY``)
+  e hedging nos papéis de ``LLM_HEDGE_ROLES`` (vazio = nenhum) após o quantil
+  ``LLM_HEDGE_QUANTILE`` (padrão 0.95) das latências observadas.
+- Backend (``LLM_BACKEND``): ``openai`` (padrão), ``fake`` (``ScriptedChatModel`` com o roteiro
+  de ``LLM_FAKE_SCRIPT`` e latência ``LLM_FAKE_LATENCY``), ``record`` ou ``replay`` (cassete
+  em ``LLM_CASSETTE``).
+- Cache de respostas (``src.llm.cache``): ``LLM_CACHE_ROLES`` lista os papéis cacheados
+  (padrão ``router,extractor,evaluator``; vazio desliga). Só vale com ``temperature=0``.
+"""
+import os
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_openai import ChatOpenAI
+
+from src.llm.cache import get_llm_cache
+from src.llm.cassette import Cassette
+from src.llm.fake import ScriptedChatModel, load_script
+from src.llm.resilience import ResilientChatModel
+from src.observability import record_fallback
+
+ROLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "router": {"model": "gpt-4o-mini", "temperature": 0.0, "timeout": 10.0, "escalation": "gpt-4-turbo"},
+    "agent": {"model": "gpt-3.5-turbo", "temperature": 0.0, "timeout": 60.0, "escalation": None},
+    "extractor": {"model": "gpt-4o-mini", "temperature": 0.0, "timeout": 20.0, "escalation": "gpt-4o"},
+    "evaluator": {"model": "gpt-4o-mini", "temperature": 0.0, "timeout": 10.0, "escalation": "gpt-4o"},
+}
+
+_lock = threading.Lock()
+_models: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], BaseChatModel] = {}
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+_cassette: Optional[Cassette] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        float(os.getenv("LLM_TIMEOUT", "60")),
+        connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+    )
+
+
+class _ProcessClient(httpx.Client):
+    """Cliente entregue aos modelos: cada requisição sai pelo pool do processo atual.
+
+    Modelos e agentes construídos no pai do pre-fork continuam válidos nos workers (e
+    compartilhados por copy-on-write): o pool é buscado a cada envio, nunca guardado.
+    """
+
+    def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return get_http_clients()[0].send(request, **kwargs)
+
+
+class _ProcessAsyncClient(httpx.AsyncClient):
+    """Versão assíncrona de ``_ProcessClient``."""
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await get_http_clients()[1].send(request, **kwargs)
+
+
+_model_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+
+
+def _get_model_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    global _model_clients
+    if _model_clients is None:
+        # Sem conexões próprias: só montam as requisições (timeouts) e delegam o envio
+        _model_clients = (_ProcessClient(timeout=_timeout()), _ProcessAsyncClient(timeout=_timeout()))
+    return _model_clients
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Clientes HTTP (síncrono e assíncrono) compartilhados por todos os modelos."""
+    global _http_client, _http_async_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+        if _http_async_client is None or _http_async_client.is_closed:
+            _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        return _http_client, _http_async_client
+
+
+def _role_config(role: str) -> Dict[str, Any]:
+    if role not in ROLE_DEFAULTS:
+        raise ValueError(f"Papel de LLM desconhecido: {role!r} (use {', '.join(ROLE_DEFAULTS)})")
+    prefix = f"LLM_{role.upper()}_"
+    config = dict(ROLE_DEFAULTS[role])
+    config["model"] = os.getenv(prefix + "MODEL", config["model"])
+    config["temperature"] = float(os.getenv(prefix + "TEMPERATURE", config["temperature"]))
+    config["timeout"] = float(os.getenv(prefix + "TIMEOUT", config["timeout"]))
+    config["escalation"] = os.getenv(prefix + "ESCALATION_MODEL", config["escalation"] or "") or None
+    return config
+
+
+def cache_enabled(role: str) -> bool:
+    roles = os.getenv("LLM_CACHE_ROLES", "router,extractor,evaluator")
+    return role in {r.strip() for r in roles.split(",") if r.strip()}
+
+
+def _get_cassette(mode: str) -> Cassette:
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(os.getenv("LLM_CASSETTE", "llm_cassette.jsonl"), mode=mode)
+    return _cassette
+
+
+def _build_model(role: str, options: Dict[str, Any]) -> BaseChatModel:
+    backend = os.getenv("LLM_BACKEND", "openai")
+    resilient = os.getenv("LLM_RESILIENCE", "1") == "1"
+    max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    # Com a camada de resiliência, cache e novas tentativas ficam no invólucro
+    cache = options.pop("cache", None) if resilient else options.get("cache")
+    if backend == "fake":
+        seed = os.getenv("LLM_FAKE_SEED")
+        model = ScriptedChatModel(
+            role=role,
+            rules=load_script(os.getenv("LLM_FAKE_SCRIPT")).get(role, []),
+            latency=os.getenv("LLM_FAKE_LATENCY", "0"),
+            seed=int(seed) if seed else None,
+            cache=None if resilient else cache,
+        )
+    elif backend in ("record", "replay", "openai"):
+        if backend != "openai":
+            cache = _get_cassette(backend)
+            options["cache"] = None if resilient else cache
+        http_client, http_async_client = _get_model_clients()
+        model = ChatOpenAI(
+            **options,
+            max_retries=0 if resilient else max_retries,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+    else:
+        raise ValueError(f"LLM_BACKEND desconhecido: {backend!r} (use openai, fake, record ou replay)")
+    if not resilient:
+        return model
+    hedge_roles = {r.strip() for r in os.getenv("LLM_HEDGE_ROLES", "").split(",") if r.strip()}
+    return ResilientChatModel(
+        inner=model,
+        role=role,
+        cache=cache,
+        attempt_timeout=_role_config(role)["timeout"],
+        max_retries=max_retries,
+        retry_base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25")),
+        retry_max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "4")),
+        hedge=role in hedge_roles,
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+    )
+
+
+def get_llm(role: str, **overrides: Any) -> BaseChatModel:
+    """Modelo de chat do processo para ``role``; ``overrides`` (ex.: ``temperature``) geram outra instância."""
+    key = (role, tuple(sorted(overrides.items())))
+    model = _models.get(key)
+    if model is not None:
+        return model
+    options = {**_role_config(role), **overrides}
+    options.pop("escalation")
+    if os.getenv("LLM_BACKEND", "openai") == "fake":
+        options.pop("timeout")
+    if "cache" not in options and cache_enabled(role) and options["temperature"] == 0:
+        options["cache"] = get_llm_cache()
+    model = _build_model(role, options)
+    with _lock:
+        return _models.setdefault(key, model)
+
+
+class EscalationStats:
+    """Chamadas repetidas no modelo de escalonamento, por papel."""
+
+    def __init__(self):
+        self.escalations: Dict[str, int] = {}
+
+    def record(self, role: str) -> None:
+        self.escalations[role] = self.escalations.get(role, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.escalations)
+
+
+escalation_stats = EscalationStats()
+
+
+def get_escalation_llm(role: str, **overrides: Any) -> Optional[BaseChatModel]:
+    """Modelo maior de ``role`` ou ``None`` se o papel não escalona."""
+    config = _role_config(role)
+    model = config["escalation"]
+    if not model or model == overrides.get("model", config["model"]):
+        return None
+    return get_llm(role, **{**overrides, "model": model})
+
+
+def _escalate(role: str, value: Any) -> Any:
+    escalation_stats.record(role)
+    record_fallback(f"escalation_{role}")
+    return value
+
+
+def with_escalation(
+    role: str,
+    build: Callable[[BaseChatModel], Runnable],
+    exceptions: Tuple[Type[BaseException], ...] = (ValueError,),
+    **overrides: Any,
+) -> Runnable:
+    """``build(modelo)`` com o modelo de ``role``; se falhar com ``exceptions`` (validação da
+    saída: ``OutputParserException`` e ``ValidationError`` são ``ValueError``), a mesma
+    entrada é repetida em ``build`` com o modelo de escalonamento."""
+    primary = build(get_llm(role, **overrides))
+    larger = get_escalation_llm(role, **overrides)
+    if larger is None:
+        return primary
+    escalated = RunnableLambda(partial(_escalate, role)) | build(larger)
+    return primary.with_fallbacks([escalated], exceptions_to_handle=exceptions)
+
+
+async def aclose_llm_clients() -> None:
+    """Fecha o pool compartilhado (shutdown da aplicação); novos clientes são criados sob demanda."""
+    global _http_client, _http_async_client
+    with _lock:
+        sync_client, async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+        _models.clear()
+    if async_client is not None:
+        await async_client.aclose()
+    if sync_client is not None:
+        sync_client.close()
+
+
+def reset_llm_registry() -> None:
+    """Descarta modelos, pool e cassete; a próxima ``get_llm`` relê o ambiente."""
+    global _http_client, _http_async_client, _cassette, _lock, _model_clients
+    _lock = threading.Lock()
+    _http_client = _http_async_client = _cassette = _model_clients = None
+    _models.clear()
+
+
+def _reset_after_fork() -> None:
+    # Conexões do pai não podem ser compartilhadas: o filho abre o próprio pool no primeiro
+    # envio. Os modelos (e os agentes que os usam) são mantidos, pois só referenciam os
+    # clientes de processo, que resolvem o pool a cada requisição.
+    global _http_client, _http_async_client, _lock
+    _lock = threading.Lock()
+    _http_client = _http_async_client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+__all__ = [
+    "EscalationStats",
+    "ROLE_DEFAULTS",
+    "aclose_llm_clients",
+    "cache_enabled",
+    "escalation_stats",
+    "get_escalation_llm",
+    "get_http_clients",
+    "get_llm",
+    "reset_llm_registry",
+    "with_escalation",
+]
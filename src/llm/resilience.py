@@ -0,0 +1,360 @@
+"""Camada de resiliência das chamadas de LLM: prazos, novas tentativas com jitter e hedging.
+
+``ResilientChatModel`` envolve o modelo de cada papel do registro:
+
+- Prazo: cada tentativa tem como limite o menor entre o orçamento do papel
+  (``LLM_<PAPEL>_TIMEOUT``) e o que resta do orçamento da requisição (``request_budget``,
+  propagado por contextvar). Sem orçamento restante a chamada falha com ``DeadlineExceeded``.
+- Novas tentativas: erros transitórios (timeout, conexão, 429, 5xx) são repetidos até
+  ``max_retries`` vezes com backoff exponencial e jitter completo, dentro do prazo.
+- Hedging (opcional, por papel): se a chamada passa do quantil ``hedge_quantile`` das
+  latências observadas do papel, uma cópia é disparada e vence a primeira a responder; a
+  outra é cancelada. Os tokens de prompt da cópia descartada entram em ``wasted_tokens``
+  (estimativa: a chamada cancelada já enviou o mesmo prompt).
+
+O caminho síncrono aplica prazo e novas tentativas, sem hedging (o limite de cada
+tentativa é o timeout HTTP do cliente). Streaming é repassado ao modelo interno, só com
+a verificação de prazo; se o modelo interno não faz streaming, a resposta sai em um chunk.
+"""
+import asyncio
+import contextvars
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from src.observability import record_llm_event
+
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Orçamento da requisição esgotado antes ou durante uma chamada ao LLM."""
+
+
+@contextmanager
+def request_budget(seconds: Optional[float] = None, deadline: Optional[float] = None):
+    """Define o prazo (``time.monotonic``) das chamadas de LLM feitas dentro do bloco."""
+    if deadline is None and seconds is not None:
+        deadline = time.monotonic() + seconds
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+        import openai
+    except ImportError:  # pragma: no cover
+        return False
+    transient = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+    return isinstance(exc, transient + (httpx.TransportError,))
+
+
+class LatencyWindow:
+    """Últimas ``size`` latências bem-sucedidas de um papel, para o atraso do hedging."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilienceStats:
+    """Contadores por papel: chamadas, novas tentativas, timeouts, hedges e tokens desperdiçados."""
+
+    _FIELDS = ("calls", "retries", "timeouts", "deadline_exceeded", "hedged", "hedge_wins", "wasted_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.roles: Dict[str, Dict[str, int]] = {}
+        self.windows: Dict[str, LatencyWindow] = {}
+
+    def window(self, role: str) -> LatencyWindow:
+        with self._lock:
+            return self.windows.setdefault(role, LatencyWindow())
+
+    def record(self, role: str, event: str, amount: int = 1) -> None:
+        with self._lock:
+            counters = self.roles.setdefault(role, dict.fromkeys(self._FIELDS, 0))
+            counters[event] += amount
+        record_llm_event(role, event, amount)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            roles = {role: dict(counters) for role, counters in self.roles.items()}
+        for role, counters in roles.items():
+            counters["p95_seconds"] = self.window(role).quantile(0.95)
+        return roles
+
+
+resilience_stats = ResilienceStats()
+
+
+def _prompt_tokens(result: ChatResult) -> int:
+    for generation in result.generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            return usage.get("input_tokens", 0)
+    return ((result.llm_output or {}).get("token_usage") or {}).get("prompt_tokens", 0)
+
+
+def _as_chunk(result: ChatResult) -> ChatGenerationChunk:
+    """Resposta completa como um único chunk (modelo interno sem streaming)."""
+    message = result.generations[0].message
+    tool_call_chunks = [
+        {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": i}
+        for i, call in enumerate(getattr(message, "tool_calls", None) or [])
+    ]
+    chunk = AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        usage_metadata=getattr(message, "usage_metadata", None),
+        tool_call_chunks=tool_call_chunks,
+        id=message.id,
+    )
+    return ChatGenerationChunk(message=chunk)
+
+
+class ResilientChatModel(BaseChatModel):
+    """Modelo de chat que delega a ``inner`` aplicando prazo, novas tentativas e hedging.
+
+    Tipo, parâmetros e ``llm_string`` são os do modelo interno: chaves de cache, cassetes
+    e métricas não mudam com o invólucro.
+    """
+
+    inner: BaseChatModel
+    role: str = "agent"
+    attempt_timeout: Optional[float] = None
+    max_retries: int = 2
+    retry_base_delay: float = 0.25
+    retry_max_delay: float = 4.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    @cached_property
+    def _serialized(self) -> Dict[str, Any]:
+        return self.inner._serialized
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        return self.inner._get_ls_params(stop=stop, **kwargs)
+
+    def _get_llm_string(self, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        return self.inner._get_llm_string(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+    def _should_stream(self, *, async_api: bool, run_manager: Any = None, **kwargs: Any) -> bool:
+        return self.inner._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    def _timeout(self) -> Optional[float]:
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= 0:
+            resilience_stats.record(self.role, "deadline_exceeded")
+            raise DeadlineExceeded(f"Orçamento da requisição esgotado antes da chamada ao LLM ({self.role})")
+        limits = [t for t in (self.attempt_timeout, remaining) if t is not None]
+        return min(limits) if limits else None
+
+    def _backoff(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """Espera antes da próxima tentativa, ou ``None`` se não houver nova tentativa."""
+        if attempt >= self.max_retries or not is_transient(exc):
+            return None
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        remaining = remaining_budget()
+        if remaining is not None and remaining <= delay:
+            return None
+        resilience_stats.record(self.role, "retries")
+        return delay
+
+    def _hedge_delay(self, timeout: Optional[float]) -> Optional[float]:
+        if not self.hedge:
+            return None
+        delay = resilience_stats.window(self.role).quantile(self.hedge_quantile)
+        if delay is None or (timeout is not None and delay >= timeout):
+            return None
+        return delay
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        resilience_stats.record(self.role, "calls")
+        attempt = 0
+        while True:
+            self._timeout()
+            started = time.monotonic()
+            try:
+                result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as exc:
+                delay = self._backoff(attempt, exc)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            resilience_stats.window(self.role).add(time.monotonic() - started)
+            return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        resilience_stats.record(self.role, "calls")
+        attempt = 0
+        while True:
+            timeout = self._timeout()
+            try:
+                return await self._ahedged(messages, stop, run_manager, kwargs, timeout)
+            except Exception as exc:
+                if isinstance(exc, asyncio.TimeoutError):
+                    resilience_stats.record(self.role, "timeouts")
+                delay = self._backoff(attempt, exc)
+                if delay is None:
+                    remaining = remaining_budget()
+                    if isinstance(exc, asyncio.TimeoutError) and remaining is not None and remaining <= 0:
+                        resilience_stats.record(self.role, "deadline_exceeded")
+                        raise DeadlineExceeded(f"Orçamento da requisição esgotado na chamada ao LLM ({self.role})") from exc
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _ahedged(self, messages, stop, run_manager, kwargs, timeout: Optional[float]) -> ChatResult:
+        window = resilience_stats.window(self.role)
+
+        async def call() -> tuple:
+            started = time.monotonic()
+            result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return result, time.monotonic() - started
+
+        delay = self._hedge_delay(timeout)
+        if delay is None:
+            result, elapsed = await asyncio.wait_for(call(), timeout)
+            window.add(elapsed)
+            return result
+
+        primary = asyncio.ensure_future(call())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            result, elapsed = primary.result()
+            window.add(elapsed)
+            return result
+
+        resilience_stats.record(self.role, "hedged")
+        hedge = asyncio.ensure_future(call())
+        pending = {primary, hedge}
+        deadline = None if timeout is None else time.monotonic() + timeout - delay
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                wait_for = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    result, elapsed = task.result()
+                    window.add(elapsed)
+                    if task is hedge:
+                        resilience_stats.record(self.role, "hedge_wins")
+                    resilience_stats.record(self.role, "wasted_tokens", _prompt_tokens(result))
+                    return result
+            raise error  # as duas falharam
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _inner_streams(self, async_api: bool) -> bool:
+        inner = type(self.inner)
+        sync_streams = inner._stream is not BaseChatModel._stream
+        return sync_streams or (async_api and inner._astream is not BaseChatModel._astream)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if not self._inner_streams(async_api=False):
+            yield _as_chunk(self._generate(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return
+        self._timeout()
+        yield from self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if not self._inner_streams(async_api=True):
+            yield _as_chunk(await self._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return
+        self._timeout()
+        async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+
+__all__ = [
+    "DeadlineExceeded",
+    "LatencyWindow",
+    "ResilienceStats",
+    "ResilientChatModel",
+    "is_transient",
+    "remaining_budget",
+    "request_budget",
+    "resilience_stats",
+]
@@ -0,0 +1,26 @@
+from .metrics import (
+    get_metrics_handler,
+    instrument_sqlalchemy,
+    record_error,
+    record_fallback,
+    record_llm_calls_saved,
+    record_llm_event,
+    render_metrics,
+)
+from .tracing import current_trace, get_trace_exporter, get_tracing_handler, span, trace_request, trace_sqlalchemy
+
+__all__ = [
+    "current_trace",
+    "get_metrics_handler",
+    "get_trace_exporter",
+    "get_tracing_handler",
+    "instrument_sqlalchemy",
+    "record_error",
+    "record_fallback",
+    "record_llm_calls_saved",
+    "record_llm_event",
+    "render_metrics",
+    "span",
+    "trace_request",
+    "trace_sqlalchemy",
+]
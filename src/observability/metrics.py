@@ -0,0 +1,295 @@
+"""Métricas Prometheus do orquestrador: latência por nó, LLM, ferramenta e banco, tokens e erros.
+
+``MetricsCallbackHandler`` é um callback do LangChain anexado ao grafo compilado e às
+execuções diretas dos agentes; como callbacks são herdados pelos filhos, uma instância
+cobre roteador, agentes, chamadas de LLM e ferramentas. O banco é medido por eventos do
+SQLAlchemy (``instrument_sqlalchemy``). ``GET /metrics`` expõe o texto de ``render_metrics``.
+
+Os rótulos têm cardinalidade limitada: nós, modelos e ferramentas passam por
+``BoundedLabel`` (valores além do limite viram ``other``) e as operações de banco se
+resumem ao verbo SQL. Com ``PROMETHEUS_MULTIPROC_DIR`` definido (servidor pre-fork), a
+exposição agrega os arquivos de todos os workers.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CALLS_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30)
+_SQL_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+NODE_LATENCY = Histogram(
+    "agents_node_duration_seconds", "Duração de cada nó do grafo (roteador, agentes, merge)", ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "agents_llm_duration_seconds", "Duração das chamadas de LLM", ["model", "node"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("agents_llm_tokens_total", "Tokens consumidos", ["model", "node", "kind"])
+LLM_CALLS_PER_REQUEST = Histogram(
+    "agents_llm_calls_per_request", "Chamadas de LLM por execução do orquestrador ou agente", buckets=CALLS_BUCKETS
+)
+TOOL_LATENCY = Histogram("agents_tool_duration_seconds", "Duração das ferramentas", ["tool"], buckets=LATENCY_BUCKETS)
+DB_LATENCY = Histogram("agents_db_query_duration_seconds", "Duração das consultas ao banco", ["operation"])
+ERRORS = Counter("agents_errors_total", "Erros por componente", ["component"])
+FALLBACKS = Counter("agents_fallbacks_total", "Caminhos de contingência acionados", ["kind"])
+LLM_RESILIENCE = Counter(
+    "agents_llm_resilience_events_total",
+    "Eventos da camada de resiliência (calls, retries, timeouts, hedged, hedge_wins...) por papel",
+    ["role", "event"],
+)
+LLM_CALLS_SAVED = Counter(
+    "agents_llm_calls_saved_total",
+    "Chamadas de LLM evitadas nos agentes: paráfrase final (return_direct) ou passos além dos limites",
+    ["reason"],
+)
+HEDGE_WASTED_TOKENS = Counter(
+    "agents_llm_hedge_wasted_tokens_total", "Tokens de prompt estimados das cópias descartadas pelo hedging", ["role"]
+)
+
+
+class BoundedLabel:
+    """Aceita até ``max_values`` valores distintos; os seguintes são reportados como ``other``."""
+
+    def __init__(self, max_values: int = 32):
+        self.max_values = max_values
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value: Optional[str]) -> str:
+        value = value or "unknown"
+        with self._lock:
+            if value in self._seen:
+                return value
+            if len(self._seen) < self.max_values:
+                self._seen.add(value)
+                return value
+        return "other"
+
+
+_node_label = BoundedLabel()
+_model_label = BoundedLabel()
+_tool_label = BoundedLabel()
+
+
+def record_fallback(kind: str) -> None:
+    """Conta o uso de um caminho de contingência (ex.: ``keyword`` no ``/invoke``)."""
+    FALLBACKS.labels(kind=kind).inc()
+
+
+def record_llm_event(role: str, event: str, amount: int = 1) -> None:
+    """Evento da camada de resiliência (``src.llm.resilience``); papéis são um conjunto fixo."""
+    if event == "wasted_tokens":
+        HEDGE_WASTED_TOKENS.labels(role=role).inc(amount)
+    else:
+        LLM_RESILIENCE.labels(role=role, event=event).inc(amount)
+
+
+def record_llm_calls_saved(reason: str, amount: int = 1) -> None:
+    """``reason``: ``return_direct``, ``max_iterations`` ou ``max_execution_time``."""
+    LLM_CALLS_SAVED.labels(reason=reason).inc(amount)
+
+
+def record_error(component: str) -> None:
+    ERRORS.labels(component=component).inc()
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    metadata = kwargs.get("metadata") or {}
+    return (
+        params.get("model")
+        or params.get("model_name")
+        or metadata.get("ls_model_name")
+        or (serialized or {}).get("name")
+        or params.get("_type")
+    )
+
+
+def _token_usage(response: Any) -> Tuple[int, int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Converte os eventos de callback do LangChain em métricas Prometheus.
+
+    Cada execução raiz (grafo ou agente chamado diretamente) acumula suas chamadas de LLM,
+    observadas em ``agents_llm_calls_per_request`` quando a raiz termina. O nó de uma
+    chamada vem do metadado ``langgraph_node``; fora do grafo o rótulo é ``agent``.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roots: Dict[UUID, UUID] = {}
+        self._llm_calls: Dict[UUID, int] = {}
+        self._started: Dict[UUID, tuple] = {}
+        self._node_runs: Dict[UUID, str] = {}
+
+    def _enter(self, run_id: UUID, parent_run_id: Optional[UUID]) -> UUID:
+        with self._lock:
+            root = run_id if parent_run_id is None else self._roots.get(parent_run_id, parent_run_id)
+            self._roots[run_id] = root
+            if parent_run_id is None:
+                self._llm_calls[root] = 0
+            return root
+
+    def _exit(self, run_id: UUID) -> Optional[tuple]:
+        with self._lock:
+            root = self._roots.pop(run_id, None)
+            if root == run_id and root in self._llm_calls:
+                LLM_CALLS_PER_REQUEST.observe(self._llm_calls.pop(root))
+            self._node_runs.pop(run_id, None)
+            return self._started.pop(run_id, None)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._enter(run_id, parent_run_id)
+        node = (kwargs.get("metadata") or {}).get("langgraph_node")
+        # Só a execução mais externa do nó (o RunnableLambda interno repete o mesmo nome)
+        if node and kwargs.get("name") == node and self._node_runs.get(parent_run_id) != node:
+            self._node_runs[run_id] = node
+            self._started[run_id] = (time.perf_counter(), _node_label(node))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._exit(run_id)
+        if started is not None:
+            NODE_LATENCY.labels(node=started[1]).observe(time.perf_counter() - started[0])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        started = self._exit(run_id)
+        if started is not None:
+            record_error("node")
+            NODE_LATENCY.labels(node=started[1]).observe(time.perf_counter() - started[0])
+
+    def _start_llm(self, serialized, run_id, parent_run_id, kwargs):
+        root = self._enter(run_id, parent_run_id)
+        with self._lock:
+            if root in self._llm_calls:
+                self._llm_calls[root] += 1
+        node = (kwargs.get("metadata") or {}).get("langgraph_node") or "agent"
+        self._started[run_id] = (time.perf_counter(), _model_label(_model_name(serialized, kwargs)), _node_label(node))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._exit(run_id)
+        if started is None:
+            return
+        begin, model, node = started
+        LLM_LATENCY.labels(model=model, node=node).observe(time.perf_counter() - begin)
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens:
+            LLM_TOKENS.labels(model=model, node=node, kind="prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(model=model, node=node, kind="completion").inc(completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._exit(run_id)
+        record_error("llm")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._enter(run_id, parent_run_id)
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        self._started[run_id] = (time.perf_counter(), _tool_label(name))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        started = self._exit(run_id)
+        if started is not None:
+            TOOL_LATENCY.labels(tool=started[1]).observe(time.perf_counter() - started[0])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        started = self._exit(run_id)
+        record_error("tool")
+        if started is not None:
+            TOOL_LATENCY.labels(tool=started[1]).observe(time.perf_counter() - started[0])
+
+
+_handler: Optional[MetricsCallbackHandler] = None
+
+
+def get_metrics_handler() -> MetricsCallbackHandler:
+    """Handler do processo; a mesma instância pode ser anexada em vários pontos
+    (o LangChain não duplica um handler já presente na execução)."""
+    global _handler
+    if _handler is None:
+        _handler = MetricsCallbackHandler()
+    return _handler
+
+
+def _sql_operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in _SQL_OPERATIONS else "other"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_query_started")
+    if started:
+        DB_LATENCY.labels(operation=_sql_operation(statement)).observe(time.perf_counter() - started.pop())
+
+
+def _handle_db_error(exception_context):
+    started = exception_context.connection.info.get("metrics_query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+    record_error("db")
+
+
+_sqlalchemy_instrumented = False
+
+
+def instrument_sqlalchemy() -> None:
+    """Mede todas as consultas de todos os engines (inclusive os recriados após um fork)."""
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_db_error)
+    _sqlalchemy_instrumented = True
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Corpo e content-type da exposição; agrega os workers se ``PROMETHEUS_MULTIPROC_DIR`` existir."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+__all__ = [
+    "BoundedLabel",
+    "MetricsCallbackHandler",
+    "get_metrics_handler",
+    "instrument_sqlalchemy",
+    "record_error",
+    "record_fallback",
+    "record_llm_calls_saved",
+    "record_llm_event",
+    "render_metrics",
+]
@@ -0,0 +1,460 @@
+"""Rastreamento por requisição: spans do grafo, dos passos dos agentes, LLMs, ferramentas e SQL.
+
+``trace_request`` abre um trace (contextvar) para a requisição. Dentro dele:
+
+- ``TracingCallbackHandler`` (callback do LangChain, anexado ao grafo como o de métricas)
+  cria spans para a execução raiz, os nós do grafo, cada ``AgentExecutor`` e seus passos,
+  as chamadas de LLM (modelo e tokens) e as ferramentas;
+- eventos do SQLAlchemy (``trace_sqlalchemy``) criam um span por consulta, filho da
+  ferramenta em execução;
+- ``span(nome, **atributos)`` marca trechos manuais (ex.: a busca HTTP de ``fetch_data``).
+
+Ao fim, o trace vai para os destinos configurados: ``TRACE_EXPORT_FILE`` (uma linha
+OTLP/JSON por trace), ``TRACE_EXPORT_ENDPOINT`` (coletor OTLP/HTTP, ``POST /v1/traces``)
+e ``TRACE_CONSOLE=1`` (árvore de spans no stdout, no lugar do antigo ``verbose=True``
+dos executores). Arquivo e coletor são escritos por uma thread de fundo. Sem destino
+configurado (nem ``TRACING_ENABLED=1``), só há trace quando ele é pedido explicitamente
+(cabeçalho de depuração da API).
+"""
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .metrics import _model_name, _sql_operation, _token_usage
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "agent-orchestrator")
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+TRACE_EXPORT_ENDPOINT = os.getenv("TRACE_EXPORT_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+TRACE_CONSOLE = os.getenv("TRACE_CONSOLE", "0") == "1"
+# Texto das consultas SQL nos spans (nunca os parâmetros)
+TRACE_SQL_MAX_CHARS = int(os.getenv("TRACE_SQL_MAX_CHARS", "300"))
+
+# Tipos de span do OTLP
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+_STATUS_OK, _STATUS_ERROR = 1, 2
+
+
+class Span:
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, kind: int = SPAN_KIND_INTERNAL, **attributes: Any):
+        self.name = name
+        self.kind = kind
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {k: v for k, v in attributes.items() if v is not None}
+        self.error: Optional[str] = None
+
+    def end(self, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """Spans de uma requisição; o span raiz representa a requisição inteira."""
+
+    def __init__(self, name: str, **attributes: Any):
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(name, kind=SPAN_KIND_SERVER, **attributes)
+        self.spans: List[Span] = [self.root]
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Span:
+        span = Span(name, parent or self.root, kind, **attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        now = time.time_ns()
+        with self._lock:
+            for span in self.spans:
+                if span.end_ns is None:  # execução cancelada sem evento de fim
+                    span.end_ns = now
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Documento OTLP/JSON (``ExportTraceServiceRequest``)."""
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": [self._otlp_span(s) for s in spans]}],
+                }
+            ]
+        }
+
+    def _otlp_span(self, span: Span) -> Dict[str, Any]:
+        status = {"code": _STATUS_ERROR, "message": span.error} if span.error else {"code": _STATUS_OK}
+        return {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": _otlp_attributes({**span.attributes, "duration_ms": round(span.duration_ms, 3)}),
+            "status": status,
+        }
+
+    def render(self) -> str:
+        """Árvore de spans com duração e tokens (destino de console)."""
+        children: Dict[Optional[str], List[Span]] = {}
+        with self._lock:
+            for span in self.spans:
+                children.setdefault(span.parent_id, []).append(span)
+        lines = [f"[trace {self.trace_id[:8]}]"]
+
+        def walk(span: Span, depth: int) -> None:
+            extra = ""
+            tokens = (span.attributes.get("gen_ai.usage.input_tokens"), span.attributes.get("gen_ai.usage.output_tokens"))
+            if any(tokens):
+                extra = f" tokens={tokens[0] or 0}/{tokens[1] or 0}"
+            if span.error:
+                extra += f" erro={span.error}"
+            lines.append(f"{'  ' * depth}{span.name} {span.duration_ms:.1f}ms{extra}")
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+                walk(child, depth + 1)
+
+        walk(self.root, 1)
+        return "\n".join(lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_active_span: ContextVar[Optional[Span]] = ContextVar("active_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+class TraceExporter:
+    """Envia traces finalizados ao console (na hora) e a arquivo/coletor (thread de fundo)."""
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None, console: bool = False):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint and not endpoint.endswith("/v1/traces") else endpoint
+        self.console = console
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.endpoint or self.console)
+
+    def export(self, trace: Trace) -> None:
+        if self.console:
+            print(trace.render(), flush=True)
+        if not (self.path or self.endpoint):
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace.to_otlp())
+        except queue.Full:
+            pass  # o destino não acompanha: descarta em vez de bloquear a requisição
+
+    def flush(self, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        import httpx
+
+        client = httpx.Client(timeout=5) if self.endpoint else None
+        while True:
+            document = self._queue.get()
+            try:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(document, ensure_ascii=False) + "\n")
+                if client is not None:
+                    client.post(self.endpoint, json=document)
+            except Exception:
+                pass  # falha do destino não afeta a aplicação
+            finally:
+                self._queue.task_done()
+
+
+_exporter = TraceExporter(TRACE_EXPORT_FILE, TRACE_EXPORT_ENDPOINT, TRACE_CONSOLE)
+
+
+def get_trace_exporter() -> TraceExporter:
+    return _exporter
+
+
+def _reset_after_fork() -> None:
+    # A thread de exportação não sobrevive ao fork: o filho cria a sua no primeiro trace
+    global _exporter
+    _exporter = TraceExporter(_exporter.path, _exporter.endpoint, _exporter.console)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@contextmanager
+def trace_request(name: str, force: bool = False, **attributes: Any) -> Iterator[Optional[Trace]]:
+    """Trace da requisição; ``None`` quando o rastreamento está desligado e ``force`` é falso."""
+    if not (force or TRACING_ENABLED or _exporter.enabled):
+        yield None
+        return
+    trace = Trace(name, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _active_span.set(None)
+    try:
+        yield trace
+    except BaseException as exc:
+        trace.root.end(error=exc)
+        raise
+    finally:
+        _active_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace.root.end()
+        trace.finish()
+        get_tracing_handler().forget(trace)
+        _exporter.export(trace)
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Span manual filho do span ativo; sem trace corrente, não faz nada."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, _active_span.get(), kind, **attributes)
+    token = _active_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.end(error=exc)
+        raise
+    finally:
+        _active_span.reset(token)
+        current.end()
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Converte os eventos de callback do LangChain em spans do trace corrente.
+
+    Execuções intermediárias (prompts, parsers, lambdas) não viram spans: seus filhos
+    são pendurados no span mais próximo. Uma execução sem trace corrente é ignorada.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # run_id -> (trace, span mais próximo, se este run abriu o span)
+        self._runs: Dict[UUID, tuple] = {}
+        self._steps: Dict[str, int] = {}
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> tuple:
+        with self._lock:
+            entry = self._runs.get(parent_run_id) if parent_run_id is not None else None
+        if entry is not None:
+            return entry[0], entry[1]
+        trace = _current_trace.get()
+        return trace, (_active_span.get() or (trace.root if trace else None))
+
+    def _open(self, run_id: UUID, parent_run_id: Optional[UUID], name: Optional[str], kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Optional[Span]:
+        trace, parent = self._parent(parent_run_id)
+        if trace is None:
+            return None
+        opened = trace.start_span(name, parent, kind, **attributes) if name else None
+        with self._lock:
+            self._runs[run_id] = (trace, opened or parent, opened is not None)
+        return opened
+
+    def _close(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> Optional[Span]:
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+        if entry is None or not entry[2]:
+            return None
+        entry[1].end(error=error, **attributes)
+        with self._lock:
+            self._steps.pop(entry[1].span_id, None)
+        return entry[1]
+
+    def forget(self, trace: Trace) -> None:
+        """Descarta execuções do trace que terminaram sem evento de fim (ex.: canceladas)."""
+        with self._lock:
+            for run_id in [r for r, entry in self._runs.items() if entry[0] is trace]:
+                del self._runs[run_id]
+
+    def _chain_span_name(self, parent_run_id: Optional[UUID], kwargs: Dict[str, Any]) -> Optional[str]:
+        name = kwargs.get("name")
+        node = (kwargs.get("metadata") or {}).get("langgraph_node")
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id is not None else None
+        if parent is None:
+            return name or "chain"  # execução raiz (grafo ou agente chamado diretamente)
+        parent_span: Span = parent[1]
+        if name and name.endswith("AgentExecutor"):
+            return "AgentExecutor"  # inclui subclasses como ParallelToolsAgentExecutor
+        if parent[2] and parent_span.name == "AgentExecutor":
+            with self._lock:
+                step = self._steps[parent_span.span_id] = self._steps.get(parent_span.span_id, 0) + 1
+            return f"agent_step {step}"
+        if node and name == node and parent_span.name != node:
+            return node
+        return None
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._open(run_id, parent_run_id, self._chain_span_name(parent_run_id, kwargs))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=error)
+
+    def _start_llm(self, serialized, run_id, parent_run_id, kwargs):
+        model = _model_name(serialized, kwargs)
+        self._open(run_id, parent_run_id, f"llm {model}", SPAN_KIND_CLIENT, **{"gen_ai.request.model": model})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens = _token_usage(response)
+        self._close(
+            run_id,
+            **{"gen_ai.usage.input_tokens": prompt_tokens or None, "gen_ai.usage.output_tokens": completion_tokens or None},
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        opened = self._open(run_id, parent_run_id, f"tool {name}", **{"tool.name": name})
+        if opened is not None:
+            # Consultas SQL e spans manuais dentro da ferramenta ficam abaixo dela
+            _active_span.set(opened)
+
+    def _end_tool(self, run_id, error=None):
+        closed = self._close(run_id, error=error)
+        if closed is not None and _active_span.get() is closed:
+            trace = _current_trace.get()
+            parent = next((s for s in trace.spans if s.span_id == closed.parent_id), None) if trace else None
+            _active_span.set(parent)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, error=error)
+
+
+_handler: Optional[TracingCallbackHandler] = None
+
+
+def get_tracing_handler() -> TracingCallbackHandler:
+    global _handler
+    if _handler is None:
+        _handler = TracingCallbackHandler()
+    return _handler
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    sql = trace.start_span(
+        f"sql {_sql_operation(statement)}",
+        _active_span.get(),
+        SPAN_KIND_CLIENT,
+        **{"db.system": conn.engine.dialect.name, "db.statement": statement[:TRACE_SQL_MAX_CHARS]},
+    )
+    conn.info.setdefault("trace_sql_spans", []).append(sql)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_sql_spans")
+    if spans and _current_trace.get() is not None:
+        spans.pop().end(**{"db.rows": cursor.rowcount if cursor.rowcount >= 0 else None})
+
+
+def _handle_db_error(exception_context):
+    connection = exception_context.connection
+    spans = connection.info.get("trace_sql_spans") if connection is not None else None
+    if spans and _current_trace.get() is not None:
+        spans.pop().end(error=exception_context.original_exception)
+
+
+_sqlalchemy_traced = False
+
+
+def trace_sqlalchemy() -> None:
+    """Um span por consulta de qualquer engine, dentro do trace corrente."""
+    global _sqlalchemy_traced
+    if _sqlalchemy_traced:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_db_error)
+    _sqlalchemy_traced = True
+
+
+__all__ = [
+    "Span",
+    "Trace",
+    "TraceExporter",
+    "TracingCallbackHandler",
+    "current_trace",
+    "get_trace_exporter",
+    "get_tracing_handler",
+    "span",
+    "trace_request",
+    "trace_sqlalchemy",
+]
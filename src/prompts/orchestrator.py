@@ -6,8 +6,9 @@ ORCHESTRATOR_SYSTEM_PROMPT = (
     "Com base na última mensagem do usuário e no histórico da conversa, decida o próximo passo. As opções são:\n"
     "1. **Financeiro**: Se a tarefa se enquadra na especialidade do agente Financeiro.\n"
     "2. **Agendamento**: Se a tarefa se enquadra na especialidade do agente de Agendamento.\n"
-    "3. **END**: Se a pergunta do usuário foi completamente respondida e nenhuma outra ação é necessária.\n\n"
-    "Responda APENAS com o nome do agente a ser chamado ('Financeiro', 'Agendamento') ou 'END'. Nenhuma outra palavra ou explicação."
+    "3. **Financeiro, Agendamento**: Se a mensagem traz pedidos independentes para os dois agentes; eles serão executados em paralelo.\n"
+    "4. **END**: Se a pergunta do usuário foi completamente respondida e nenhuma outra ação é necessária.\n\n"
+    "Responda APENAS com o nome do agente a ser chamado ('Financeiro', 'Agendamento'), com os dois nomes separados por vírgula ('Financeiro, Agendamento') ou 'END'. Nenhuma outra palavra ou explicação."
 )
 
 __all__ = ["ORCHESTRATOR_SYSTEM_PROMPT"]
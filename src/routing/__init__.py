@@ -0,0 +1,3 @@
+from .classifier import IntentClassifier, get_intent_classifier, load_examples
+
+__all__ = ["IntentClassifier", "get_intent_classifier", "load_examples"]
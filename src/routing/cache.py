@@ -0,0 +1,146 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.intents import normalize_text
+
+
+def normalize_route_key(query: str) -> str:
+    """Chave de cache: sem caixa, acentos e espaços extras, com números mascarados.
+
+    "Transfira R$ 150 para Ana" e "transfira r$ 20 para ana" têm a mesma rota.
+    """
+    return re.sub(r"\d+(?:[.,]\d+)*", "0", normalize_text(query)).strip(" ?!.")
+
+
+# Conexões SQLite não podem atravessar um fork: um único hook do módulo descarta as
+# conexões dos caches vivos e o filho reabre sob demanda.
+_live_caches: "weakref.WeakSet[RoutingCache]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for cache in list(_live_caches):
+        cache._reset_connection()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class RoutingCache:
+    """Cache LRU com TTL para decisões do roteador, com backend SQLite opcional.
+
+    A camada em memória atende o próprio processo; com ``path`` as decisões também são
+    gravadas em um arquivo SQLite compartilhado entre os workers.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600.0, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        _live_caches.add(self)
+
+    def _reset_connection(self) -> None:
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS routing_cache (key TEXT PRIMARY KEY, route TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get(self, query: str) -> Optional[str]:
+        key = normalize_route_key(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            db = self._db()
+            if db is not None:
+                row = db.execute(
+                    "SELECT route, expires_at FROM routing_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, query: str, route: str) -> None:
+        key = normalize_route_key(query)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, route, expires_at)
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO routing_cache (key, route, expires_at) VALUES (?, ?, ?)",
+                    (key, route, expires_at),
+                )
+                db.execute("DELETE FROM routing_cache WHERE expires_at <= ?", (time.time(),))
+                db.commit()
+
+    def _remember(self, key: str, route: str, expires_at: float) -> None:
+        self._entries[key] = (route, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM routing_cache")
+                db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "shared": self.path is not None,
+        }
+
+
+_routing_cache: Optional[RoutingCache] = None
+
+
+def get_routing_cache() -> RoutingCache:
+    """Cache do processo, configurado por ``ROUTING_CACHE_MAX_ENTRIES``, ``ROUTING_CACHE_TTL``
+    e ``ROUTING_CACHE_PATH`` (arquivo SQLite compartilhado; vazio = só memória)."""
+    global _routing_cache
+    if _routing_cache is None:
+        _routing_cache = RoutingCache(
+            max_entries=int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(os.getenv("ROUTING_CACHE_TTL", "3600")),
+            path=os.getenv("ROUTING_CACHE_PATH") or None,
+        )
+    return _routing_cache
+
+
+__all__ = ["RoutingCache", "get_routing_cache", "normalize_route_key"]
@@ -0,0 +1,126 @@
+import json
+import math
+import random
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.intents import normalize_text
+
+LABELS = ("Financeiro", "Agendamento", "END")
+EXAMPLES_PATH = Path(__file__).parent / "data" / "routing_examples.jsonl"
+
+
+def extract_features(text: str, ngram_range: Tuple[int, int] = (2, 4)) -> List[str]:
+    """N-gramas de caracteres por palavra (com bordas) mais as próprias palavras."""
+    features = []
+    for word in normalize_text(text).split():
+        features.append(f"w:{word}")
+        padded = f" {word} "
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                features.append(padded[i:i + n])
+    return sorted(set(features))
+
+
+def load_examples(path: Path = EXAMPLES_PATH) -> List[Tuple[str, str]]:
+    """Lê exemplos rotulados em JSONL (``{"text": ..., "label": ...}``)."""
+    with open(path, encoding="utf-8") as f:
+        return [(row["text"], row["label"]) for row in map(json.loads, f) if row]
+
+
+class IntentClassifier:
+    """Regressão logística multinomial sobre n-gramas de caracteres (somente stdlib).
+
+    ``predict`` devolve o rótulo mais provável e sua probabilidade; a probabilidade é
+    usada como confiança para decidir se o roteador LLM pode ser dispensado.
+    """
+
+    def __init__(self, labels: Sequence[str] = LABELS):
+        self.labels = list(labels)
+        self.weights: Dict[str, List[float]] = {}
+        self.bias: List[float] = [0.0] * len(self.labels)
+
+    def _scores(self, features: Iterable[str]) -> List[float]:
+        feats = list(features)
+        scale = 1.0 / math.sqrt(len(feats)) if feats else 0.0
+        scores = list(self.bias)
+        for feat in feats:
+            w = self.weights.get(feat)
+            if w is not None:
+                for k in range(len(scores)):
+                    scores[k] += w[k] * scale
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def fit(
+        self,
+        examples: Sequence[Tuple[str, str]],
+        epochs: int = 40,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13,
+    ) -> "IntentClassifier":
+        data = [(extract_features(text), self.labels.index(label)) for text, label in examples]
+        weights: Dict[str, List[float]] = defaultdict(lambda: [0.0] * len(self.labels))
+        self.weights = weights
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            lr = learning_rate / (1 + 0.1 * epoch)
+            for feats, target in data:
+                probs = self._softmax(self._scores(feats))
+                scale = 1.0 / math.sqrt(len(feats)) if feats else 0.0
+                for k, p in enumerate(probs):
+                    grad = p - (1.0 if k == target else 0.0)
+                    self.bias[k] -= lr * grad
+                    for feat in feats:
+                        w = weights[feat]
+                        w[k] -= lr * (grad * scale + l2 * w[k])
+        self.weights = dict(weights)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        probs = self._softmax(self._scores(extract_features(text)))
+        return dict(zip(self.labels, probs))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probs = self.predict_proba(text)
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    def save(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"labels": self.labels, "bias": self.bias, "weights": self.weights}, f)
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["labels"])
+        model.bias = data["bias"]
+        model.weights = data["weights"]
+        return model
+
+
+_default_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier(model_path: Optional[str] = None) -> IntentClassifier:
+    """Classificador do processo: carrega ``model_path`` ou treina com os exemplos embutidos."""
+    global _default_classifier
+    if _default_classifier is None:
+        if model_path:
+            _default_classifier = IntentClassifier.load(Path(model_path))
+        else:
+            _default_classifier = IntentClassifier().fit(load_examples())
+    return _default_classifier
+
+
+__all__ = ["IntentClassifier", "LABELS", "extract_features", "get_intent_classifier", "load_examples"]
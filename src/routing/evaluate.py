@@ -0,0 +1,110 @@
+"""Avalia o classificador local de intenções contra os rótulos e o roteador LLM.
+
+Uso:
+    python -m src.routing.evaluate [--examples arquivo.jsonl] [--threshold 0.9] [--offline]
+                                   [--save-model modelo.json]
+
+Sem ``--examples`` a acurácia é medida por validação cruzada sobre os exemplos embutidos;
+com ``--examples`` o modelo é treinado nos exemplos embutidos e avaliado no arquivo.
+Sem ``--offline`` cada consulta também é enviada ao ``router_chain`` (requer OPENAI_API_KEY)
+para medir a concordância com o roteador LLM.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.routing.classifier import IntentClassifier, load_examples
+
+# Rótulo registrado quando o roteador LLM não produz uma rota válida
+INVALID_ROUTE = "INVALID"
+
+
+def _cross_validated_predictions(examples: Sequence[Tuple[str, str]], folds: int) -> List[Tuple[str, float]]:
+    predictions: List[Optional[Tuple[str, float]]] = [None] * len(examples)
+    for fold in range(folds):
+        train = [ex for i, ex in enumerate(examples) if i % folds != fold]
+        model = IntentClassifier().fit(train)
+        for i in range(fold, len(examples), folds):
+            predictions[i] = model.predict(examples[i][0])
+    return [p for p in predictions if p is not None]
+
+
+def evaluate(
+    examples: Sequence[Tuple[str, str]],
+    predictions: Sequence[Tuple[str, float]],
+    threshold: float,
+    llm_labels: Optional[Sequence[str]] = None,
+) -> Dict[str, float]:
+    total = len(examples)
+    confident = [i for i, (_, conf) in enumerate(predictions) if conf >= threshold]
+    report = {
+        "examples": total,
+        "threshold": threshold,
+        "accuracy": sum(predictions[i][0] == examples[i][1] for i in range(total)) / total,
+        "confident_accuracy": (
+            sum(predictions[i][0] == examples[i][1] for i in confident) / len(confident) if confident else 0.0
+        ),
+        "llm_calls_avoided": len(confident) / total,
+    }
+    if llm_labels is not None:
+        report["llm_invalid_routes"] = sum(label == INVALID_ROUTE for label in llm_labels)
+        report["llm_router_accuracy"] = sum(llm_labels[i] == examples[i][1] for i in range(total)) / total
+        report["agreement_with_llm"] = sum(predictions[i][0] == llm_labels[i] for i in range(total)) / total
+        report["confident_agreement_with_llm"] = (
+            sum(predictions[i][0] == llm_labels[i] for i in confident) / len(confident) if confident else 0.0
+        )
+    return report
+
+
+def _llm_labels(examples: Sequence[Tuple[str, str]]) -> List[str]:
+    from langchain_core.messages import HumanMessage
+    from src.graph.agent_orchestrator import build_router_chain
+
+    router_chain = build_router_chain()
+    labels = []
+    for text, _ in examples:
+        try:
+            labels.append(router_chain.invoke({"messages": [HumanMessage(content=text)]}).strip())
+        except ValueError:
+            # Rota inválida mesmo após o escalonamento: conta como erro do roteador, sem abortar
+            labels.append(INVALID_ROUTE)
+    return labels
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict[str, float]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=Path, help="JSONL de avaliação (padrão: exemplos embutidos)")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--offline", action="store_true", help="não consulta o roteador LLM")
+    parser.add_argument("--save-model", type=Path, help="salva o modelo treinado nos exemplos embutidos")
+    args = parser.parse_args(argv)
+
+    training = load_examples()
+    if args.examples:
+        examples = load_examples(args.examples)
+        model = IntentClassifier().fit(training)
+        started = time.perf_counter()
+        predictions = [model.predict(text) for text, _ in examples]
+    else:
+        examples = training
+        started = time.perf_counter()
+        predictions = _cross_validated_predictions(examples, args.folds)
+    elapsed = time.perf_counter() - started
+
+    llm_labels = None if args.offline else _llm_labels(examples)
+    report = evaluate(examples, predictions, args.threshold, llm_labels)
+    if args.examples:
+        report["classifier_us_per_query"] = elapsed / len(examples) * 1e6
+
+    if args.save_model:
+        IntentClassifier().fit(training).save(args.save_model)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    main()
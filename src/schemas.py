@@ -98,3 +98,10 @@ class OrchestratorState(TypedDict):
     next_agent: str
     sender: str
     user_id: str
+    # Execuções de agentes nesta rodada (cada nó de agente soma 1) e o limite permitido
+    hops: Annotated[int, operator.add]
+    max_hops: int
+    # Respostas dos agentes executados em paralelo, combinadas pelo nó "merge"
+    branch_outputs: Annotated[Sequence[BaseMessage], operator.add]
+    # Resposta de um agente executado especulativamente durante o roteamento
+    speculation: Optional[BaseMessage]
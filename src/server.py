@@ -0,0 +1,179 @@
+"""Servidor pre-fork para produção.
+
+O processo pai importa a aplicação uma única vez, executa ``warmup`` (inicialização do
+banco, construção dos agentes e do grafo, que o import deixa para o primeiro uso), abre
+o socket e cria ``workers`` processos via ``fork()``. Os filhos compartilham as
+páginas de memória somente-leitura por copy-on-write; recursos com conexões abertas
+(engine do banco, pools HTTP das ferramentas e dos modelos LLM) são recriados no filho
+por hooks ``os.register_at_fork`` registrados nos próprios módulos.
+
+Sinais no processo pai:
+- ``SIGTERM``/``SIGINT``: desligamento gracioso (aguarda ``graceful_timeout`` e depois ``SIGKILL``).
+- ``SIGHUP``: reinício gracioso, um worker por vez.
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+
+class PreforkServer:
+    def __init__(
+        self,
+        app: Any,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 2,
+        graceful_timeout: float = 30.0,
+        max_requests: Optional[int] = None,
+        backlog: int = 2048,
+        log_level: str = "info",
+        warmup: Optional[Callable[[], None]] = None,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.max_requests = max_requests
+        self.backlog = backlog
+        self.log_level = log_level
+        self.warmup = warmup
+        self._children: Dict[int, float] = {}
+        self._sock: Optional[socket.socket] = None
+        self._stopping = False
+        self._restart_requested = False
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:  # filho
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                logger.exception("Worker %s terminou com erro", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        logger.info("Worker %s iniciado", pid)
+        return pid
+
+    def _run_worker(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        config = uvicorn.Config(
+            self.app,
+            log_level=self.log_level,
+            limit_max_requests=self.max_requests,
+            timeout_graceful_shutdown=int(self.graceful_timeout),
+        )
+        uvicorn.Server(config).run(sockets=[self._sock])
+
+    def _reap(self) -> list[int]:
+        dead = []
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self._children.pop(pid, None) is not None:
+                dead.append(pid)
+        return dead
+
+    def _wait_for_exit(self, pids: list[int], timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while any(pid in self._children for pid in pids) and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in pids:
+            if pid in self._children:
+                logger.warning("Worker %s não encerrou em %.0fs; enviando SIGKILL", pid, timeout)
+                os.kill(pid, signal.SIGKILL)
+        self._reap()
+
+    def _rolling_restart(self) -> None:
+        for old_pid in list(self._children):
+            self._spawn()
+            os.kill(old_pid, signal.SIGTERM)
+            self._wait_for_exit([old_pid], self.graceful_timeout)
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _handle_restart(self, signum, frame) -> None:
+        self._restart_requested = True
+
+    def run(self) -> None:
+        if self.warmup is not None:
+            started = time.monotonic()
+            self.warmup()
+            logger.info("Aquecimento concluído em %.2fs", time.monotonic() - started)
+        self._sock = self._bind()
+        # Objetos criados no import vão para a geração permanente: o GC dos filhos não
+        # toca nessas páginas e o copy-on-write as mantém compartilhadas.
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_restart)
+
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info("Servidor pre-fork em %s:%s com %s workers", self.host, self.port, self.workers)
+
+        while not self._stopping:
+            if self._restart_requested:
+                self._restart_requested = False
+                self._rolling_restart()
+            for pid in self._reap():
+                logger.warning("Worker %s saiu; iniciando substituto", pid)
+            while len(self._children) < self.workers and not self._stopping:
+                self._spawn()
+            time.sleep(0.5)
+
+        pids = list(self._children)
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        self._wait_for_exit(pids, self.graceful_timeout)
+        self._sock.close()
+
+
+def serve(app: Any, **kwargs: Any) -> None:
+    """Sobe o servidor pre-fork; parâmetros não informados vêm do ambiente.
+
+    ``WEB_CONCURRENCY`` (workers), ``GRACEFUL_TIMEOUT`` (segundos), ``MAX_REQUESTS``
+    (reciclagem do worker após N requisições), ``HOST`` e ``PORT``. ``warmup`` roda no
+    processo pai antes do ``fork``.
+    """
+    max_requests = os.getenv("MAX_REQUESTS")
+    options = {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", "8000")),
+        "workers": int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        "graceful_timeout": float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "max_requests": int(max_requests) if max_requests else None,
+    }
+    options.update(kwargs)
+    PreforkServer(app, **options).run()
+
+
+__all__ = ["PreforkServer", "serve"]
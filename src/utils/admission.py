@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Classes de prioridade: menor valor é atendido primeiro
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada pelo controle de admissão (429 ou 503 com Retry-After)."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Limita execuções simultâneas (global e por usuário) com fila de espera limitada.
+
+    - ``max_in_flight``: execuções simultâneas no processo.
+    - ``max_per_user``: execuções + esperas simultâneas por ``user_id`` (excedente -> 429).
+    - ``max_queue``: tamanho da fila; cheia -> 503, mas uma requisição interativa
+      desloca a espera ``batch`` mais recente.
+    - Requisições cujo prazo não comporta a espera estimada são descartadas na
+      chegada (503) em vez de ocuparem a fila até expirar.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_per_user: int = 4,
+        max_queue: int = 128,
+        queue_timeout: float = 10.0,
+        initial_service_time: float = 5.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._per_user: Dict[str, int] = defaultdict(int)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # Média móvel exponencial do tempo de serviço, usada para estimar esperas
+        self._service_time = initial_service_time
+        self.admitted = 0
+        self.rejected_user = 0
+        self.rejected_overload = 0
+        self.shed_deadline = 0
+
+    def _estimated_wait(self, ahead: int) -> float:
+        return (ahead + 1) / self.max_in_flight * self._service_time
+
+    def _queued_ahead(self, priority: int) -> int:
+        return sum(1 for p, _, fut in self._waiters if p <= priority and not fut.done())
+
+    async def acquire(self, user_id: str, priority: str = "interactive", deadline: Optional[float] = None) -> None:
+        """Aguarda uma vaga ou levanta ``AdmissionRejected``.
+
+        ``deadline`` é um instante de ``time.monotonic()``; sem ele usa ``queue_timeout``.
+        """
+        level = PRIORITIES.get(priority, PRIORITIES["interactive"])
+        now = time.monotonic()
+        deadline = deadline if deadline is not None else now + self.queue_timeout
+
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            self.rejected_user += 1
+            raise AdmissionRejected(429, "Limite de requisições simultâneas por usuário atingido.", self._service_time)
+
+        if self._in_flight < self.max_in_flight and self._queued_ahead(level) == 0:
+            self._grant(user_id)
+            return
+
+        ahead = self._queued_ahead(level)
+        estimated = self._estimated_wait(ahead)
+        if now + estimated > deadline:
+            self.shed_deadline += 1
+            raise AdmissionRejected(503, "Servidor sobrecarregado: prazo da requisição menor que a espera estimada.", estimated)
+        if self._queued >= self.max_queue and not self._shed_lower_priority(level):
+            self.rejected_overload += 1
+            raise AdmissionRejected(503, "Servidor sobrecarregado: fila de espera cheia.", estimated)
+
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), waiter))
+        self._queued += 1
+        self._per_user[user_id] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError, AdmissionRejected) as e:
+            self._forget_user(user_id)
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # A vaga foi concedida junto com o timeout/cancelamento: devolve-a.
+                self._in_flight -= 1
+                self._wake()
+            else:
+                if not waiter.done():
+                    waiter.cancel()
+                    self._queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed_deadline += 1
+                raise AdmissionRejected(503, "Servidor sobrecarregado: tempo de espera na fila esgotado.", self._estimated_wait(self._queued)) from None
+            raise
+        # _wake já contabilizou a vaga; o contador por usuário foi incrementado na fila.
+        self.admitted += 1
+
+    def release(self, user_id: str, service_time: Optional[float] = None) -> None:
+        self._in_flight -= 1
+        self._forget_user(user_id)
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: str = "interactive", deadline: Optional[float] = None) -> AsyncIterator[None]:
+        await self.acquire(user_id, priority=priority, deadline=deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    def _forget_user(self, user_id: str) -> None:
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def _grant(self, user_id: str) -> None:
+        self._in_flight += 1
+        self._per_user[user_id] += 1
+        self.admitted += 1
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                continue
+            self._queued -= 1
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def _shed_lower_priority(self, level: int) -> bool:
+        """Descarta a espera mais recente de prioridade inferior para abrir espaço na fila."""
+        candidates = [(p, seq, fut) for p, seq, fut in self._waiters if p > level and not fut.done()]
+        if not candidates:
+            return False
+        _, _, victim = max(candidates, key=lambda item: (item[0], item[1]))
+        self._queued -= 1
+        self.rejected_overload += 1
+        victim.set_exception(AdmissionRejected(503, "Servidor sobrecarregado: requisição de menor prioridade descartada.", self._service_time))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self.admitted,
+            "rejected_user": self.rejected_user,
+            "rejected_overload": self.rejected_overload,
+            "shed_deadline": self.shed_deadline,
+            "service_time_ewma": round(self._service_time, 3),
+        }
+
+
+__all__ = ["AdmissionController", "AdmissionRejected", "PRIORITIES"]
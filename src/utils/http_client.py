@@ -0,0 +1,35 @@
+import os
+from typing import Optional
+import httpx
+
+# Cliente HTTP assíncrono compartilhado pelas ferramentas (reaproveita conexões keep-alive).
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Retorna o ``httpx.AsyncClient`` do processo, criando-o no primeiro uso."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(timeout=10)
+    return _async_client
+
+
+async def aclose_async_client() -> None:
+    """Fecha o cliente compartilhado (usado no shutdown da aplicação)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _reset_after_fork() -> None:
+    # O cliente do processo pai (e seu pool) não deve ser reutilizado pelo filho.
+    global _async_client
+    _async_client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+__all__ = ["get_async_client", "aclose_async_client"]
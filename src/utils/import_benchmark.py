@@ -0,0 +1,96 @@
+"""Benchmark do tempo de import (cold start) da aplicação.
+
+Cada rodada importa o módulo em um processo novo com ``-X importtime`` e mede o tempo
+de parede do import. O relatório traz a mediana, o pior caso, os módulos com maior
+tempo acumulado e os agentes construídos durante o import (deve ser uma lista vazia:
+o registro de agentes só constrói executores e o grafo no primeiro uso).
+
+Uso: ``python -m src.utils.import_benchmark [main] --runs 5 --top 10 --budget 4``;
+com ``--budget`` (segundos, ou ``COLD_START_BUDGET_SECONDS``) a saída é 1 quando a
+mediana passa do limite ou quando algum agente foi construído no import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+__import__({module!r})
+elapsed = time.perf_counter() - started
+from src.agents.registry import agent_registry
+print(json.dumps({{"seconds": elapsed, "built": agent_registry.built()}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, float]]:
+    """``(módulo, segundos acumulados)`` das linhas ``import time: self | cumulative | nome``."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+            modules.append((name.strip(), int(cumulative) / 1e6))
+        except ValueError:
+            continue
+    return modules
+
+
+def measure_once(module: str = "main", env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+        cwd=os.getcwd(),
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["modules"] = _parse_importtime(result.stderr)
+    return report
+
+
+def measure_import(module: str = "main", runs: int = 5, top: int = 10, env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    samples = [measure_once(module, env) for _ in range(runs)]
+    seconds = [s["seconds"] for s in samples]
+    slowest = sorted(samples[-1]["modules"], key=lambda m: m[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_seconds": statistics.median(seconds),
+        "max_seconds": max(seconds),
+        "built_on_import": sorted({name for s in samples for name in s["built"]}),
+        "slowest_modules": [{"module": name, "cumulative_seconds": round(t, 4)} for name, t in slowest],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tempo de import (cold start) da aplicação")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    budget = os.getenv("COLD_START_BUDGET_SECONDS")
+    parser.add_argument("--budget", type=float, default=float(budget) if budget else None)
+    args = parser.parse_args(argv)
+
+    report = measure_import(args.module, runs=args.runs, top=args.top)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report["built_on_import"]:
+        print(f"Agentes construídos no import: {', '.join(report['built_on_import'])}", file=sys.stderr)
+        return 1
+    if args.budget is not None and report["median_seconds"] > args.budget:
+        print(f"Cold start de {report['median_seconds']:.2f}s acima do orçamento de {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+__all__ = ["measure_import", "measure_once"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
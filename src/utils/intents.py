@@ -0,0 +1,24 @@
+import unicodedata
+
+# Radicais que indicam uma operação de escrita (transferência, investimento ou agenda).
+WRITE_INTENT_KEYWORDS = (
+    "transf", "pix", "envi", "pag",
+    "invest", "aplica", "aplique", "compr", "vend",
+    "agend", "marc", "marq", "reunia", "cancel",
+)
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.split())
+
+
+def is_write_intent(query: str) -> bool:
+    """Heurística conservadora: qualquer radical de escrita marca a consulta como escrita."""
+    text = normalize_text(query)
+    return any(k in text for k in WRITE_INTENT_KEYWORDS)
+
+
+__all__ = ["WRITE_INTENT_KEYWORDS", "normalize_text", "is_write_intent"]
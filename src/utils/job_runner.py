@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import Runnable
+
+from src.database.crud import (
+    append_job_event,
+    claim_job,
+    create_job,
+    delete_expired_jobs,
+    finish_job,
+    get_job,
+    recover_stale_jobs,
+    renew_job_lease,
+)
+from src.database.models import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _with_session(fn, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def _summarize_update(node: str, update: Any) -> Dict[str, Any]:
+    """Converte a atualização de um nó do grafo em um evento serializável."""
+    event: Dict[str, Any] = {"node": node, "at": datetime.utcnow().isoformat()}
+    if isinstance(update, dict):
+        if "next_agent" in update:
+            event["next_agent"] = update["next_agent"]
+        messages = update.get("messages") or update.get("branch_outputs") or []
+        if messages:
+            event["output"] = getattr(messages[-1], "content", str(messages[-1]))
+    return event
+
+
+class JobRunner:
+    """Executa conversas longas em segundo plano com estado persistido na tabela ``jobs``.
+
+    ``submit`` grava o job como ``pending`` e o coloca na fila local; ``workers`` tarefas
+    consomem a fila e executam o orquestrador registrando cada atualização de nó como
+    evento parcial. Um job só é executado por quem conseguir ``claim_job`` (atômico), então
+    vários processos podem compartilhar o mesmo banco. Enquanto executa, o worker renova a
+    concessão do job (``updated_at``) a cada ``stale_after / 3`` segundos. Na inicialização e
+    periodicamente, jobs pendentes são reenfileirados, jobs em execução sem heartbeat há mais
+    de ``stale_after`` segundos (worker morto) são marcados como ``failed`` em vez de
+    executados de novo, e resultados com mais de ``result_ttl`` segundos são removidos.
+    """
+
+    def __init__(
+        self,
+        orchestrator: Runnable,
+        workers: int = 4,
+        result_ttl: float = 3600.0,
+        stale_after: float = 300.0,
+        maintenance_interval: float = 60.0,
+    ):
+        self.orchestrator = orchestrator
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self.maintenance_interval = maintenance_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued_ids: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintenance()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: str, query: str) -> str:
+        job_id = uuid4().hex
+        await asyncio.to_thread(_with_session, create_job, job_id, user_id, query)
+        self._enqueue(job_id)
+        return job_id
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._queued_ids:
+            self._queued_ids.add(job_id)
+            self.queue.put_nowait(job_id)
+
+    async def get(self, job_id: str):
+        return await asyncio.to_thread(_with_session, get_job, job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            self._queued_ids.discard(job_id)
+            try:
+                await self._execute(job_id)
+            except Exception:
+                logger.exception("Falha inesperada ao executar o job %s", job_id)
+            finally:
+                self.queue.task_done()
+
+    async def _execute(self, job_id: str) -> None:
+        if not await asyncio.to_thread(_with_session, claim_job, job_id):
+            return  # já executado (ou em execução) por outro worker
+        job = await self.get(job_id)
+        state = {
+            "messages": [HumanMessage(content=job.query)],
+            "next_agent": "",
+            "sender": "usuario",
+            "user_id": job.user_id,
+        }
+        last_output: Optional[str] = None
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            async for chunk in self.orchestrator.astream(state, stream_mode="updates"):
+                for node, update in chunk.items():
+                    event = _summarize_update(node, update)
+                    last_output = event.get("output", last_output)
+                    await asyncio.to_thread(_with_session, append_job_event, job_id, event)
+        except Exception as e:
+            await asyncio.to_thread(
+                _with_session, finish_job, job_id, "failed", last_output, f"{type(e).__name__}: {e}", self.result_ttl
+            )
+            return
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(_with_session, finish_job, job_id, "succeeded", last_output, None, self.result_ttl)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                if not await asyncio.to_thread(_with_session, renew_job_lease, job_id):
+                    logger.warning("Concessão do job %s perdida durante a execução", job_id)
+                    return
+            except Exception:
+                logger.exception("Falha ao renovar a concessão do job %s", job_id)
+
+    async def _maintenance(self) -> None:
+        while True:
+            try:
+                stale_before = datetime.utcnow() - timedelta(seconds=self.stale_after)
+                pending = await asyncio.to_thread(_with_session, recover_stale_jobs, stale_before, self.result_ttl)
+                for job_id in pending:
+                    self._enqueue(job_id)
+                await asyncio.to_thread(_with_session, delete_expired_jobs, datetime.utcnow())
+            except Exception:
+                logger.exception("Falha na manutenção da fila de jobs")
+            await asyncio.sleep(self.maintenance_interval)
+
+
+__all__ = ["JobRunner"]
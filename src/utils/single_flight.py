@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from src.utils.intents import normalize_text
+
+
+def coalesce_key(user_id: str, query: str) -> tuple[str, str]:
+    """Chave de coalescência: usuário + consulta normalizada (sem pontuação final)."""
+    return user_id, normalize_text(query).rstrip("?!. ")
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes idênticas em uma única execução.
+
+    Enquanto uma execução para ``key`` estiver em andamento, chamadas com a mesma
+    chave aguardam o mesmo resultado (ou exceção) em vez de disparar outra execução.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.saved = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await factory()
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.saved += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        # shield: o cancelamento de um chamador não cancela a execução compartilhada
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "executed": self.executed,
+            "saved": self.saved,
+            "in_flight": len(self._in_flight),
+        }
+
+
+__all__ = ["SingleFlight", "coalesce_key"]
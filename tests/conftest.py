@@ -0,0 +1,20 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Os testes usam um SQLite temporário (nunca o banco padrão do .env); TEST_DATABASE_URL
+# aponta a suíte para outro banco. Precisa vir antes de qualquer import de ``src``.
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="agents-tests-")
+atexit.register(shutil.rmtree, _TEST_DB_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_TEST_DB_DIR}/tests.db")
+
+from src.database.models import init_db  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def database():
+    """Tabelas criadas uma vez por sessão (o import dos modelos não as cria mais)."""
+    init_db()
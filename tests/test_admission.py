@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+from src.utils.admission import AdmissionController, AdmissionRejected
+
+
+def test_per_user_limit_returns_429():
+    controller = AdmissionController(max_in_flight=10, max_per_user=1)
+
+    async def scenario():
+        await controller.acquire("user1")
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire("user1")
+        await controller.acquire("user2")
+        return exc.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+
+
+def test_full_queue_and_short_deadline_return_503():
+    controller = AdmissionController(max_in_flight=1, max_per_user=10, max_queue=1, initial_service_time=0.5)
+
+    async def scenario():
+        await controller.acquire("a")
+        waiting = asyncio.ensure_future(controller.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("c")
+        with pytest.raises(AdmissionRejected) as late:
+            await controller.acquire("d", deadline=time.monotonic() + 0.01)
+        controller.release("a")
+        await waiting
+        return full.value, late.value
+
+    full, late = asyncio.run(scenario())
+    assert full.status_code == 503
+    assert late.status_code == 503
+    assert controller.stats()["in_flight"] == 1
+
+
+def test_interactive_requests_are_served_before_batch():
+    controller = AdmissionController(max_in_flight=1, max_per_user=10, max_queue=10, initial_service_time=0.01)
+    order = []
+
+    async def worker(user_id, priority):
+        async with controller.admit(user_id, priority=priority):
+            order.append(user_id)
+
+    async def scenario():
+        await controller.acquire("holder")
+        tasks = [asyncio.ensure_future(worker("batch", "batch"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(worker("interactive", "interactive")))
+        await asyncio.sleep(0)
+        controller.release("holder")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "batch"]
+    assert controller.stats()["in_flight"] == 0
+    assert controller.stats()["queued"] == 0
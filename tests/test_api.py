@@ -1,6 +1,7 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from dotenv import load_dotenv
 
 # Carrega o arquivo .env para garantir que as variáveis de ambiente estejam disponíveis
@@ -19,23 +20,26 @@ client = TestClient(app)
 def mock_orchestrator():
     """Mock para o agent_orchestrator para evitar chamadas reais à API."""
     with patch('main.agent_orchestrator') as mock:
+        mock.ainvoke = AsyncMock()
         yield mock
 
 def test_invoke_finance_query(mock_orchestrator):
     """Testa uma consulta financeira, verificando se o mock é chamado corretamente."""
     # Configura o retorno do mock
     mock_response = {
-        "messages": [MagicMock(content="Seu saldo é de R$ 1.000,00")]
+        "messages": [MagicMock(content="Seu saldo é de R$ 1.000,00")],
+        "hops": 1,
     }
-    mock_orchestrator.invoke.return_value = mock_response
+    mock_orchestrator.ainvoke.return_value = mock_response
 
     # Faz a requisição
-    response = client.post("/invoke", json={"query": "qual o meu saldo?"})
+    response = client.post("/invoke", json={"query": "qual o meu saldo?", "user_id": "user1"})
 
     # Verifica o resultado
     assert response.status_code == 200
     assert response.json() == {"response": "Seu saldo é de R$ 1.000,00"}
-    mock_orchestrator.invoke.assert_called_once()
+    assert response.headers["X-Orchestrator-Hops"] == "1"
+    mock_orchestrator.ainvoke.assert_awaited_once()
 
 def test_invoke_scheduling_query(mock_orchestrator):
     """Testa uma consulta de agendamento."""
@@ -43,17 +47,145 @@ def test_invoke_scheduling_query(mock_orchestrator):
     mock_response = {
         "messages": [MagicMock(content="Compromisso agendado com sucesso!")]
     }
-    mock_orchestrator.invoke.return_value = mock_response
+    mock_orchestrator.ainvoke.return_value = mock_response
 
     # Faz a requisição
-    response = client.post("/invoke", json={"query": "marcar uma reunião"})
+    response = client.post("/invoke", json={"query": "marcar uma reunião", "user_id": "user1"})
 
     # Verifica o resultado
     assert response.status_code == 200
     assert response.json() == {"response": "Compromisso agendado com sucesso!"}
-    mock_orchestrator.invoke.assert_called_once()
+    mock_orchestrator.ainvoke.assert_awaited_once()
 
 def test_invoke_invalid_request():
     """Testa uma requisição com corpo inválido."""
     response = client.post("/invoke", json={"invalid_key": "some value"})
     assert response.status_code == 422  # Unprocessable Entity
+
+def test_invoke_stream_emits_sse_frames(mock_orchestrator):
+    """Testa o endpoint SSE: roteamento, ferramenta e resposta final viram frames."""
+    async def fake_events(*args, **kwargs):
+        yield {"event": "on_chain_end", "name": "router", "parent_ids": ["root"],
+               "metadata": {"langgraph_node": "router", "langgraph_step": 1},
+               "data": {"output": {"next_agent": "Financeiro"}}}
+        yield {"event": "on_tool_start", "name": "get_balance", "parent_ids": ["root"],
+               "metadata": {"langgraph_node": "Financeiro"}, "data": {"input": "saldo"}}
+        yield {"event": "on_chain_end", "name": "LangGraph", "parent_ids": [], "metadata": {},
+               "data": {"output": {"messages": [MagicMock(content="Seu saldo é de R$ 1.000,00")], "hops": 1}}}
+
+    mock_orchestrator.astream_events = fake_events
+
+    with client.stream("POST", "/invoke/stream", json={"query": "qual o meu saldo?", "user_id": "user1"}) as response:
+        body = "".join(response.iter_text())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: route\ndata: {"next_agent": "Financeiro"}' in body
+    assert "event: tool_start" in body
+    assert 'event: final\ndata: {"response": "Seu saldo é de R$ 1.000,00", "hops": 1}' in body
+
+def test_invoke_batch_reports_errors_per_item(mock_orchestrator):
+    """Testa o lote: resultados na ordem de entrada e erro isolado por item."""
+    configs = []
+
+    async def run(state, config):
+        configs.append(config)
+        if state["user_id"] == "user2":
+            raise RuntimeError("falha no agente")
+        return {"messages": [MagicMock(content="Seu saldo é de R$ 1.000,00")]}
+
+    mock_orchestrator.ainvoke.side_effect = run
+
+    response = client.post("/invoke/batch", json={
+        "items": [
+            {"query": "qual o meu saldo?", "user_id": "user1"},
+            {"query": "marcar uma reunião", "user_id": "user2"},
+        ],
+        "max_concurrency": 2,
+    })
+
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"index": 0, "response": "Seu saldo é de R$ 1.000,00", "error": None},
+        {"index": 1, "response": None, "error": "RuntimeError: falha no agente"},
+    ]}
+    assert [c["max_concurrency"] for c in configs] == [2, 2]
+
+def test_invoke_batch_gives_each_item_its_own_llm_budget(mock_orchestrator):
+    """Itens que esperam vaga no lote não herdam o prazo já consumido pelos anteriores."""
+    from src.llm import DeadlineExceeded
+    from src.llm.resilience import remaining_budget
+
+    async def run(state, config):
+        await asyncio.sleep(0.1)
+        if remaining_budget() <= 0:
+            raise DeadlineExceeded("sem orçamento")
+        return {"messages": [MagicMock(content="ok")]}
+
+    mock_orchestrator.ainvoke.side_effect = run
+    items = [{"query": f"consulta {i}", "user_id": "user1"} for i in range(8)]
+    response = client.post(
+        "/invoke/batch", json={"items": items, "max_concurrency": 2}, headers={"X-Request-Timeout": "0.35"}
+    )
+
+    # 4 rodadas de 0.1s: com um prazo único para o lote, a última passaria de 0.35s
+    assert [r["error"] for r in response.json()["results"]] == [None] * 8
+
+def test_invoke_rejected_by_admission_returns_retry_after(mock_orchestrator):
+    """Testa que o controle de admissão responde 429 com Retry-After."""
+    from main import admission
+    from src.utils.admission import AdmissionRejected
+
+    mock_orchestrator.ainvoke.return_value = {"messages": [MagicMock(content="ok")]}
+    with patch.object(admission, "acquire", AsyncMock(side_effect=AdmissionRejected(429, "limite", 2.5))):
+        response = client.post("/invoke", json={"query": "qual o meu saldo?", "user_id": "user1"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    mock_orchestrator.ainvoke.assert_not_awaited()
+
+def test_get_unknown_job_returns_404():
+    response = client.get("/jobs/inexistente")
+    assert response.status_code == 404
+
+def test_keyword_fallback_is_counted_in_metrics(mock_orchestrator):
+    """Falha do orquestrador: o fallback por palavra-chave aparece em /metrics."""
+    mock_orchestrator.ainvoke.side_effect = RuntimeError("grafo indisponível")
+    with patch('main.finance_agent_executor') as executor:
+        executor.ainvoke = AsyncMock(return_value={"output": "Saldo: R$ 10,00"})
+        response = client.post("/invoke", json={"query": "qual o saldo da conta?", "user_id": "user1"})
+
+    metrics = client.get("/metrics")
+    assert response.json() == {"response": "Saldo: R$ 10,00"}
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'agents_fallbacks_total{kind="keyword"}' in metrics.text
+
+def test_debug_trace_header_returns_trace_only_when_enabled(mock_orchestrator, monkeypatch):
+    """Com ``X-Debug-Trace: 1`` a resposta traz o trace OTLP e o cabeçalho ``X-Trace-Id``,
+    mas só se ``TRACE_DEBUG_HEADER_ENABLED`` estiver ligado (desligado por padrão)."""
+    mock_orchestrator.ainvoke.return_value = {"messages": [MagicMock(content="Seu saldo é de R$ 5,00")]}
+
+    def invoke():
+        return client.post(
+            "/invoke", json={"query": "qual o meu saldo?", "user_id": "user1"}, headers={"X-Debug-Trace": "1"}
+        )
+
+    assert "trace" not in invoke().json()
+    monkeypatch.setattr("main.TRACE_DEBUG_HEADER_ENABLED", True)
+    response = invoke()
+
+    spans = response.json()["trace"]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[0]["name"] == "POST /invoke"
+    assert spans[0]["traceId"] == response.headers["X-Trace-Id"]
+
+def test_deadline_exceeded_returns_504_without_keyword_fallback(mock_orchestrator):
+    """Orçamento esgotado no orquestrador: 504, sem rodar o agente de fallback no mesmo orçamento."""
+    from src.llm import DeadlineExceeded
+
+    mock_orchestrator.ainvoke.side_effect = DeadlineExceeded("sem orçamento")
+    with patch('main.finance_agent_executor') as executor:
+        executor.ainvoke = AsyncMock(side_effect=DeadlineExceeded("sem orçamento"))
+        response = client.post("/invoke", json={"query": "qual o saldo da conta?", "user_id": "user1"})
+
+    assert response.status_code == 504
+    executor.ainvoke.assert_not_awaited()
@@ -0,0 +1,50 @@
+import os
+
+from src.agents.registry import AgentRegistry, agent_registry
+from src.utils.import_benchmark import measure_once
+
+# Orçamento folgado para CI; o benchmark (python -m src.utils.import_benchmark) acompanha a mediana
+COLD_START_BUDGET_SECONDS = float(os.getenv("COLD_START_BUDGET_SECONDS", "10"))
+
+
+def test_importing_main_builds_no_agents_and_opens_no_database(tmp_path):
+    database = tmp_path / "cold.db"
+    report = measure_once("main", env={"DATABASE_URL": f"sqlite:///{database}", "OPENAI_API_KEY": "sk-x"})
+
+    assert report["built"] == []
+    assert not database.exists()  # create_all saiu do import (init_db na inicialização)
+    assert report["seconds"] < COLD_START_BUDGET_SECONDS
+    assert any(name == "src.graph.agent_orchestrator" for name, _ in report["modules"])
+
+
+def test_registry_builds_once_on_first_use():
+    registry = AgentRegistry()
+    builds = []
+    registry.register("Financeiro", lambda: builds.append(1) or {"tools": []})
+    proxy = registry.proxy("Financeiro")
+
+    assert registry.built() == []
+    assert proxy.get("tools") == []
+    assert registry.get("Financeiro") is registry.get("Financeiro")
+    assert builds == [1]
+    registry.reset()
+    registry.warm_up()
+    assert builds == [1, 1] and registry.built() == ["Financeiro"]
+
+
+def test_forked_worker_keeps_agents_built_in_the_parent(monkeypatch):
+    monkeypatch.setitem(agent_registry._factories, "fork-test", lambda: object())
+    agent_registry.warm_up(["fork-test"])
+    built = agent_registry.get("fork-test")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # filho: usa a instância herdada por copy-on-write, sem reconstruir
+        os.write(write_fd, b"1" if agent_registry.get("fork-test") is built else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    try:
+        assert os.read(read_fd, 1) == b"1"
+    finally:
+        os.close(read_fd)
+        agent_registry.reset("fork-test")
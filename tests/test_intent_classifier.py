@@ -0,0 +1,68 @@
+import pytest
+
+from src.routing.classifier import IntentClassifier, load_examples
+from src.routing.evaluate import evaluate
+
+
+def test_classifier_routes_clear_queries_confidently():
+    model = IntentClassifier().fit(load_examples())
+
+    assert model.predict("qual é o meu saldo?")[0] == "Financeiro"
+    assert model.predict("marque uma reunião sexta às 15h")[0] == "Agendamento"
+    assert model.predict("muito obrigado!")[0] == "END"
+    label, confidence = model.predict("quanto está o dólar hoje")
+    assert label == "Financeiro" and confidence > 0.9
+
+
+def test_saved_model_gives_same_predictions(tmp_path):
+    model = IntentClassifier().fit(load_examples())
+    path = tmp_path / "model.json"
+    model.save(path)
+
+    restored = IntentClassifier.load(path)
+    assert restored.predict_proba("cancele minha consulta") == model.predict_proba("cancele minha consulta")
+
+
+def test_evaluate_reports_avoided_llm_calls():
+    examples = [("saldo", "Financeiro"), ("reunião", "Agendamento"), ("oi", "END")]
+    predictions = [("Financeiro", 0.95), ("Agendamento", 0.5), ("Financeiro", 0.6)]
+
+    report = evaluate(examples, predictions, threshold=0.9, llm_labels=["Financeiro", "Agendamento", "END"])
+
+    assert report["llm_calls_avoided"] == 1 / 3
+    assert report["confident_accuracy"] == 1.0
+    assert report["agreement_with_llm"] == 2 / 3
+
+
+def test_invalid_llm_route_is_scored_as_a_miss(monkeypatch):
+    import sys
+
+    from langchain_core.runnables import RunnableLambda
+    import src.graph.agent_orchestrator  # noqa: F401
+    from src.routing import evaluate as evaluate_module
+
+    def route(state):
+        text = state["messages"][0].content
+        if text == "oi":
+            raise ValueError("rota inválida")
+        return "Financeiro"
+
+    monkeypatch.setattr(sys.modules["src.graph.agent_orchestrator"], "build_router_chain", lambda: RunnableLambda(route))
+    examples = [("saldo", "Financeiro"), ("oi", "END")]
+
+    labels = evaluate_module._llm_labels(examples)
+    report = evaluate(examples, [("Financeiro", 0.95), ("END", 0.95)], threshold=0.9, llm_labels=labels)
+
+    assert labels == ["Financeiro", evaluate_module.INVALID_ROUTE]
+    assert report["llm_router_accuracy"] == 0.5
+    assert report["llm_invalid_routes"] == 1
+
+
+def test_router_output_is_parsed_to_a_graph_route():
+    from src.graph.agent_orchestrator import parse_route
+
+    assert parse_route(" 'Financeiro'.\n") == "Financeiro"
+    assert parse_route("Próximo: Agendamento") == "Agendamento"
+    assert parse_route("end") == "END"
+    with pytest.raises(ValueError):
+        parse_route("Financeiro ou Agendamento")
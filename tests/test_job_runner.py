@@ -0,0 +1,99 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+
+from src.database.crud import claim_job, create_job, delete_expired_jobs, get_job
+from src.database.models import Job, SessionLocal
+from src.utils.job_runner import JobRunner
+
+
+class FakeOrchestrator:
+    """Orquestrador mínimo que emite as atualizações de nó do LangGraph."""
+
+    def __init__(self, fail: bool = False, delay: float = 0.0):
+        self.fail = fail
+        self.delay = delay
+        self.runs = 0
+
+    async def astream(self, state, stream_mode="updates"):
+        self.runs += 1
+        yield {"router": {"next_agent": "Financeiro"}}
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("agente indisponível")
+        yield {"Financeiro": {"messages": [HumanMessage(content="Seu saldo é de R$ 1.000,00")], "sender": "Financeiro"}}
+        yield {"router": {"next_agent": "END"}}
+
+
+def _run_job(orchestrator, result_ttl=3600.0):
+    runner = JobRunner(orchestrator, workers=1, result_ttl=result_ttl, maintenance_interval=3600)
+
+    async def scenario():
+        await runner.start()
+        job_id = await runner.submit("user1", "qual o meu saldo?")
+        await runner.queue.join()
+        job = await runner.get(job_id)
+        await runner.stop()
+        return job
+
+    return asyncio.run(scenario())
+
+
+def test_job_records_events_and_result():
+    job = _run_job(FakeOrchestrator())
+
+    assert job.status == "succeeded"
+    assert job.result == "Seu saldo é de R$ 1.000,00"
+    events = json.loads(job.events)
+    assert [e["node"] for e in events] == ["router", "Financeiro", "router"]
+    assert events[0]["next_agent"] == "Financeiro"
+    assert job.expires_at is not None
+
+
+def test_failed_job_keeps_error_and_expired_jobs_are_deleted():
+    job = _run_job(FakeOrchestrator(fail=True), result_ttl=-1)
+
+    assert job.status == "failed"
+    assert "agente indisponível" in job.error
+
+    db = SessionLocal()
+    try:
+        assert delete_expired_jobs(db, datetime.utcnow()) >= 1
+    finally:
+        db.close()
+
+
+def test_running_job_keeps_its_lease_and_abandoned_jobs_are_not_rerun():
+    orchestrator = FakeOrchestrator(delay=0.6)
+    runner = JobRunner(orchestrator, workers=1, stale_after=0.3, maintenance_interval=0.05)
+    abandoned_id = uuid4().hex
+    db = SessionLocal()
+    try:
+        # Job de um worker que morreu: 'running' sem heartbeat há muito tempo
+        create_job(db, abandoned_id, "user1", "transfira R$ 10 para a Ana")
+        claim_job(db, abandoned_id)
+        db.query(Job).filter(Job.id == abandoned_id).update({Job.updated_at: datetime.utcnow() - timedelta(hours=1)})
+        db.commit()
+    finally:
+        db.close()
+
+    async def scenario():
+        await runner.start()
+        job_id = await runner.submit("user1", "qual o meu saldo?")
+        await runner.queue.join()
+        await runner.stop()
+        return await runner.get(job_id)
+
+    job = asyncio.run(scenario())
+
+    db = SessionLocal()
+    try:
+        abandoned = get_job(db, abandoned_id)
+    finally:
+        db.close()
+    # O heartbeat manteve a concessão além de stale_after: o job rodou uma única vez
+    assert job.status == "succeeded" and orchestrator.runs == 1
+    assert abandoned.status == "failed" and "concessão" in abandoned.error
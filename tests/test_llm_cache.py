@@ -0,0 +1,60 @@
+import gc
+import os
+import weakref
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.llm import SQLiteLLMCache, get_llm, get_llm_cache
+
+
+def _model(cache, *answers):
+    messages = [AIMessage(content=a, usage_metadata={"input_tokens": 8, "output_tokens": 2, "total_tokens": 10}) for a in answers]
+    return GenericFakeChatModel(messages=iter(messages), cache=cache)
+
+
+def test_identical_prompts_are_served_from_cache_across_instances(tmp_path):
+    path = str(tmp_path / "llm.db")
+    cache = SQLiteLLMCache(path=path)
+    model = _model(cache, "Financeiro", "Agendamento")
+
+    assert model.invoke("qual o meu saldo?").content == "Financeiro"
+    assert model.invoke("qual o meu saldo?").content == "Financeiro"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["saved_tokens"] == 10
+
+    # Outro processo (nova instância) lê o mesmo arquivo
+    reopened = SQLiteLLMCache(path=path)
+    assert _model(reopened, "outra").invoke("qual o meu saldo?").content == "Financeiro"
+
+
+def test_lru_cap_and_ttl():
+    cache = SQLiteLLMCache(max_entries=1)
+    model = _model(cache, "a", "b", "c")
+    model.invoke("primeira")
+    model.invoke("segunda")  # remove "primeira"
+    assert model.invoke("primeira").content == "c"
+
+    expired = SQLiteLLMCache(ttl=-1)
+    model = _model(expired, "a", "b")
+    model.invoke("consulta")
+    assert model.invoke("consulta").content == "b"
+
+
+def test_cache_is_enabled_per_role():
+    assert get_llm("router").cache is get_llm_cache()
+    assert get_llm("agent").cache is None
+
+
+def test_instances_are_not_retained_and_fork_resets_live_connections(tmp_path):
+    cache = SQLiteLLMCache(path=str(tmp_path / "llm.db"))
+    cache._db()
+    gone = weakref.ref(SQLiteLLMCache())
+    gc.collect()
+    assert gone() is None  # o hook de fork é do módulo, não segura as instâncias
+
+    pid = os.fork()
+    if pid == 0:  # filho: a conexão herdada foi descartada
+        os._exit(0 if cache._conn is None else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert cache._conn is not None
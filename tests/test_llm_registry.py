@@ -0,0 +1,90 @@
+import os
+
+import httpx
+import pytest
+
+from src.llm import get_http_clients, get_llm, reset_llm_registry
+from src.llm import registry
+
+
+def test_roles_are_cached_and_share_the_http_pool():
+    router = get_llm("router")
+    extractor = get_llm("extractor")
+
+    assert get_llm("router") is router
+    assert router.attempt_timeout == 10.0
+    router, extractor = router.inner, extractor.inner
+    assert router.max_retries == 0  # novas tentativas ficam na camada de resiliência
+    assert router.model_name == "gpt-4o-mini"
+    assert extractor.model_name == "gpt-4o-mini"
+    assert router.request_timeout == 10.0
+    # Os modelos recebem os clientes de processo, que enviam pelo pool compartilhado
+    for model in (router, extractor):
+        assert model.http_client is registry._get_model_clients()[0]
+        assert model.http_async_client is registry._get_model_clients()[1]
+
+
+def test_models_built_before_fork_send_through_the_workers_pool(monkeypatch):
+    model = get_llm("router").inner
+    parent_pool = get_http_clients()[0]
+    pid = os.fork()
+    if pid == 0:  # filho: mesmo modelo, pool novo resolvido no envio
+        try:
+            reset = registry._http_client is None  # o pool do pai foi descartado
+            sent = []
+            registry._http_client = httpx.Client(transport=httpx.MockTransport(lambda r: sent.append(r) or httpx.Response(204)))
+            response = model.http_client.get("https://llm.test/v1/models")
+            ok = reset and get_llm("router").inner is model and response.status_code == 204
+            os._exit(0 if ok and len(sent) == 1 else 1)
+        except BaseException:
+            os._exit(2)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert get_http_clients()[0] is parent_pool
+
+
+def test_env_overrides_and_unknown_role(monkeypatch):
+    monkeypatch.setenv("LLM_EVALUATOR_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "3")
+    reset_llm_registry()
+
+    assert get_llm("evaluator").inner.model_name == "gpt-4o-mini"
+    assert get_llm("agent", temperature=0.5) is not get_llm("agent")
+    assert registry._limits().max_keepalive_connections == 3
+    with pytest.raises(ValueError):
+        get_llm("planner")
+    reset_llm_registry()
+
+
+def test_router_escalates_to_the_larger_model_on_invalid_label(monkeypatch):
+    from langchain_core.language_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.graph.agent_orchestrator import build_router_chain
+    from src.llm import escalation_stats
+
+    small = GenericFakeChatModel(messages=iter([AIMessage(content="Talvez finanças"), AIMessage(content="END")]))
+    large = GenericFakeChatModel(messages=iter([AIMessage(content="Financeiro")]))
+    requested = []
+
+    def fake_get_llm(role, **overrides):
+        requested.append(overrides.get("model"))
+        return large if overrides.get("model") == "gpt-4-turbo" else small
+
+    monkeypatch.setattr(registry, "get_llm", fake_get_llm)
+    before = escalation_stats.stats().get("router", 0)
+    chain = build_router_chain()
+
+    assert chain.invoke({"messages": [HumanMessage(content="quanto tenho?")]}) == "Financeiro"
+    assert chain.invoke({"messages": [HumanMessage(content="obrigado")]}) == "END"  # válido: sem escalonar
+    assert requested == [None, "gpt-4-turbo"]
+    assert escalation_stats.stats()["router"] == before + 1
+
+
+def test_escalation_can_be_disabled_per_role(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTER_ESCALATION_MODEL", "")
+    monkeypatch.setenv("LLM_ROUTER_TIMEOUT", "2.5")
+    reset_llm_registry()
+
+    assert registry.get_escalation_llm("router") is None
+    assert registry.get_escalation_llm("agent") is None
+    assert get_llm("router").inner.request_timeout == 2.5
+    reset_llm_registry()
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.llm import DeadlineExceeded, ResilientChatModel, request_budget, resilience_stats
+
+
+class _SlowModel(BaseChatModel):
+    """Modelo de teste: ``delays`` por chamada (a primeira lenta) e falhas transitórias iniciais."""
+
+    delays: List[float] = [0.0]
+    failures: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        call = self.calls
+        self.calls += 1
+        if call < self.failures:
+            raise ConnectionError("conexão recusada")
+        await asyncio.sleep(self.delays[min(call, len(self.delays) - 1)])
+        message = AIMessage(
+            content=f"resposta {call}",
+            usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _counters(role: str) -> dict:
+    return dict(resilience_stats.stats().get(role, {}))
+
+
+def test_hedged_call_wins_after_p95_and_reports_wasted_tokens():
+    role = "hedge-test"
+    for _ in range(20):
+        resilience_stats.window(role).add(0.01)
+    inner = _SlowModel(delays=[1.0, 0.0])
+    model = ResilientChatModel(inner=inner, role=role, hedge=True, attempt_timeout=5)
+
+    reply = asyncio.run(model.ainvoke([HumanMessage(content="qual o meu saldo?")]))
+
+    stats = _counters(role)
+    assert reply.content == "resposta 1"  # a cópia respondeu antes da chamada lenta
+    assert inner.calls == 2
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["wasted_tokens"] == 12
+
+
+def test_transient_errors_are_retried_with_jitter(monkeypatch):
+    role = "retry-test"
+    delays = []
+    monkeypatch.setattr("src.llm.resilience.random.uniform", lambda low, high: delays.append(high) or 0.0)
+    inner = _SlowModel(failures=2)
+    model = ResilientChatModel(inner=inner, role=role, max_retries=2, retry_base_delay=0.1)
+
+    reply = asyncio.run(model.ainvoke("oi"))
+
+    assert reply.content == "resposta 2"
+    assert delays == [0.1, 0.2]  # teto exponencial; o jitter sorteia entre 0 e o teto
+    assert _counters(role)["retries"] == 2
+
+
+def test_request_budget_bounds_each_call():
+    role = "deadline-test"
+    model = ResilientChatModel(inner=_SlowModel(delays=[1.0]), role=role, attempt_timeout=30)
+
+    async def scenario():
+        with request_budget(seconds=0.05):
+            await model.ainvoke("oi")
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    with request_budget(seconds=0), pytest.raises(DeadlineExceeded):
+        model.invoke("oi")
+    assert _counters(role)["deadline_exceeded"] == 2
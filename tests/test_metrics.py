@@ -0,0 +1,40 @@
+from langchain_core.messages import HumanMessage
+from prometheus_client import REGISTRY
+
+from src.observability.metrics import BoundedLabel, get_metrics_handler, instrument_sqlalchemy
+from tests.test_offline_pipeline import offline_orchestrator  # noqa: F401
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_bounded_label_folds_new_values_into_other():
+    label = BoundedLabel(max_values=2)
+
+    assert [label("a"), label("b"), label("c"), label("a"), label(None)] == ["a", "b", "other", "a", "other"]
+
+
+def test_orchestrator_run_exports_node_llm_tool_and_db_metrics(offline_orchestrator):
+    instrument_sqlalchemy()
+    before = {
+        "node": _value("agents_node_duration_seconds_count", node="Financeiro"),
+        "tool": _value("agents_tool_duration_seconds_count", tool="get_balance"),
+        "db": _value("agents_db_query_duration_seconds_count", operation="SELECT"),
+        "requests": _value("agents_llm_calls_per_request_count"),
+        "llm_calls": _value("agents_llm_calls_per_request_sum"),
+    }
+
+    offline_orchestrator.invoke(
+        {"messages": [HumanMessage(content="qual o meu saldo?")], "next_agent": "", "sender": "usuario", "user_id": "m"},
+        config={"configurable": {"bypass_routing_cache": True}},
+    )
+
+    assert _value("agents_node_duration_seconds_count", node="Financeiro") == before["node"] + 1
+    assert _value("agents_tool_duration_seconds_count", tool="get_balance") == before["tool"] + 1
+    assert _value("agents_db_query_duration_seconds_count", operation="SELECT") > before["db"]
+    assert _value("agents_llm_calls_per_request_count") == before["requests"] + 1
+    # Agente: chamada com a função + resposta final
+    assert _value("agents_llm_calls_per_request_sum") >= before["llm_calls"] + 2
+    assert _value("agents_llm_tokens_total", model="ScriptedChatModel", node="Financeiro", kind="prompt") > 0
+    assert not get_metrics_handler()._roots  # nada fica retido entre execuções
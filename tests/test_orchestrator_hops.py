@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+import src.graph.agent_orchestrator  # noqa: F401
+
+orchestrator_module = sys.modules["src.graph.agent_orchestrator"]
+
+
+@pytest.fixture
+def build_graph(monkeypatch):
+    """Monta o grafo com agentes e roteador falsos, contando as chamadas."""
+    calls = {"Financeiro": 0, "Agendamento": 0, "router": 0}
+    inputs = {}
+
+    def fake_agent(name, output, delay):
+        def run(agent_input):
+            calls[name] += 1
+            inputs[name] = agent_input["input"]
+            return {"output": output}
+
+        async def arun(agent_input):
+            calls[name] += 1
+            inputs[name] = agent_input["input"]
+            await asyncio.sleep(delay)
+            return {"output": output}
+        return RunnableLambda(run, afunc=arun)
+
+    def build(router_answers, delay=0.0):
+        answers = iter(router_answers)
+
+        def route(_):
+            calls["router"] += 1
+            return next(answers)
+
+        monkeypatch.setattr(orchestrator_module, "finance_agent_executor", fake_agent("Financeiro", "Saldo: R$ 10", delay))
+        monkeypatch.setattr(orchestrator_module, "scheduling_agent_executor", fake_agent("Agendamento", "Agendado", delay / 2))
+        monkeypatch.setattr(orchestrator_module, "build_router_chain", lambda: RunnableLambda(route))
+        return orchestrator_module.create_agent_orchestrator()
+
+    build.inputs = inputs
+    return build, calls
+
+
+def _run(graph, query):
+    state = {"messages": [HumanMessage(content=query)], "next_agent": "", "sender": "usuario", "user_id": "u1"}
+    return graph.invoke(state, config={"configurable": {"bypass_routing_cache": True}})
+
+
+def test_single_intent_costs_at_most_one_router_call_and_one_agent_run(build_graph):
+    build, calls = build_graph
+    # O roteador repetiria o agente; a regra de término encerra após a resposta.
+    graph = build(["Financeiro", "Financeiro"])
+
+    result = _run(graph, "qual o meu saldo?")
+
+    assert result["hops"] == 1
+    assert calls["Financeiro"] == 1 and calls["Agendamento"] == 0
+    assert calls["router"] <= 1
+
+
+def test_multi_intent_visits_each_agent_once(build_graph, monkeypatch):
+    build, calls = build_graph
+    monkeypatch.setattr(orchestrator_module, "ORCHESTRATOR_FAN_OUT", False)
+    # Primeira rota pelo classificador (Agendamento); o roteador completa com o outro agente.
+    graph = build(["Financeiro"])
+
+    result = _run(graph, "qual meu saldo e marque uma reunião amanhã às 10h")
+
+    assert result["hops"] == 2
+    assert calls == {"Financeiro": 1, "Agendamento": 1, "router": 1}
+
+
+def test_sequential_hops_receive_the_user_query_and_both_answers_are_returned(build_graph, monkeypatch):
+    build, calls = build_graph
+    monkeypatch.setattr(orchestrator_module, "ORCHESTRATOR_FAN_OUT", False)
+    graph = build(["Financeiro"])
+    query = "qual meu saldo e marque uma reunião amanhã às 10h"
+
+    result = _run(graph, query)
+
+    # O segundo agente recebe o pedido original, não a resposta do primeiro
+    assert build.inputs == {"Agendamento": query, "Financeiro": query}
+    assert result["messages"][-1].content == "Saldo: R$ 10\n\nAgendado"
+
+
+def test_router_choosing_an_agent_that_already_answered_ends_the_run(build_graph, monkeypatch):
+    build, calls = build_graph
+    monkeypatch.setattr(orchestrator_module, "ORCHESTRATOR_FAN_OUT", False)
+    graph = build(["Agendamento"])
+
+    result = _run(graph, "qual meu saldo e marque uma reunião amanhã às 10h")
+
+    assert result["hops"] == 1
+    assert result["messages"][-1].content == "Agendado"
+    assert calls["Agendamento"] == 1 and calls["router"] == 1
+
+
+def test_run_ends_after_the_answer_even_without_the_route_classifier(build_graph, monkeypatch):
+    build, calls = build_graph
+    monkeypatch.setattr(orchestrator_module, "ROUTER_CLASSIFIER_ENABLED", False)
+    graph = build(["Financeiro", "Financeiro"])
+
+    result = _run(graph, "qual o meu saldo?")
+
+    assert result["hops"] == 1
+    assert calls == {"Financeiro": 1, "Agendamento": 0, "router": 1}
+
+
+def test_end_chosen_by_the_llm_router_on_the_first_hop_is_recorded_as_router(build_graph, monkeypatch):
+    build, calls = build_graph
+    monkeypatch.setattr(orchestrator_module, "ROUTER_CLASSIFIER_ENABLED", False)
+    before = dict(orchestrator_module.hop_stats.reasons)
+    graph = build(["END"])
+
+    _run(graph, "olá")
+
+    reasons = orchestrator_module.hop_stats.reasons
+    assert reasons.get("router", 0) == before.get("router", 0) + 1
+    assert reasons.get("classifier", 0) == before.get("classifier", 0)
+
+
+def test_parallel_fan_out_merges_in_agent_order(build_graph):
+    build, calls = build_graph
+    graph = build([], delay=0.3)
+    state = {
+        "messages": [HumanMessage(content="qual meu saldo e marque uma reunião amanhã às 10h")],
+        "next_agent": "",
+        "sender": "usuario",
+        "user_id": "u1",
+    }
+
+    started = time.perf_counter()
+    result = asyncio.run(graph.ainvoke(state, config={"configurable": {"bypass_routing_cache": True}}))
+    elapsed = time.perf_counter() - started
+
+    # Agendamento termina antes, mas a resposta combinada segue a ordem dos agentes
+    assert result["messages"][-1].content == "Saldo: R$ 10\n\nAgendado"
+    assert result["hops"] == 2
+    assert calls == {"Financeiro": 1, "Agendamento": 1, "router": 0}
+    assert elapsed < 0.45  # próximo do ramo mais lento (0.3s), não da soma
+
+
+def test_router_may_emit_several_targets():
+    parse_route = orchestrator_module.parse_route
+    assert parse_route("Agendamento, Financeiro") == "Financeiro,Agendamento"
+    assert parse_route("'Financeiro' e 'Agendamento'") == "Financeiro,Agendamento"
+    with pytest.raises(ValueError):
+        parse_route("Financeiro, END")
@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+
+from src.extraction.ptbr import (
+    extract_investment,
+    extract_schedule,
+    extract_transfer,
+    parse_amount,
+    parse_date,
+    parse_time,
+)
+
+TODAY = date(2025, 3, 12)  # quarta-feira
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("amanhã às 10h", date(2025, 3, 13)),
+        ("depois de amanhã", date(2025, 3, 14)),
+        ("na sexta", date(2025, 3, 14)),
+        ("sexta que vem", date(2025, 3, 21)),
+        ("próxima segunda-feira", date(2025, 3, 17)),
+        ("15/03", date(2025, 3, 15)),
+        ("10/03", date(2026, 3, 10)),  # já passou: próximo ano
+        ("2 de abril", date(2025, 4, 2)),
+        ("dia 5", date(2025, 4, 5)),
+        ("amanhã ou sexta", None),  # ambíguo
+    ],
+)
+def test_parse_date(text, expected):
+    assert parse_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("às 10h", "10:00"),
+        ("10h30", "10:30"),
+        ("às 14:15", "14:15"),
+        ("às 3 da tarde", "15:00"),
+        ("ao meio-dia", "12:00"),
+        ("às 9 e meia", "09:30"),
+        ("às 10 e quinze", "10:15"),
+        ("às 3 e meia da tarde", "15:30"),
+        ("quinze para as 10", "09:45"),
+        ("dia 15/03", None),
+    ],
+)
+def test_parse_time(text, expected):
+    assert parse_time(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("R$ 1.500,00", 1500.0),
+        ("1500 reais", 1500.0),
+        ("R$ 1,5 mil", 1500.0),
+        ("2 mil", 2000.0),
+        ("5 mil reais", 5000.0),
+        ("100 reais hoje e 200 reais amanhã", None),
+        # Sem moeda ou "mil", um número solto não é valor: fica para o LLM
+        ("transfira 100 para Ana", None),
+        ("pague 2 boletos para a Ana", None),
+        ("transfira para a conta 12345", None),
+    ],
+)
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+def test_extract_details():
+    assert extract_schedule("Marque uma reunião com a Ana amanhã às 10h na Sala 3", TODAY) == {
+        "date": "13/03/2025",
+        "time": "10:00",
+        "location": "Sala 3",
+        "description": "reunião com Ana",
+    }
+    assert extract_schedule("marque uma reunião na semana que vem", TODAY) is None  # sem data/hora: usa o LLM
+    assert extract_transfer("pix de R$ 250,50 pro joão da silva") == {"amount": 250.5, "recipient": "João da Silva"}
+    assert extract_transfer("transfira 100 para mim") is None
+    assert extract_investment("aplique 5 mil no Tesouro Direto") == {
+        "amount": 5000.0,
+        "description": "Investimento em Tesouro Direto",
+    }
+    # Conectivos não contam no limite de palavras do nome
+    assert extract_investment("invista R$ 2.000 em CDB do Banco do Brasil") == {
+        "amount": 2000.0,
+        "description": "Investimento em CDB do Banco do Brasil",
+    }
@@ -0,0 +1,50 @@
+import gc
+import os
+import weakref
+
+import pytest
+
+from src.routing.cache import RoutingCache, normalize_route_key
+
+
+def test_normalization_ignores_case_accents_spaces_and_numbers():
+    assert normalize_route_key("Transfira R$ 1.500,00 para  Ana!") == normalize_route_key("transfira r$ 20 para ana")
+    assert normalize_route_key("Reunião às 10h") == "reuniao as 0h"
+
+
+def test_lru_eviction_ttl_and_counters():
+    cache = RoutingCache(max_entries=2, ttl=60)
+    cache.set("qual o meu saldo?", "Financeiro")
+    cache.set("marque uma reunião", "Agendamento")
+    cache.set("obrigado", "END")
+
+    assert cache.get("qual o meu saldo?") is None  # removido por LRU
+    assert cache.get("Marque uma reunião") == "Agendamento"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    expired = RoutingCache(ttl=-1)
+    expired.set("saldo", "Financeiro")
+    assert expired.get("saldo") is None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "routing.db")
+    RoutingCache(path=path).set("qual o meu saldo?", "Financeiro")
+
+    other_worker = RoutingCache(path=path)
+    assert other_worker.get("Qual o meu saldo") == "Financeiro"
+
+
+def test_instances_are_not_retained_and_fork_resets_live_connections(tmp_path):
+    cache = RoutingCache(path=str(tmp_path / "routing.db"))
+    cache.set("qual o meu saldo?", "Financeiro")
+    gone = weakref.ref(RoutingCache())
+    gc.collect()
+    assert gone() is None  # o hook de fork é do módulo, não segura as instâncias
+
+    pid = os.fork()
+    if pid == 0:  # filho: a conexão herdada foi descartada
+        os._exit(0 if cache._conn is None else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert cache._conn is not None
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.agents.scheduling.tools import cancel as cancel_module
+from src.agents.scheduling.tools import reschedule as reschedule_module
+from src.agents.scheduling.tools.candidates import SCHEDULE_CANDIDATES_TOP_K, rank_schedules, select_candidates
+
+NOW = datetime(2025, 3, 12, 9, 0)  # quarta-feira
+
+
+def _schedule(id, days, time, location="Escritório", description="Reunião"):
+    return SimpleNamespace(id=id, date=(NOW + timedelta(days=days)).replace(hour=0, minute=0), time=time,
+                           location=location, description=description)
+
+
+def _calendar(size=200):
+    # Histórico grande de reuniões iguais, mais um dentista e uma reunião amanhã às 15h
+    history = [_schedule(100 + i, -i - 1, "10:00") for i in range(size)]
+    return history + [_schedule(1, 1, "15:00"), _schedule(2, 5, "10:00", "Clínica", "Dentista")]
+
+
+def test_unambiguous_matches_resolve_without_llm():
+    schedules = _calendar()
+
+    _, by_date = select_candidates(schedules, "cancele a reunião de amanhã às 15h", now=NOW)
+    _, by_text_and_date = select_candidates(schedules, "desmarque o dentista do dia 17/03", now=NOW)
+    by_text, text_only = select_candidates(schedules, "desmarque o dentista", now=NOW)
+
+    assert by_date.id == 1
+    assert by_text_and_date.id == 2
+    # Só palavras em comum não bastam para apagar sem confirmação do LLM
+    assert text_only is None and by_text[0].id == 2
+
+
+def test_contradicting_date_or_time_never_resolves_locally():
+    meeting = _schedule(1, 6, "10:00")  # 18/03
+
+    candidates, by_date = select_candidates([meeting], "cancele a reunião de 20/03", now=NOW)
+    _, by_time = select_candidates([meeting], "cancele a reunião de 18/03 às 15h", now=NOW)
+
+    assert by_date is None and by_time is None
+    assert rank_schedules([meeting], "cancele a reunião de 20/03", now=NOW)[0].score < 0
+    assert [s.id for s in candidates] == [1]  # o LLM ainda vê o compromisso e pode recusar
+
+
+def test_ambiguous_queries_send_a_bounded_top_k_upcoming_first():
+    candidates, match = select_candidates(_calendar(), "cancele a reunião", top_k=5, now=NOW)
+
+    assert match is None
+    assert len(candidates) == 5
+    # Sem data, as futuras vêm antes do histórico, e o histórico pelo mais recente
+    assert [s.id for s in candidates] == [1, 100, 101, 102, 103]
+
+
+def test_rank_prefers_date_and_time_evidence():
+    ranked = rank_schedules(_calendar(10), "a reunião de 11/03 às 10h", now=NOW)
+
+    assert ranked[0].schedule.id == 100 and ranked[0].score > ranked[1].score
+
+
+def test_cancel_tool_prompt_only_lists_candidates(monkeypatch):
+    prompts = []
+
+    class _Extractor:
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            return cancel_module.CancelDetails(schedule_id=1)
+
+    monkeypatch.setattr(cancel_module, "load_schedules", lambda user_id: _calendar())
+    monkeypatch.setattr(cancel_module, "with_escalation", lambda role, build: _Extractor())
+    monkeypatch.setattr(cancel_module, "_delete", lambda schedule_id: None)
+
+    assert cancel_module.cancel_appointment("cancele a reunião", user_id="u") == "Compromisso cancelado com sucesso!"
+    assert 0 < prompts[0].count("ID: ") <= SCHEDULE_CANDIDATES_TOP_K
+
+
+def test_reschedule_target_slot_is_not_evidence_of_which_schedule_to_move(monkeypatch):
+    joao = _schedule(1, 3, "10:00", description="Reunião com João")  # 15/03
+    dentist = _schedule(2, 8, "10:00", "Clínica", "Dentista")  # 20/03, já no novo dia
+    applied, prompts = [], []
+
+    class _Extractor:
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            return reschedule_module.RescheduleDetails(
+                schedule_id=1, new_date="20/03/2025", new_time="10:00", new_location="Escritório", new_description="Reunião"
+            )
+
+    monkeypatch.setattr(reschedule_module, "load_schedules", lambda user_id: [joao, dentist])
+    monkeypatch.setattr(reschedule_module, "with_escalation", lambda role, build: _Extractor())
+    monkeypatch.setattr(reschedule_module, "_apply_reschedule", applied.append)
+
+    reschedule_module.reschedule_appointment(query="remarque a reunião com João para 20/03", new_date="20/03/2025", user_id="u")
+
+    assert [d.schedule_id for d in applied] == [1]
+    assert len(prompts) == 1  # só o texto em comum: a escolha fica com o LLM
+    # A data antiga continua sendo evidência; só a nova é ignorada
+    _, match = select_candidates([joao, dentist], "remarque a reunião de 15/03 para 20/03", now=NOW, new_slot="20/03")
+    assert match is joao
@@ -0,0 +1,110 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Aplicação mínima servida pelo PreforkServer num processo separado (o servidor instala
+# handlers de sinal e bloqueia). ``warmup`` abre conexões no pai; ``/probe`` responde, no
+# worker, se os hooks de fork as descartaram.
+_SERVER = """
+import sys
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from src.database import models
+from src.llm import registry as llm_registry
+from src.server import PreforkServer
+from src.utils import http_client
+
+app = FastAPI()
+parent = {}
+
+
+def warmup():
+    with models.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    parent["pool"] = id(models.engine.pool)
+    parent["http"] = id(http_client.get_async_client())
+    parent["llm_http"] = id(llm_registry.get_http_clients()[0])
+
+
+@app.get("/probe")
+def probe():
+    import os
+    return {
+        "pid": os.getpid(),
+        "warmed_up": bool(parent),
+        "engine_reset": id(models.engine.pool) != parent["pool"],
+        "http_reset": http_client._async_client is None,
+        "llm_http_reset": llm_registry._http_client is None,
+    }
+
+
+PreforkServer(app, host="127.0.0.1", port=int(sys.argv[1]), workers=1, graceful_timeout=5,
+              max_requests=int(sys.argv[2]) or None, log_level="warning", warmup=warmup).run()
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(tmp_path, max_requests=0):
+    port = _free_port()
+    script = tmp_path / "serve.py"
+    script.write_text(_SERVER)
+    env = {**os.environ, "PYTHONPATH": os.getcwd(), "DATABASE_URL": f"sqlite:///{tmp_path / 'server.db'}"}
+    process = subprocess.Popen([sys.executable, str(script), str(port), str(max_requests)], env=env)
+    return process, f"http://127.0.0.1:{port}/probe"
+
+
+def _probe(url: str, timeout: float = 15.0, not_pid: int = 0) -> dict:
+    """Espera um worker (diferente de ``not_pid``) responder."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            body = httpx.get(url, timeout=2).json()
+            if body["pid"] != not_pid:
+                return body
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError(f"nenhum worker respondeu em {url}")
+
+
+def _stop(process: subprocess.Popen) -> int:
+    process.send_signal(signal.SIGTERM)
+    return process.wait(timeout=15)
+
+
+def test_worker_serves_with_fresh_connections_and_sighup_restarts_it(tmp_path):
+    process, url = _start(tmp_path)
+    try:
+        first = _probe(url)
+        assert first["pid"] != process.pid
+        # warmup rodou no pai antes do fork; engine e clientes HTTP do pai foram descartados
+        assert first == {**first, "warmed_up": True, "engine_reset": True, "http_reset": True, "llm_http_reset": True}
+
+        process.send_signal(signal.SIGHUP)
+        restarted = _probe(url, not_pid=first["pid"])
+        assert restarted["warmed_up"] and restarted["engine_reset"]
+    finally:
+        code = _stop(process)
+    assert code == 0
+
+
+def test_worker_is_recycled_after_max_requests(tmp_path):
+    process, url = _start(tmp_path, max_requests=2)
+    try:
+        first = _probe(url)
+        httpx.get(url, timeout=2)
+        # Atingido o limite, o worker sai e o pai inicia um substituto
+        assert _probe(url, not_pid=first["pid"])["pid"] != first["pid"]
+    finally:
+        _stop(process)
@@ -0,0 +1,52 @@
+import asyncio
+
+from src.utils.intents import is_write_intent
+from src.utils.single_flight import SingleFlight, coalesce_key
+
+
+def test_concurrent_duplicates_share_one_execution():
+    """Chamadas idênticas simultâneas executam a fábrica uma única vez."""
+    sf = SingleFlight()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "Seu saldo é de R$ 1.000,00"
+
+    async def scenario():
+        key = coalesce_key("user1", "Qual o meu saldo?")
+        same_key = coalesce_key("user1", "  qual o meu  SALDO ")
+        return await asyncio.gather(*(sf.run(k, factory) for k in (key, same_key, key)))
+
+    results = asyncio.run(scenario())
+
+    assert results == ["Seu saldo é de R$ 1.000,00"] * 3
+    assert calls == 1
+    assert sf.stats()["saved"] == 2
+    assert sf.stats()["in_flight"] == 0
+
+
+def test_disabled_and_distinct_users_do_not_coalesce():
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def scenario(sf, keys):
+        return await asyncio.gather(*(sf.run(k, factory) for k in keys))
+
+    asyncio.run(scenario(SingleFlight(enabled=False), [coalesce_key("user1", "saldo")] * 2))
+    asyncio.run(scenario(SingleFlight(), [coalesce_key("user1", "saldo"), coalesce_key("user2", "saldo")]))
+
+    assert calls == 4
+
+
+def test_write_intents_are_detected():
+    assert is_write_intent("Transfira R$ 100 para a Ana")
+    assert is_write_intent("marque uma reunião amanhã às 10h")
+    assert not is_write_intent("qual o meu saldo?")
@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import sys
+import time
+
+import pytest
+from langchain.agents import Tool
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+import src.graph.agent_orchestrator  # noqa: F401
+from src.agents.agent_factory import SpeculativeWriteBlocked, build_agent_executor, set_current_user, set_speculative
+from src.graph.speculation import speculation_stats
+
+orchestrator_module = sys.modules["src.graph.agent_orchestrator"]
+
+
+@pytest.fixture
+def speculative_graph(monkeypatch):
+    """Grafo com roteador e agentes lentos (0.2s cada) e especulação ligada."""
+    calls = {"Financeiro": 0, "Agendamento": 0}
+
+    def fake_agent(name):
+        async def run(_):
+            calls[name] += 1
+            await asyncio.sleep(0.2)
+            return {"output": f"resposta {name}"}
+        return RunnableLambda(lambda _: None, afunc=run)
+
+    def build(router_answer):
+        async def route(_):
+            await asyncio.sleep(0.2)
+            return router_answer
+
+        monkeypatch.setattr(orchestrator_module, "ORCHESTRATOR_SPECULATIVE", True)
+        monkeypatch.setattr(orchestrator_module, "ROUTER_CLASSIFIER_THRESHOLD", 1.1)  # força o roteador LLM
+        monkeypatch.setattr(orchestrator_module, "finance_agent_executor", fake_agent("Financeiro"))
+        monkeypatch.setattr(orchestrator_module, "scheduling_agent_executor", fake_agent("Agendamento"))
+        monkeypatch.setattr(orchestrator_module, "build_router_chain", lambda: RunnableLambda(lambda _: None, afunc=route))
+        return orchestrator_module.create_agent_orchestrator()
+
+    return build, calls
+
+
+def _run(graph):
+    state = {"messages": [HumanMessage(content="qual o meu saldo?")], "next_agent": "", "sender": "usuario", "user_id": "u1"}
+    started = time.perf_counter()
+    result = asyncio.run(graph.ainvoke(state, config={"configurable": {"bypass_routing_cache": True}}))
+    return result, time.perf_counter() - started
+
+
+def test_confirmed_speculation_overlaps_router_and_agent(speculative_graph):
+    build, calls = speculative_graph
+    hits = speculation_stats.hits
+
+    result, elapsed = _run(build("Financeiro"))
+
+    assert result["messages"][-1].content == "resposta Financeiro"
+    assert calls == {"Financeiro": 1, "Agendamento": 0}
+    assert speculation_stats.hits == hits + 1
+    assert elapsed < 0.35  # roteador e agente em paralelo, não 0.4s
+
+
+def test_rejected_speculation_is_cancelled(speculative_graph):
+    build, calls = speculative_graph
+    misses = speculation_stats.misses
+
+    result, _ = _run(build("Agendamento"))
+
+    assert result["messages"][-1].content == "resposta Agendamento"
+    assert speculation_stats.misses == misses + 1
+    assert result["hops"] == 1
+
+
+def test_write_tools_are_blocked_in_speculative_runs():
+    writes = []
+    tools = build_agent_executor(
+        "teste",
+        [
+            Tool(name="saldo", func=lambda q, user_id=None: "10", description="lê", metadata={"read_only": True}),
+            Tool(name="transferir", func=lambda q, user_id=None: writes.append(q), description="escreve"),
+        ],
+        verbose=False,
+    ).tools
+
+    def speculative_calls():
+        set_speculative(True)
+        assert tools[0].func("saldo") == "10"
+        with pytest.raises(SpeculativeWriteBlocked):
+            tools[1].func("100 para Ana")
+
+    set_current_user("user1")
+    contextvars.copy_context().run(speculative_calls)
+    assert writes == []
+    tools[1].func("100 para Ana")  # fora da especulação a escrita segue normal
+    set_current_user(None)
+    assert writes == ["100 para Ana"]
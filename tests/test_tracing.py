@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from langchain_core.messages import HumanMessage
+
+from src.observability import tracing
+from src.observability.tracing import TraceExporter, get_tracing_handler, trace_request, trace_sqlalchemy
+from tests.test_offline_pipeline import offline_orchestrator  # noqa: F401
+
+
+def _spans(trace):
+    return {span.name: span for span in trace.spans}
+
+
+def test_trace_tree_covers_nodes_agent_steps_llm_tools_and_sql(offline_orchestrator):
+    trace_sqlalchemy()
+    state = {"messages": [HumanMessage(content="qual o meu saldo?")], "next_agent": "", "sender": "usuario", "user_id": "t"}
+
+    with trace_request("teste", force=True) as trace:
+        asyncio.run(offline_orchestrator.ainvoke(state, config={"configurable": {"bypass_routing_cache": True}}))
+
+    spans = _spans(trace)
+    parent = lambda name: next(s.name for s in trace.spans if s.span_id == spans[name].parent_id)  # noqa: E731
+    assert parent("LangGraph") == "teste"
+    assert parent("Financeiro") == "LangGraph"
+    assert parent("AgentExecutor") == "Financeiro"
+    assert parent("agent_step 1") == "AgentExecutor" and "agent_step 2" in spans
+    assert parent("tool get_balance") == "AgentExecutor"
+    assert parent("sql SELECT") == "tool get_balance"
+    llm = next(s for s in trace.spans if s.name.startswith("llm ") and s.parent_id == spans["agent_step 1"].span_id)
+    assert llm.attributes["gen_ai.usage.input_tokens"] > 0
+    assert all(s.end_ns is not None and s.end_ns >= s.start_ns for s in trace.spans)
+    assert not get_tracing_handler()._runs  # nada fica retido entre requisições
+
+
+def test_exporter_writes_otlp_json_lines_and_console_tree(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "traces.jsonl"
+    exporter = TraceExporter(path=str(path), console=True)
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+
+    with trace_request("POST /invoke") as trace:
+        with tracing.span("http GET", **{"http.url": "https://exemplo"}):
+            pass
+    with trace_request("desligado", force=False):
+        pass  # o exportador habilitado liga o rastreamento; sem destinos, seria None
+    exporter.flush()
+
+    documents = [json.loads(line) for line in path.read_text().splitlines()]
+    spans = documents[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(documents) == 2
+    assert {s["traceId"] for s in spans} == {trace.trace_id}
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert {"key": "http.url", "value": {"stringValue": "https://exemplo"}} in spans[1]["attributes"]
+    assert "http GET" in capsys.readouterr().out
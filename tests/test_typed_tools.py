@@ -0,0 +1,177 @@
+import pytest
+
+from src.agents.agent_factory import build_agent_executor, set_current_user
+from src.agents.finance.tools import finance_tools
+from src.agents.scheduling.tools import scheduling_tools
+from src.agents.scheduling.tools import cancel as cancel_module
+from src.agents.scheduling.tools import schedule as schedule_module
+from src.database.crud import get_schedules
+from src.database.models import SessionLocal
+from src.extraction import extraction_stats
+from src.llm import reset_llm_registry
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    reset_llm_registry()
+    yield
+    reset_llm_registry()
+
+
+def _no_llm(*args, **kwargs):
+    raise AssertionError("o extrator LLM não deveria ser chamado")
+
+
+def _tool(executor, name):
+    return next(t for t in executor.tools if t.name == name)
+
+
+def _schedules(user_id):
+    db = SessionLocal()
+    try:
+        return get_schedules(db, user_id=user_id)
+    finally:
+        db.close()
+
+
+def test_executor_publishes_typed_schema_without_user_id(fake_backend):
+    executor = build_agent_executor("sistema", finance_tools, verbose=False)
+    tools = executor.agent.runnable.steps[-2].kwargs["tools"]
+    params = next(t["function"] for t in tools if t["function"]["name"] == "transfer_money")["parameters"]["properties"]
+
+    assert set(_tool(executor, "transfer_money").args) == {"query", "amount", "recipient"}
+    assert params["amount"]["anyOf"][0]["type"] == "number"
+    assert "user_id" not in params
+
+
+def test_legacy_schema_loses_user_id_and_the_context_user_always_wins(fake_backend):
+    from langchain.tools import StructuredTool
+    from pydantic import BaseModel
+
+    class LegacyInput(BaseModel):
+        query: str
+        user_id: str
+
+    seen = []
+    legacy = StructuredTool.from_function(
+        func=lambda query, user_id: seen.append(user_id) or "ok",
+        name="legacy", description="legada", args_schema=LegacyInput,
+    )
+    executor = build_agent_executor("sistema", [legacy], verbose=False)
+    tools = executor.agent.runnable.steps[-2].kwargs["tools"]
+    published = next(t["function"] for t in tools if t["function"]["name"] == "legacy")["parameters"]
+
+    assert "user_id" not in published["properties"]
+    assert "user_id" not in published.get("required", [])
+    set_current_user("dono")
+    _tool(executor, "legacy").invoke({"query": "saldo", "user_id": "intruso"})
+    set_current_user(None)
+    assert seen == ["dono"]
+
+
+def test_domain_tools_refuse_to_run_without_a_current_user(fake_backend):
+    from src.agents.finance.tools.balance import get_balance
+
+    set_current_user(None)
+    assert get_balance("saldo").startswith("Erro ao obter saldo: usuário não identificado")
+
+
+def test_typed_arguments_skip_the_extractor(fake_backend, monkeypatch):
+    monkeypatch.setattr(schedule_module, "with_escalation", _no_llm)
+    executor = build_agent_executor("sistema", scheduling_tools, verbose=False)
+    before = extraction_stats.arguments.get("schedule", 0)
+    set_current_user("typed-tools")
+
+    result = _tool(executor, "schedule_appointment").invoke(
+        {"date": "2030-01-15", "time": "10h", "description": "Dentista"}
+    )
+
+    assert result == "Compromisso agendado com sucesso no banco de dados!"
+    saved = _schedules("typed-tools")[-1]
+    assert (saved.date.strftime("%d/%m/%Y"), saved.time, saved.description) == ("15/01/2030", "10:00", "Dentista")
+    assert extraction_stats.arguments["schedule"] == before + 1
+
+
+def test_cancel_uses_the_typed_id_only_for_the_users_own_schedule(fake_backend, monkeypatch):
+    monkeypatch.setattr(schedule_module, "with_escalation", _no_llm)
+    monkeypatch.setattr(cancel_module, "with_escalation", _no_llm)
+    executor = build_agent_executor("sistema", scheduling_tools, verbose=False)
+    set_current_user("typed-cancel")
+    _tool(executor, "schedule_appointment").invoke({"date": "16/01/2030", "time": "09:00"})
+    own_id = _schedules("typed-cancel")[-1].id
+
+    # ID de outro usuário: cai na extração via LLM (aqui bloqueada) em vez de apagar
+    assert "Erro" in _tool(executor, "cancel_appointment").invoke({"schedule_id": own_id + 10_000})
+    assert _tool(executor, "cancel_appointment").invoke({"schedule_id": own_id}) == "Compromisso cancelado com sucesso!"
+    assert own_id not in {s.id for s in _schedules("typed-cancel")}
+
+
+def test_tools_from_one_step_run_in_parallel_with_the_current_user(fake_backend):
+    import asyncio
+    import threading
+    import time
+    from langchain.tools import StructuredTool
+
+    seen = []
+    barrier = threading.Barrier(2, timeout=2)  # só passa se as duas rodarem ao mesmo tempo
+
+    def make_tool(name):
+        def run(query: str = "", user_id: str = "user1"):
+            barrier.wait()
+            seen.append((name, user_id))
+            return f"{name} ok"
+
+        async def arun(query: str = "", user_id: str = "user1"):
+            await asyncio.sleep(0.1)
+            seen.append((name, user_id))
+            return f"{name} ok"
+
+        return StructuredTool.from_function(func=run, coroutine=arun, name=name, description=name)
+
+    executor = build_agent_executor(
+        "sistema", [make_tool("get_balance"), make_tool("predict_usd_brl_trend")], verbose=False
+    )
+    set_current_user("user7")
+    result = executor.invoke({"input": "qual o saldo e a tendência do dólar?"})
+    started = time.perf_counter()
+    async_result = asyncio.run(executor.ainvoke({"input": "qual o saldo e a tendência do dólar?"}))
+    set_current_user(None)
+
+    assert result["output"] == "get_balance ok\npredict_usd_brl_trend ok"
+    assert async_result["output"] == result["output"]
+    assert time.perf_counter() - started < 0.18  # sequencial levaria 0.2s
+    assert sorted(seen) == sorted([("get_balance", "user7"), ("predict_usd_brl_trend", "user7")] * 2)
+
+
+def _saved_calls(reason):
+    from prometheus_client import REGISTRY
+
+    return REGISTRY.get_sample_value("agents_llm_calls_saved_total", {"reason": reason}) or 0.0
+
+
+def test_direct_return_tool_skips_the_final_llm_call(fake_backend):
+    executor = build_agent_executor("sistema", finance_tools, verbose=False, return_direct=["get_balance"])
+    model = executor.agent.runnable.steps[-2].bound.inner
+    before, calls = _saved_calls("return_direct"), model.calls
+    set_current_user("user1")
+    result = executor.invoke({"input": "qual o meu saldo?"})
+    set_current_user(None)
+
+    assert result["output"].startswith(("Seu saldo atual", "Nenhuma transação"))
+    assert model.calls == calls + 1  # só a chamada que pediu a ferramenta
+    assert _saved_calls("return_direct") == before + 1
+
+
+def test_iteration_budget_stops_gracefully_with_partial_results(fake_backend):
+    from src.agents.agent_factory import EARLY_STOP_MESSAGE
+
+    executor = build_agent_executor("sistema", finance_tools, verbose=False, max_iterations=1)
+    before = _saved_calls("max_iterations")
+    set_current_user("user1")
+    result = executor.invoke({"input": "qual o meu saldo?"})
+    set_current_user(None)
+
+    assert result["output"].startswith(EARLY_STOP_MESSAGE)
+    assert "saldo" in result["output"].lower() or "transação" in result["output"]
+    assert _saved_calls("max_iterations") == before + 1